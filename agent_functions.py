@@ -1,3 +1,4 @@
+import atexit
 import json
 import datetime
 import os
@@ -17,21 +18,29 @@ from langchain.schema import SystemMessage, HumanMessage, AIMessage
 from browser_tools import WebResearchTool
 from autogen_coding import AutogenCoding
 from task_manager import TaskManager
-from memory_ollama import MemoryManager
+from memory_ollama import AsyncMemoryManager
 
 class AgentFunctions:
-    def __init__(self):
+    def __init__(self, task_db_path=None):
         self.code_execution_manager = CodeExecutionManager()
         self.web_research_tool = WebResearchTool()
         self.autogen_coding = AutogenCoding()
-        self.task_manager = TaskManager()
-        self.memory_manager = MemoryManager()
+        # With a task_db_path, shares the workflow's task database so tool calls see the same tasks.
+        self.task_manager = TaskManager(db_path=task_db_path)
+        self.memory_manager = AsyncMemoryManager()
         self.nlp = spacy.load("en_core_web_sm")
         self.compress_data = compress_data
         self.decompress_data = decompress_data
         
         self.tools = self.load_tools_from_file("tools.json")
         self.logger = setup_logger()
+        # Flushes the search engine statistics and pending memories, and quits the browsers, however the run ends
+        atexit.register(self.close)
+
+    def close(self):
+        atexit.unregister(self.close)
+        self.web_research_tool.close()
+        self.memory_manager.close()
 
 
     def load_tools_from_file(self, file_path: str) -> List[Dict[str, Any]]:
@@ -126,6 +135,7 @@ class AgentFunctions:
                 "read_file": self.code_execution_manager.read_file,
                 "list_files": self.code_execution_manager.list_files_in_workspace,
                 "coding": self.autogen_coding.start_chat,
+                "profile_code": self.code_execution_manager.profile_code,
                 "extract_tasks": self.task_manager.extract_tasks,
                 "update_task_status": self.task_manager.update_task_status,
                 "get_task_summary": self.task_manager.generate_task_summary,
@@ -217,17 +227,17 @@ class AgentFunctions:
         print(character * width)
 
     def summarize_memory(self, memory: List[Dict[str, str]]) -> List[Dict[str, str]]:
-        summarized_memory = []
         chunk_size = 2000
-        for i in range(0, len(memory), chunk_size):
-            chunk = memory[i:i+chunk_size]
-            chunk_text = "\n".join([f"{msg['role']}: {msg['content']}" for msg in chunk])
-            summary = self.memory_manager.generate_response(
-                "Summarize the following conversation chunk, preserving key information:",
-                chunk_text
-            )
-            summarized_memory.append({"role": "system", "content": f"Memory summary: {summary}"})
-        return summarized_memory
+        chunk_texts = [
+            "\n".join([f"{msg['role']}: {msg['content']}" for msg in memory[i:i+chunk_size]])
+            for i in range(0, len(memory), chunk_size)
+        ]
+        # Chunks are summarized concurrently, bounded by the memory manager's concurrency limit
+        summaries = self.memory_manager.generate_responses(
+            "Summarize the following conversation chunk, preserving key information:",
+            chunk_texts
+        )
+        return [{"role": "system", "content": f"Memory summary: {summary}"} for summary in summaries]
     def generate_progress_report(self, tasks: List[Dict[str, Any]], code: str) -> str:
         report = "Project Progress Report\n"
         report += "=" * 25 + "\n\n"
@@ -302,9 +312,9 @@ class AgentFunctions:
     def execute_code(self, code: str) -> Dict[str, Any]:
         result = self.code_execution_manager.test_code(code)
         if result["status"] == "success":
-            return {"success": True, "output": result["output"]}
+            return {"success": True, "output": result["output"], "tests": result["tests"]}
         else:
-            return {"success": False, "error": result["error_message"]}
+            return {"success": False, "error": result["error_message"], "tests": result.get("tests", [])}
 
     def optimize_code(self, code: str) -> Dict[str, Any]:
         optimization_result = self.code_execution_manager.optimize_code(code)
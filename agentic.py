@@ -5,29 +5,52 @@ from task_manager import TaskManager
 
 from autogen_coding import AutogenCoding
 from memory_ollama import MemoryManager
+from context_retriever import ContextRetriever
+from perf_gate import PerfGate
 
 class AgenticWorkflow:
-    def __init__(self):
-        self.agent_functions = AgentFunctions()
+    def __init__(self, task_db_path=None, reject_perf_regressions=False):
+        # Tasks are kept in memory unless task_db_path names a SQLite file to persist them across runs
+        # With reject_perf_regressions, a revision that is slower or uses more memory is rejected and the current code kept
+        self.task_db_path = task_db_path
+        self.agent_functions = AgentFunctions(task_db_path=task_db_path)
         self.code_execution_manager = CodeExecutionManager()
-        self.task_manager = TaskManager()
+        self.task_manager = TaskManager(db_path=task_db_path)
         self.coding = AutogenCoding()
+        self.perf_gate = PerfGate(self.code_execution_manager.sandbox, workspace_folder=self.code_execution_manager.workspace_folder,
+                                  history_dir="checkpoints/perf_history", reject_regressions=reject_perf_regressions)
 
 
         try:
-            self.memory_manager = MemoryManager()
+            self.memory_manager = MemoryManager(persist_directory="checkpoints/memory")
         except Exception as e:
             print(f"Error initializing MemoryManager: {e}")
             print("Continuing without MemoryManager...")
             self.memory_manager = None
+        self.context_retriever = ContextRetriever(self.memory_manager) if self.memory_manager else None
+        self.current_iteration = 0
         self.checkpoint_file = "checkpoints/agentic_workflow_checkpoint.pkl"
         self.max_iterations = 500
         self.system_messages = self.load_system_messages()
         self.memory = {key: [] for key in ["mike", "annie", "bob", "alex"]}
         self.code = ""
+        # Keys the benchmark history; fixed because the file name Annie picks when saving changes between iterations
+        self.code_file = "generated_code.py"
+        self.perf_report = ""
         self.report = ""
         self.bob_message = ""
         self.profit_status = ""
+    def agent_memory_entries(self, iteration=None):
+        entries = []
+        for agent, messages in self.memory.items():
+            for message in messages:
+                metadata = {"agent": agent, "kind": "message", "role": message["role"]}
+                if iteration is not None:
+                    metadata["iteration"] = iteration
+                content_hash = self.memory_manager.content_hash(message["content"])
+                entries.append((f"{agent}-{content_hash[:24]}", message["content"], metadata))
+        return entries
+
     def load_system_messages(self):
         system_messages = {}
         for agent in ["mike", "annie", "bob", "alex"]:
@@ -47,6 +70,10 @@ class AgenticWorkflow:
         checkpoint_data, self.code = self.agent_functions.load_checkpoint(self.checkpoint_file)
         if checkpoint_data:
             self.memory = {key: value for key, value in zip(["mike", "annie", "bob", "alex"], checkpoint_data)}
+            # Warm start: the manifest makes this embed only messages added since the last indexed save
+            if self.memory_manager:
+                indexed = self.memory_manager.save_memories(self.agent_memory_entries())
+                print(f"Indexed {indexed} new memories from checkpoint.")
 
         for i in range(1, self.max_iterations + 1):
             self.agent_functions.print_block(f"Iteration {i}")
@@ -54,10 +81,16 @@ class AgenticWorkflow:
 
             checkpoint_data = [self.memory[key] for key in ["mike", "annie", "bob", "alex"]] + [self.code]
             self.agent_functions.save_checkpoint(checkpoint_data, self.checkpoint_file, self.code, self.system_messages, self.memory, agent_name="annie")
+            if self.memory_manager:
+                self.memory_manager.enqueue_memories(self.agent_memory_entries(iteration=i))
+
+        if self.memory_manager:
+            self.memory_manager.flush()
 
         self.agent_functions.print_block("Agentic Workflow Completed", character='*')
 
     def run_iteration(self, iteration, date_time):
+        self.current_iteration = iteration
         workspace_files = self.code_execution_manager.list_files_in_workspace().get("files", [])
         project_output_goal = f"create a profitable script from scratch that generates real profit, not simulated profit."
 
@@ -112,6 +145,7 @@ class AgenticWorkflow:
         """
 
     def assign_task_to_agent(self, agent, task, date_time, workspace_files):
+        relevant_context = self.retrieve_task_context(task, workspace_files)
         agent_input = f"""
         Current time: {date_time}
         You are {agent} an AI {'software architect and engineer' if agent == 'mike' else 'senior agentic workflow developer' if agent == 'annie' else 'DevOps Engineer'}.
@@ -119,11 +153,14 @@ class AgenticWorkflow:
         {task}
         tools you have: {self.agent_functions.tools}
         Current files in the workspace: {workspace_files}
+        Relevant excerpts from workspace files and earlier team outputs:
+        {relevant_context or "None available."}
 
         Please provide your response, including any ideas, code snippets, or suggestions for creating a profitable script from scratch that generates real profit.
         Focus on creating high-quality, efficient, and well-documented code that follows software engineering best practices, including reflection and refactoring.
         Utilize available tools for research and information gathering as needed. Collaborate with your teammates to ensure a cohesive and functional script.
         Provide robust, verbose, non-pseudo, and non-example final code implementations for real-world cases.
+        Add zero-argument bench_* functions that exercise the performance-critical paths; they are timed against the current code before your code replaces it.
         IMPORTANT: Never use API keys or secrets in your code. Only use open-source, free APIs and free Python libraries for your needs.
         ALWAYS BE HONEST AND TRUTHFUL. Never lie, deceive, or pretend that code or files exist when they do not.
         Always use the available tools to gather accurate information and verify the existence of files before referencing them.
@@ -134,14 +171,27 @@ class AgenticWorkflow:
         # Extract code from the agent's response
         agent_code = self.agent_functions.extract_code(agent_response)
         if agent_code:
-            self.code = agent_code[0]['code'] if agent_code else ""
-            self.memory[agent].append({"role": "assistant", "content": f"Code created: {self.code}"})
+            if self.check_performance(agent, agent_code[0]['code']):
+                self.code = agent_code[0]['code']
+                self.memory[agent].append({"role": "assistant", "content": f"Code created: {self.code}"})
+        self.index_agent_output(agent, agent_response, kind="code" if agent_code else "agent_output")
 
-        # Update the agent's memory with the current files and their contents
+        # File contents are indexed for retrieval rather than copied into memory
         workspace_files = self.code_execution_manager.list_files_in_workspace().get("files", [])
         self.memory[agent].append({"role": "assistant", "content": f"Files in workspace: {workspace_files}"})
-        file_contents = self.read_multiple_files(workspace_files)
-        self.memory[agent].append({"role": "assistant", "content": f"Current files and their contents: {file_contents}"})
+
+    def check_performance(self, agent, new_code):
+        """Benchmark new_code against the current code; returns False if the revision is rejected for regressing."""
+        gate_result = self.perf_gate.check(self.code_file, new_code, old_code=self.code or None)
+        if gate_result["status"] == "skipped":
+            return True
+        print(gate_result["summary"])
+        self.perf_report = gate_result["summary"]
+        self.memory[agent].append({"role": "assistant", "content": gate_result["summary"]})
+        if gate_result["status"] == "rejected":
+            self.memory[agent].append({"role": "assistant", "content": "Code rejected: it is slower or uses more memory than the current code, which is kept. Fix the regressions listed above."})
+            return False
+        return True
 
     def perform_code_review_and_deployment(self):
         self.agent_functions.print_block("Alex's Code Review")
@@ -151,12 +201,15 @@ class AgenticWorkflow:
         IMPORTANT: Be honest and truthful in your review. If the code does not exist or has issues, clearly state that.
         Do not pretend that non-existent code or files exist. Use the available tools to verify the existence of files and gather accurate information before providing your review.
         {self.get_report()}
+        {self.perf_report}
+        {self.perf_gate.trend(self.code_file)}
         {self.code}
         """
         alex_review_response = self.agent_functions.agent_chat(alex_review_input, self.system_messages["alex"], self.memory["alex"], "llama3-70b-8192", 0.5, agent_name="Alex")
         print(f"Alex's Code Review:\n{alex_review_response}")
 
         self.memory["alex"].append({"role": "assistant", "content": f"Code review completed. Feedback: {alex_review_response}"})
+        self.index_agent_output("alex", alex_review_response, kind="review")
 
     def verify_profit_generation(self, date_time):
         self.agent_functions.print_block("Verifying Real Profit Generation")
@@ -178,13 +231,30 @@ class AgenticWorkflow:
         for agent in ["mike", "annie", "alex"]:
             self.memory[agent].append({"role": "assistant", "content": f"Iteration completed. Code created from scratch and verified for real profit generation. Code saved in the workspace. Current time: {date_time}, current profit status: {self.profit_status}, report: {self.report}, Bob's message: {self.bob_message}"})
 
-    def read_multiple_files(self, files):
-        content = ""
+    def retrieve_task_context(self, task, workspace_files):
+        if not self.context_retriever:
+            return ""
+        try:
+            self.context_retriever.index_files(self.read_workspace_files(workspace_files), iteration=self.current_iteration)
+        except Exception as e:
+            print(f"Error indexing workspace files: {e}")
+        return self.context_retriever.build_context(task.get("task", ""))
+
+    def index_agent_output(self, agent, content, kind):
+        if not self.context_retriever:
+            return
+        try:
+            self.context_retriever.index_agent_output(agent, content, iteration=self.current_iteration, kind=kind)
+        except Exception as e:
+            print(f"Error indexing {agent}'s output: {e}")
+
+    def read_workspace_files(self, files):
+        contents = {}
         for file in files:
             file_content = self.code_execution_manager.read_file(file)
             if file_content and file_content.get("status") == "success":
-                content += f"File: {file}\n{file_content.get('content', '')}\n\n"
-        return content
+                contents[file] = file_content.get("content", "")
+        return contents
 
 if __name__ == "__main__":
     workflow = AgenticWorkflow()
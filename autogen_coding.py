@@ -1,5 +1,34 @@
 import os
 import autogen
+from autogen.code_utils import DEFAULT_TIMEOUT
+from fork_server import shared_sandbox
+
+
+class WarmUserProxyAgent(autogen.UserProxyAgent):
+    """UserProxyAgent that runs Python code blocks in children forked from a warm interpreter."""
+
+    def __init__(self, *args, sandbox=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sandbox = sandbox or shared_sandbox()
+
+    def run_code(self, code, **kwargs):
+        lang = kwargs.get("lang")
+        if lang not in (None, "python", "Python", "py", "python3"):
+            return super().run_code(code, **kwargs)
+        work_dir = kwargs.get("work_dir") or "workspace"
+        os.makedirs(work_dir, exist_ok=True)
+        filename = kwargs.get("filename")
+        timeout = kwargs.get("timeout") or DEFAULT_TIMEOUT  # What autogen's own executor allows
+        if filename:
+            with open(os.path.join(work_dir, filename), "w", encoding="utf-8") as f:
+                f.write(code)
+            result = self.sandbox.run_python(filename, cwd=work_dir, timeout=timeout)
+        else:
+            result = self.sandbox.run_code(code, cwd=work_dir, timeout=timeout)
+        if result["timed_out"]:
+            return 1, "Timeout", None
+        return result["returncode"], result["stdout"] + result["stderr"], None
+
 
 class AutogenCoding:
     def __init__(self, config_list_path="OAI_CONFIG_LIST.json"):
@@ -13,7 +42,7 @@ class AutogenCoding:
         self._initialize_agents()
 
     def _initialize_agents(self):
-        self.user_proxy = autogen.UserProxyAgent(
+        self.user_proxy = WarmUserProxyAgent(
             name="User",
             system_message="Executor. Execute the code written by the coder and suggest updates if there are errors.",
             human_input_mode="NEVER",
@@ -0,0 +1,273 @@
+"""
+Offline benchmark for the web research pipeline.
+
+Serves a synthetic search results page and synthetic multi-page sites from a
+local HTTP server, then drives extract_text_from_url, crawl_website and
+web_research against it. The search step is done over plain HTTP by default;
+pass --selenium to drive the fixture search page with headless Chrome instead.
+Extraction time is summed over the crawler threads, so it can exceed wall time.
+
+    python benchmarks/browser_benchmark.py --sites 10 --pages-per-site 40 --latency 0.05
+"""
+import argparse
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import browser_tools
+
+VOCABULARY = (
+    "python web scraping crawler request response parser html selector cache "
+    "latency throughput session cookie header redirect robots sitemap index "
+    "garden recipe travel weather music football history painting novel"
+).split()
+
+
+class FixtureServer:
+    """
+    Local HTTP server with a search page at /search and sites at /site<n>/.
+
+    Page p of a site links to pages p * fan_out + 1 ... p * fan_out + fan_out,
+    up to pages_per_site, plus a few navigation links. Every response is
+    delayed by latency seconds, and content pages carry about page_size bytes
+    of pseudo-random text seeded by their path, so they are stable across runs
+    and distinct enough not to be collapsed as near-duplicates.
+    """
+
+    def __init__(self, sites=5, pages_per_site=30, fan_out=4, page_size=8000, latency=0.02, cacheable=True):
+        self.sites = sites
+        self.pages_per_site = pages_per_site
+        self.fan_out = fan_out
+        self.page_size = page_size
+        self.latency = latency
+        self.cacheable = cacheable
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reset_counters(self):
+        with self._lock:
+            counters = (self.requests, self.bytes_sent)
+            self.requests = self.bytes_sent = 0
+        return counters
+
+    def search_page(self, query):
+        if query is None:
+            return '<html><body><form action="/search"><input name="q" type="text"></form></body></html>'
+        results = "".join(
+            f'<div class="result"><a href="{self.base_url}/site{i}/">Site {i}: {query}</a><p>Snippet {i}</p></div>'
+            for i in range(self.sites)
+        )
+        return f'<html><body><form action="/search"><input name="q" type="text" value="{query}"></form>{results}</body></html>'
+
+    def content_page(self, site, page):
+        rng = random.Random(f"{site}-{page}")
+        paragraphs, size = [], 0
+        while size < self.page_size:
+            paragraph = " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(30, 80))).capitalize() + "."
+            paragraphs.append(f"<p>{paragraph}</p>")
+            size += len(paragraph)
+        children = [child for child in range(page * self.fan_out + 1, page * self.fan_out + self.fan_out + 1) if child < self.pages_per_site]
+        links = "".join(f'<li><a href="/site{site}/p{child}">{rng.choice(VOCABULARY)} {rng.choice(VOCABULARY)}</a></li>' for child in children)
+        navigation = f'<nav><a href="/site{site}/">Home</a><a href="/site{site}/tag/misc">Tags</a><a href="/site{site}/login">Login</a></nav>'
+        return (f"<html><head><title>Site {site} page {page}</title></head><body>{navigation}"
+                f"<article><h1>Site {site} page {page}</h1>{''.join(paragraphs)}</article><ul>{links}</ul></body></html>")
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                time.sleep(server.latency)
+                parsed = urlparse(self.path)
+                parts = [part for part in parsed.path.split("/") if part]
+                status, body = 200, None
+                if parts == ["search"]:
+                    body = server.search_page(parse_qs(parsed.query).get("q", [None])[0])
+                elif parts and parts[0].startswith("site") and parts[0][4:].isdigit():
+                    page = parts[1][1:] if len(parts) == 2 and parts[1].startswith("p") else "0" if len(parts) == 1 else None
+                    if page is not None and page.isdigit() and int(page) < server.pages_per_site:
+                        body = server.content_page(int(parts[0][4:]), int(page))
+                    elif len(parts) > 1:
+                        body = "<html><body><p>Navigation page.</p></body></html>"
+                if body is None:
+                    status, body = 404, "<html><body>Not found</body></html>"
+                payload = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.send_header("Cache-Control", "max-age=3600" if server.cacheable else "no-store")
+                self.end_headers()
+                self.wfile.write(payload)
+                with server._lock:
+                    server.requests += 1
+                    server.bytes_sent += len(payload)
+
+        return Handler
+
+
+class BenchmarkResearchTool(browser_tools.WebResearchTool):
+    """WebResearchTool that times text extraction and, unless use_selenium is set, searches over plain HTTP."""
+
+    def __init__(self, use_selenium=False, **kwargs):
+        super().__init__(prewarm_drivers=1 if use_selenium else 0, **kwargs)
+        self.use_selenium = use_selenium
+        self.extraction_seconds = 0.0
+        self.extractions = 0
+        self._timing_lock = threading.Lock()
+
+    def extract_text_from_html(self, html, url):
+        start = time.perf_counter()
+        try:
+            return super().extract_text_from_html(html, url)
+        finally:
+            with self._timing_lock:
+                self.extraction_seconds += time.perf_counter() - start
+                self.extractions += 1
+
+    def extract_text_with_browser(self, url):
+        return super().extract_text_with_browser(url) if self.use_selenium else None
+
+    def search_engine(self, engine_url, engine_name, query, wait_timeout=browser_tools.search_wait_timeout):
+        if self.use_selenium:
+            return super().search_engine(engine_url, engine_name, query, wait_timeout)
+        response = self.session.get(engine_url, params={"q": query}, timeout=wait_timeout)
+        response.raise_for_status()
+        soup = BeautifulSoup(response.text, "html.parser")
+        return soup.select("div.result")[:browser_tools.max_search_results]
+
+
+def max_rss_mb():
+    if resource is None:
+        return float("nan")
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_scenario(label, server, tool, func, *args):
+    server.reset_counters()
+    tool.extraction_seconds, tool.extractions = 0.0, 0
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    requests_served, bytes_served = server.reset_counters()
+    _, peak = tracemalloc.get_traced_memory()
+    print(f"{label:<32} {elapsed:8.2f} s  {requests_served:6d} req  {requests_served / elapsed:8.1f} pages/s  "
+          f"{bytes_served / elapsed / 1024:9.1f} KiB/s  extract {tool.extraction_seconds:6.2f} s "
+          f"({tool.extractions} pages)  peak {peak / (1024 * 1024):7.1f} MiB")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sites", type=int, default=5)
+    parser.add_argument("--pages-per-site", type=int, default=30)
+    parser.add_argument("--fan-out", type=int, default=4, help="Content links per page")
+    parser.add_argument("--page-size", type=int, default=8000, help="Approximate text bytes per page")
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds added to every response")
+    parser.add_argument("--extract-pages", type=int, default=20)
+    parser.add_argument("--query", default="python web scraping crawler")
+    parser.add_argument("--no-cache-headers", action="store_true", help="Serve Cache-Control: no-store")
+    parser.add_argument("--per-host-delay", type=float, default=0.0,
+                        help="Crawler politeness delay; every fixture site shares one host")
+    parser.add_argument("--per-host-concurrency", type=int, default=8)
+    parser.add_argument("--selenium", action="store_true", help="Search through headless Chrome")
+    parser.add_argument("--directory", default=None, help="Working directory for caches (a temporary one is used by default)")
+    parser.add_argument("--verbose", action="store_true", help="Keep the research pipeline's INFO logging")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+        # Every fixture site shares one host, which overflows urllib3's per-host connection pool
+        logging.getLogger("urllib3.connectionpool").setLevel(logging.ERROR)
+
+    directory = args.directory or tempfile.mkdtemp(prefix="browser_benchmark_")
+    os.makedirs(directory, exist_ok=True)
+    os.chdir(directory)
+    browser_tools.selector_state_path = os.path.join(directory, "selector_rl_state.json")
+    browser_tools.per_host_delay = args.per_host_delay
+    browser_tools.per_host_concurrency = args.per_host_concurrency
+
+    server = FixtureServer(args.sites, args.pages_per_site, args.fan_out, args.page_size, args.latency,
+                           cacheable=not args.no_cache_headers).start()
+    print(f"Browser benchmark: {args.sites} sites x {args.pages_per_site} pages, fan-out {args.fan_out}, "
+          f"~{args.page_size} bytes/page, {args.latency * 1000:.0f} ms latency, server {server.base_url}, caches in {directory}")
+
+    tracemalloc.start()
+    tools = []
+
+    def make_tool(name):
+        browser_tools.http_cache_directory = os.path.join(directory, name, "http")
+        browser_tools.simhash_index_path = os.path.join(directory, name, "simhash.sqlite")
+        tool = BenchmarkResearchTool(use_selenium=args.selenium)
+        tool.search_engines = [(f"{server.base_url}/search", "brave")]
+        tools.append(tool)
+        return tool
+
+    try:
+        # Untimed: the first multi-threaded extraction pays one-off parser initialisation
+        warmup = make_tool("warmup")
+        warmup.crawl_website(f"{server.base_url}/site{args.sites - 1}/")
+        server.reset_counters()
+
+        tool = make_tool("extract")
+        urls = [f"{server.base_url}/site{i % args.sites}/p{i // args.sites}" for i in range(args.extract_pages)]
+        extract_all = lambda: [tool.extract_text_from_url(url) for url in urls]
+        run_scenario("extract_text_from_url (cold)", server, tool, extract_all)
+        run_scenario("extract_text_from_url (cached)", server, tool, extract_all)
+
+        tool = make_tool("crawl")
+        site = f"{server.base_url}/site0/"
+        run_scenario("crawl_website (breadth-first)", server, tool, tool.crawl_website, site)
+        tool = make_tool("crawl_query")
+        run_scenario("crawl_website (query-guided)", server, tool, lambda: tool.crawl_website(site, query=args.query))
+
+        tool = make_tool("research")
+        run_scenario("web_research (cold)", server, tool, tool.web_research, args.query)
+        run_scenario("web_research (cached)", server, tool, tool.web_research, args.query)
+    finally:
+        for tool in tools:
+            tool.close()
+        server.stop()
+        tracemalloc.stop()
+        print(f"{'max RSS':<32} {max_rss_mb():8.1f} MiB")
+        if not args.directory:
+            os.chdir(os.path.dirname(directory))
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
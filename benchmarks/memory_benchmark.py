@@ -0,0 +1,106 @@
+"""
+Offline load test for the memory subsystem.
+
+Runs indexing, retrieval and summarization against the built-in vector index
+with the hashing embedder and stub generator, so no Ollama server is needed.
+
+    python benchmarks/memory_benchmark.py --entries 100000
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embeddings import HashingEmbeddingProvider, StubGenerator
+from memory_ollama import MemoryManager, build_memory_filter
+
+AGENTS = ["mike", "annie", "bob", "alex"]
+KINDS = ["code", "review", "tool_output", "message"]
+VOCABULARY = (
+    "profit trading bot crypto wallet api scraper async request retry cache "
+    "database index query vector embedding memory agent review deploy test "
+    "function class module error exception timeout latency throughput budget"
+).split()
+
+
+def synthetic_memories(count, seed=0):
+    rng = random.Random(seed)
+    for i in range(count):
+        words = " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(12, 40)))
+        metadata = {"agent": rng.choice(AGENTS), "kind": rng.choice(KINDS), "iteration": i // 1000}
+        yield f"mem-{i}", f"Entry {i}. {words}.", metadata
+
+
+def timed(label, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed * 1000:10.1f} ms")
+    return result, elapsed
+
+
+def query_latency(memory_manager, queries, **kwargs):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        memory_manager.search_memories(query, **kwargs)
+        latencies.append(time.perf_counter() - start)
+    return np.percentile(latencies, [50, 95]) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--ivf-clusters", type=int, default=0, help="0 uses sqrt(entries)")
+    parser.add_argument("--directory", default=None, help="Index directory (a temporary one is used by default)")
+    args = parser.parse_args()
+
+    directory = args.directory or tempfile.mkdtemp(prefix="memory_benchmark_")
+    memory_manager = MemoryManager(
+        backend="numpy",
+        index_directory=directory,
+        batch_size=args.batch_size,
+        embedding_provider=HashingEmbeddingProvider(dimension=args.dimension),
+        generator=StubGenerator(),
+    )
+    memories = list(synthetic_memories(args.entries))
+    print(f"Memory benchmark: {args.entries} entries, dimension {args.dimension}, index at {directory}")
+
+    _, elapsed = timed("save_memories", memory_manager.save_memories, memories)
+    print(f"{'  insert rate':<40} {args.entries / elapsed:10.0f} entries/s")
+    _, elapsed = timed("save_memories (all cached by manifest)", memory_manager.save_memories, memories)
+
+    queries = [" ".join(random.Random(i).sample(VOCABULARY, 4)) for i in range(args.queries)]
+    for label, kwargs in [
+        ("top-5 exact", {"k": 5}),
+        ("top-5 agent+iteration filter", {"k": 5, "where": build_memory_filter(agent="mike", iteration_range=(0, 10))}),
+        ("top-5 MMR", {"k": 5, "mmr": True}),
+    ]:
+        p50, p95 = query_latency(memory_manager, queries, **kwargs)
+        print(f"{'query ' + label:<40} p50 {p50:8.2f} ms   p95 {p95:8.2f} ms")
+
+    collection = memory_manager.collection
+    timed("build_ivf", collection.build_ivf, n_clusters=args.ivf_clusters or None)
+    collection.ivf_min_vectors = 0
+    p50, p95 = query_latency(memory_manager, queries, k=5)
+    print(f"{'query top-5 IVF':<40} p50 {p50:8.2f} ms   p95 {p95:8.2f} ms")
+
+    chunk_texts = ["\n".join(content for _, content, _ in memories[i:i + 2000]) for i in range(0, len(memories), 2000)]
+    timed(f"summarize {len(chunk_texts)} chunks (stub generator)", memory_manager.generate_responses, "Summarize:", chunk_texts)
+
+    if not args.directory:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
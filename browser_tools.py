@@ -11,26 +11,73 @@ from selenium.webdriver.chrome.service import Service as ChromeService
 from webdriver_manager.chrome import ChromeDriverManager
 import trafilatura
 from selenium.common.exceptions import WebDriverException, NoSuchElementException, TimeoutException
-import requests
+import heapq
+import itertools
 import json
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import math
+import os
+import queue
+import tempfile
 import networkx as nx
 import logging
 import time
+import threading
+from contextlib import contextmanager
 from requests.exceptions import RequestException
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from urllib.parse import urlparse, urljoin
+from crawler import ByteBudget, Crawler, HostLimiter
+from http_cache import CachingSession
+from relevance import RelevanceScorer
+from dedup import SimHashIndex, Deduplicator
+from summarizer import TextRankSummarizer
+from utils.paths import data_path
 
 max_content_length = 5000  # Increased for more comprehensive results
 max_retries = 3
 retry_delay = 5
 max_pages_per_site = 10  # Increased for more thorough crawling
 max_search_results = 10  # Increased number of search results to process
+driver_pool_size = 3  # Concurrent headless Chrome instances shared by all research threads
+driver_max_uses = 50  # Recycle a browser after this many checkouts to bound memory growth
+engine_deadline = 60  # Seconds to wait for each search engine in fan-out mode
+early_stop_similarity = 0.3  # Research stops once results above this fill max_content_length
+top_k_results = 20  # Best results kept while streaming
+max_crawl_bytes = 20000000  # Download budget shared by every site crawled for one query
+crawl_workers = 4  # Concurrent page fetches per crawled site
+per_host_concurrency = 2
+per_host_delay = 0.5  # Minimum seconds between request starts to one host
+crawl_max_depth = 3  # Clicks from the search result page
+crawl_min_link_score = 0.05  # Links the crawler scores below this against the query are not fetched
+http_cache_directory = data_path("cache", "http")
+min_similarity = 0.1  # Pages scoring below this are dropped
+simhash_index_path = data_path("cache", "simhash.sqlite")
+summary_max_tokens = 400  # Budget for the web_search tool result fed back to the agent
+engines_per_query = 3  # Upper bound on engines queried for one web_research call
+search_wait_timeout = 10  # Longest WebDriverWait on a search page
+min_search_wait_timeout = 3
+engine_latency_window = 50  # Recent search latencies kept per engine for percentiles
+engine_yield_scale = 2000  # Relevant bytes/s at which an engine run earns half the maximum reward
+engine_min_runs = 3  # Runs observed before an engine may be skipped
+engine_max_consecutive_failures = 3
+engine_retry_after = 1800  # Seconds before a skipped engine is probed again
+state_save_interval = 60  # Minimum seconds between selector_rl_state.json rewrites
+selector_state_path = data_path("selector_rl_state.json")
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class SelectorRL:
+    """
+    Learns which CSS selectors work on each search engine and schedules the engines themselves.
+
+    For every engine it keeps recent search latencies, the failure rate and the
+    relevant bytes returned per second of research time. schedule_engines()
+    orders engines with UCB1 on that yield, and skips engines that keep failing
+    or whose latency does not fit the budget, probing them again only after
+    engine_retry_after seconds. State is written atomically, and at most once
+    every state_save_interval seconds unless forced; WebResearchTool.close()
+    forces the final save.
+    """
+
     def __init__(self):
         self.selectors = {
             "google": {
@@ -47,47 +94,392 @@ class SelectorRL:
             }
         }
         self.q_values = {engine: {selector: 0 for selector_type in selectors.values() for selector in selector_type} for engine, selectors in self.selectors.items()}
+        self.engine_stats = {}
         self.learning_rate = 0.1
         self.discount_factor = 0.9
         self.epsilon = 0.1
+        # Engines are searched concurrently, so updates go through a lock
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._last_save = 0.0
 
     def get_selector(self, engine, selector_type):
-        if random.random() < self.epsilon:
-            return random.choice(self.selectors[engine][selector_type])
-        else:
-            return max(self.selectors[engine][selector_type], key=lambda s: self.q_values[engine][s])
+        with self._lock:
+            if random.random() < self.epsilon:
+                return random.choice(self.selectors[engine][selector_type])
+            else:
+                return max(self.selectors[engine][selector_type], key=lambda s: self.q_values[engine][s])
 
     def update_q_value(self, engine, selector, reward):
-        self.q_values[engine][selector] += self.learning_rate * (reward - self.q_values[engine][selector])
+        with self._lock:
+            self.q_values[engine][selector] += self.learning_rate * (reward - self.q_values[engine][selector])
+            self._dirty = True
 
     def add_new_selector(self, engine, selector_type, new_selector):
-        if new_selector not in self.selectors[engine][selector_type]:
-            self.selectors[engine][selector_type].append(new_selector)
-            self.q_values[engine][new_selector] = 0
-
-    def save_state(self, filename='selector_rl_state.json'):
-        state = {
-            'q_values': self.q_values,
-            'selectors': self.selectors
+        with self._lock:
+            if new_selector not in self.selectors[engine][selector_type]:
+                self.selectors[engine][selector_type].append(new_selector)
+                self.q_values[engine][new_selector] = 0
+                self._dirty = True
+
+    # Engine scheduling
+
+    def _engine(self, engine):
+        return self.engine_stats.setdefault(engine, {
+            "runs": 0, "failures": 0, "consecutive_failures": 0, "latencies": [],
+            "relevant_bytes": 0, "seconds": 0.0, "mean_reward": 0.0, "last_run": 0.0
+        })
+
+    def record_engine_run(self, engine, search_latency, total_seconds, success, relevant_bytes):
+        """Record one research_engine call: search page latency, total time, whether results came back, and useful bytes."""
+        with self._lock:
+            stats = self._engine(engine)
+            stats["runs"] += 1
+            stats["last_run"] = time.time()
+            stats["latencies"] = (stats["latencies"] + [search_latency])[-engine_latency_window:]
+            if success:
+                stats["consecutive_failures"] = 0
+            else:
+                stats["failures"] += 1
+                stats["consecutive_failures"] += 1
+            stats["relevant_bytes"] += relevant_bytes
+            stats["seconds"] += total_seconds
+            # Saturating reward in [0, 1) so UCB1's confidence bound applies
+            yield_rate = relevant_bytes / max(total_seconds, 1e-3)
+            reward = yield_rate / (yield_rate + engine_yield_scale) if success else 0.0
+            stats["mean_reward"] += (reward - stats["mean_reward"]) / stats["runs"]
+            self._dirty = True
+
+    def latency_percentile(self, engine, percentile):
+        with self._lock:
+            latencies = self.engine_stats.get(engine, {}).get("latencies")
+            return float(np.percentile(latencies, percentile)) if latencies else None
+
+    def failure_rate(self, engine):
+        with self._lock:
+            stats = self.engine_stats.get(engine)
+            return stats["failures"] / stats["runs"] if stats and stats["runs"] else 0.0
+
+    def yield_rate(self, engine):
+        """Relevant bytes per second of research time."""
+        with self._lock:
+            stats = self.engine_stats.get(engine)
+            return stats["relevant_bytes"] / stats["seconds"] if stats and stats["seconds"] else 0.0
+
+    def engine_summary(self):
+        return {
+            engine: {
+                "p50_latency": self.latency_percentile(engine, 50),
+                "p90_latency": self.latency_percentile(engine, 90),
+                "failure_rate": self.failure_rate(engine),
+                "relevant_bytes_per_second": self.yield_rate(engine)
+            }
+            for engine in list(self.engine_stats)
         }
-        with open(filename, 'w') as f:
-            json.dump(state, f)
 
-    def load_state(self, filename='selector_rl_state.json'):
+    def should_skip(self, engine, latency_budget):
+        """An engine is skipped while it keeps failing or is too slow for the budget, until its retry cooldown expires."""
+        with self._lock:
+            stats = self.engine_stats.get(engine)
+            if not stats or stats["runs"] < engine_min_runs or time.time() - stats["last_run"] >= engine_retry_after:
+                return False
+            if stats["consecutive_failures"] >= engine_max_consecutive_failures:
+                return True
+            p50 = self.latency_percentile(engine, 50)
+            return p50 is not None and p50 > latency_budget
+
+    def schedule_engines(self, engines, latency_budget, max_engines=None):
+        """
+        Choose and order engines for one query.
+
+        Args:
+            engines (list): Engine names to choose from.
+            latency_budget (float): Seconds the caller is willing to wait.
+            max_engines (int): Upper bound on the number of engines returned.
+
+        Returns:
+            list: Engine names, best first. Never empty if engines is not.
+        """
+        with self._lock:
+            total_runs = sum(self.engine_stats.get(engine, {}).get("runs", 0) for engine in engines)
+
+            def ucb(engine):
+                stats = self.engine_stats.get(engine)
+                if not stats or not stats["runs"]:
+                    return float("inf")  # Try every engine at least once
+                return stats["mean_reward"] + math.sqrt(2 * math.log(max(total_runs, 1)) / stats["runs"])
+
+            ranked = sorted(engines, key=ucb, reverse=True)
+            chosen = [engine for engine in ranked if not self.should_skip(engine, latency_budget)] or ranked[:1]
+            skipped = [engine for engine in ranked if engine not in chosen]
+        if skipped:
+            logging.info(f"Skipping slow or blocked search engines: {', '.join(skipped)}")
+        return chosen[:max_engines] if max_engines else chosen
+
+    def wait_timeout(self, engine, latency_budget):
+        """WebDriverWait timeout for an engine: a margin over its observed p90 search latency, capped by the budget."""
+        p90 = self.latency_percentile(engine, 90)
+        timeout = search_wait_timeout if p90 is None else max(min_search_wait_timeout, 2 * p90)
+        return max(min_search_wait_timeout, min(timeout, search_wait_timeout, latency_budget))
+
+    # Persistence
+
+    def save_state(self, filename=None, force=False):
+        """Write state if it changed, at most every state_save_interval seconds unless force is set."""
+        filename = filename or selector_state_path
+        with self._lock:
+            if not self._dirty or (not force and time.monotonic() - self._last_save < state_save_interval):
+                return False
+            state = {
+                'q_values': self.q_values,
+                'selectors': self.selectors,
+                'engine_stats': self.engine_stats
+            }
+            directory = os.path.dirname(os.path.abspath(filename))
+            os.makedirs(directory, exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', dir=directory, prefix='.selector_rl_', suffix='.tmp', delete=False) as f:
+                json.dump(state, f)
+            os.replace(f.name, filename)
+            self._dirty = False
+            self._last_save = time.monotonic()
+            return True
+
+    def load_state(self, filename=None):
+        filename = filename or selector_state_path
         try:
             with open(filename, 'r') as f:
                 state = json.load(f)
             self.q_values = state['q_values']
             self.selectors = state['selectors']
+            self.engine_stats = state.get('engine_stats', {})
+            self._last_save = time.monotonic()
         except FileNotFoundError:
             logging.info("No saved state found. Starting with default values.")
+
+
+_chromedriver_path = None
+_chromedriver_lock = threading.Lock()
+
+
+def get_chromedriver_path():
+    """Resolve the chromedriver binary once per process instead of on every browser launch."""
+    global _chromedriver_path
+    with _chromedriver_lock:
+        if _chromedriver_path is None:
+            _chromedriver_path = ChromeDriverManager().install()
+        return _chromedriver_path
+
+
+class WebDriverPool:
+    """
+    Bounded pool of headless Chrome drivers shared across research threads.
+
+    Drivers are created on demand up to `size`, health-checked on checkout,
+    reset to a blank page on checkin and recycled after `max_uses` checkouts.
+    The lock only guards the pool's bookkeeping; health checks, resets and
+    quits talk to the browser outside it, so one slow driver does not hold
+    up every other thread.
+    """
+
+    def __init__(self, driver_factory, size=driver_pool_size, max_uses=driver_max_uses):
+        self.driver_factory = driver_factory
+        self.size = size
+        self.max_uses = max_uses
+        self._idle = []
+        self._uses = {}
+        self._created = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def warm(self, count=1):
+        """Launch up to `count` drivers ahead of time so the first search does not pay for startup."""
+        for _ in range(count):
+            with self._condition:
+                if self._closed or self._created >= self.size:
+                    return
+                self._created += 1
+            try:
+                driver = self.driver_factory()
+            except Exception as e:
+                with self._condition:
+                    self._created -= 1
+                logging.warning(f"Failed to pre-warm WebDriver: {e}")
+                return
+            with self._condition:
+                closed = self._closed
+                if closed:
+                    self._created -= 1
+                else:
+                    self._uses[id(driver)] = 0
+                    self._idle.append(driver)
+                    self._condition.notify()
+            if closed:
+                self._quit(driver)
+                return
+
+    def warm_async(self, count=1):
+        threading.Thread(target=self.warm, args=(count,), name="webdriver-warmup", daemon=True).start()
+
+    @staticmethod
+    def _is_healthy(driver):
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def _forget(self, driver):
+        """Drop a driver from the pool's bookkeeping; call with the lock held, then quit the driver outside it."""
+        self._uses.pop(id(driver), None)
+        self._created -= 1
+        self._condition.notify()
+
+    @staticmethod
+    def _quit(driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def checkout(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._condition:
+                while True:
+                    if self._closed:
+                        raise WebDriverException("WebDriver pool is closed")
+                    if self._idle:
+                        driver = self._idle.pop()
+                        break
+                    if self._created < self.size:
+                        self._created += 1
+                        driver = None
+                        break
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutException("Timed out waiting for a WebDriver from the pool")
+                    self._condition.wait(remaining)
+            if driver is None:
+                break
+            # Still counted in _created while it is checked, so no other thread can take its place
+            if self._is_healthy(driver):
+                with self._condition:
+                    self._uses[id(driver)] += 1
+                return driver
+            with self._condition:
+                self._forget(driver)
+            self._quit(driver)
+
+        try:
+            driver = self.driver_factory()
+        except Exception:
+            with self._condition:
+                self._created -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._uses[id(driver)] = 1
+        return driver
+
+    def checkin(self, driver):
+        with self._condition:
+            recycle = self._closed or self._uses.get(id(driver), 0) >= self.max_uses
+        if not recycle:
+            try:
+                driver.delete_all_cookies()
+                driver.get("about:blank")
+            except Exception:
+                recycle = True
+        with self._condition:
+            if recycle or self._closed:
+                self._forget(driver)
+                recycle = True
+            else:
+                self._idle.append(driver)
+                self._condition.notify()
+        if recycle:
+            self._quit(driver)
+
+    @contextmanager
+    def driver(self, timeout=None):
+        driver = self.checkout(timeout)
+        try:
+            yield driver
+        finally:
+            self.checkin(driver)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            for driver in idle:
+                self._forget(driver)
+            self._condition.notify_all()
+        for driver in idle:
+            self._quit(driver)
+
+
+class TopResults:
+    """
+    Bounded min-heap of the k most similar results seen so far.
+
+    is_full() is true once the best results, taken in order until their
+    content fills content_budget characters, all score at least confidence.
+    """
+
+    def __init__(self, k, content_budget, confidence):
+        self.k = k
+        self.content_budget = content_budget
+        self.confidence = confidence
+        self._heap = []
+        self._counter = itertools.count()  # Tie-breaker so result dicts are never compared
+
+    def push(self, result):
+        entry = (result['similarity'], next(self._counter), result)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[0] > self._heap[0][0]:
+            heapq.heapreplace(self._heap, entry)
+
+    def sorted(self):
+        return [result for _, _, result in sorted(self._heap, key=lambda entry: (-entry[0], entry[1]))]
+
+    def is_full(self):
+        filled = 0
+        for result in self.sorted():
+            if result['similarity'] < self.confidence:
+                return False
+            filled += len(result['content'])
+            if filled >= self.content_budget:
+                return True
+        return False
+
+
 class WebResearchTool:
-    def __init__(self, max_content_length=max_content_length):
+    def __init__(self, max_content_length=max_content_length, prewarm_drivers=0):
         self.max_content_length = max_content_length
+        self.search_engines = [
+            ("https://www.google.com/search", "google"),
+            ("https://www.bing.com/search", "bing"),
+            ("https://search.brave.com/search", "brave")
+        ]
+        self.engine_deadline = engine_deadline
+        self.driver_pool = WebDriverPool(self._initialize_webdriver)
+        # Chrome starts on the first search unless asked to pre-warm, so building the tool stays cheap
+        if prewarm_drivers:
+            self.driver_pool.warm_async(prewarm_drivers)
         self.selector_rl = SelectorRL()
         self.selector_rl.load_state()
-        self.vectorizer = TfidfVectorizer()
-        self.session = requests.Session()
+        # Sites are scored as they finish, so scores must not depend on the batch they arrive in
+        self.scorer = RelevanceScorer(streaming=True)
+        # Shared by every Crawler, so per-host limits hold across all sites and engines
+        self.host_limiter = HostLimiter(per_host_concurrency, per_host_delay)
+        self.crawl_budget = ByteBudget(max_crawl_bytes)
+        self.session = CachingSession(directory=http_cache_directory)
+        self.last_cache_stats = None
+        self.simhash_index = SimHashIndex(simhash_index_path)
+        self.last_dedup_stats = None
+        self.summarizer = TextRankSummarizer(max_tokens=summary_max_tokens)
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
@@ -101,7 +493,7 @@ class WebResearchTool:
         options.add_argument('--disable-extensions')
         options.add_argument('--disable-browser-side-navigation')
         options.add_argument('--disable-features=VizDisplayCompositor')
-        service = ChromeService(ChromeDriverManager().install())
+        service = ChromeService(get_chromedriver_path())
         return webdriver.Chrome(service=service, options=options)
 
     def find_new_selector(self, driver, element_type):
@@ -145,23 +537,39 @@ class WebResearchTool:
             return path.join(' > ');
         """, element)
 
+    def extract_text_from_html(self, html, url):
+        """Extract the main text from an already-downloaded page, rendering it in Chrome only if needed."""
+        found, text = self.session.get_extracted_text(html)
+        if found:
+            return text
+        text = trafilatura.extract(html, include_comments=False, include_tables=False)
+        if not text or len(text) < 50:
+            text = self.extract_text_with_browser(url)
+        if text:
+            self.session.put_extracted_text(html, text)
+        return text
+
+    def extract_text_with_browser(self, url):
+        try:
+            with self.driver_pool.driver() as driver:
+                driver.get(url)
+                WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+                page_source = driver.page_source
+        except WebDriverException as e:
+            logging.warning(f"Browser extraction failed for {url}: {e}")
+            return None
+        soup = BeautifulSoup(page_source, 'html.parser')
+        for element in soup(['script', 'style', 'nav', 'footer', 'aside']):
+            element.decompose()
+        text = ' '.join(p.get_text().strip() for p in soup.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li']) if len(p.get_text().strip()) > 20)
+        return text if len(text) >= 50 else None
+
     def extract_text_from_url(self, url):
         for attempt in range(max_retries):
             try:
                 response = self.session.get(url, timeout=10)
                 response.raise_for_status()
-                text = trafilatura.extract(response.text, include_comments=False, include_tables=False)
-                if text and len(text) >= 50:
-                    return text
-
-                driver = self._initialize_webdriver()
-                driver.get(url)
-                WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-                soup = BeautifulSoup(driver.page_source, 'html.parser')
-                for element in soup(['script', 'style', 'nav', 'footer', 'aside']):
-                    element.decompose()
-                text = ' '.join(p.get_text().strip() for p in soup.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li']) if len(p.get_text().strip()) > 20)
-                return text if len(text) >= 50 else None
+                return self.extract_text_from_html(response.text, url)
             except RequestException as e:
                 logging.warning(f"Error extracting text from URL {url}: {e}")
                 if attempt < max_retries - 1:
@@ -169,185 +577,229 @@ class WebResearchTool:
                 else:
                     logging.error(f"Failed to extract text from URL {url} after {max_retries} attempts")
                     return None
-            finally:
-                if 'driver' in locals():
-                    driver.quit()
-
-    def crawl_website(self, url, max_pages=max_pages_per_site):
-        visited = set()
-        to_visit = [url]
-        graph = nx.DiGraph()
-        content = {}
 
+    def crawl_website(self, url, max_pages=max_pages_per_site, stop_event=None, query=None):
+        """Crawl a site best-first towards query (breadth-first without one); returns (link graph, {url: text})."""
         try:
-            while to_visit and len(visited) < max_pages:
-                current_url = to_visit.pop(0)
-                if current_url in visited:
-                    continue
-
-                visited.add(current_url)
-
-                try:
-                    response = self.session.get(current_url, timeout=10)
-                    response.raise_for_status()
-                    soup = BeautifulSoup(response.text, 'html.parser')
-
-                    # Extract content
-                    text = self.extract_text_from_url(current_url)
-                    if text:
-                        content[current_url] = text
-
-                    # Find links
-                    for link in soup.find_all('a', href=True):
-                        href = link['href']
-                        full_url = urljoin(current_url, href)
-                        if full_url.startswith(url):  # Stay on the same domain
-                            graph.add_edge(current_url, full_url)
-                            if full_url not in visited:
-                                to_visit.append(full_url)
-
-                except RequestException as e:
-                    logging.warning(f"Error crawling {current_url}: {e}")
-
-                time.sleep(1)  # Add a delay to avoid overwhelming the server
-
-            return graph, content
+            crawler = Crawler(self.session, self.extract_text_from_html, max_pages=max_pages,
+                              max_workers=crawl_workers, stop_event=stop_event, query=query,
+                              max_depth=crawl_max_depth, min_link_score=crawl_min_link_score,
+                              host_limiter=self.host_limiter, byte_budget=self.crawl_budget)
+            return crawler.crawl(url)
         except Exception as e:
             logging.error(f"Error in crawl_website: {e}")
             return nx.DiGraph(), {}
 
     def calculate_similarity(self, query, text):
-        tfidf_matrix = self.vectorizer.fit_transform([query, text])
-        return cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
-
-    def process_search_result(self, result, engine_name, query):
+        return float(self.scorer.score(query, [text])[0])
+
+    def score_results(self, query, pages):
+        """Score crawled pages against the query in one batch and keep the relevant ones."""
+        similarities = self.scorer.score(query, [page["content"] for page in pages])
+        search_results = []
+        for page, similarity in zip(pages, similarities):
+            if similarity > min_similarity:
+                search_results.append(dict(page, similarity=float(similarity)))
+        return search_results
+
+    def process_search_result(self, result, engine_name, query, stop_event=None):
+        """Crawl the site behind one search result and return its pages, unscored."""
         link = result.select_one('a')
-        if link and link.get('href'):
+        if link and link.get('href') and not (stop_event and stop_event.is_set()):
             url = link['href']
             if url.startswith('http'):
                 try:
-                    graph, crawled_content = self.crawl_website(url)
-                    search_results = []
-                    for page_url, content in crawled_content.items():
-                        similarity = self.calculate_similarity(query, content)
-                        if similarity > 0.1:  # Adjust threshold as needed
-                            search_results.append({
-                                "title": link.get_text(),
-                                "link": page_url,
-                                "content": content,
-                                "similarity": similarity
-                            })
-                    return search_results
+                    _, crawled_content = self.crawl_website(url, stop_event=stop_event, query=query)
+                    return [
+                        {"title": link.get_text(), "link": page_url, "content": content}
+                        for page_url, content in crawled_content.items()
+                    ]
                 except Exception as e:
                     logging.error(f"Error processing search result from {engine_name}: {e}")
         return []
 
-    def web_research(self, query):
-        combined_query = query
-        search_engines = [
-            ("https://www.google.com/search", "google"),
-            ("https://www.bing.com/search", "bing"),
-            ("https://search.brave.com/search", "brave")
-        ]
-        all_search_results = []
-
-        for engine_url, engine_name in search_engines:
-            try:
-                driver = self._initialize_webdriver()
+    def search_engine(self, engine_url, engine_name, query, wait_timeout=search_wait_timeout):
+        """Run one search on a pooled browser and return the parsed result elements."""
+        search_box_selector = self.selector_rl.get_selector(engine_name, "search_box")
+        result_selector = self.selector_rl.get_selector(engine_name, "result")
+        try:
+            with self.driver_pool.driver() as driver:
                 driver.get(engine_url)
-                
-                search_box_selector = self.selector_rl.get_selector(engine_name, "search_box")
-                result_selector = self.selector_rl.get_selector(engine_name, "result")
-                
+
                 try:
-                    search_box = WebDriverWait(driver, 10).until(
+                    search_box = WebDriverWait(driver, wait_timeout).until(
                         EC.presence_of_element_located((By.CSS_SELECTOR, search_box_selector))
                     )
-                    search_box.send_keys(combined_query)
+                    search_box.send_keys(query)
                     search_box.send_keys(Keys.RETURN)
-                    
-                    WebDriverWait(driver, 10).until(
+
+                    WebDriverWait(driver, wait_timeout).until(
                         EC.presence_of_element_located((By.CSS_SELECTOR, result_selector))
                     )
-                    
+
                     soup = BeautifulSoup(driver.page_source, 'html.parser')
                     results = soup.select(result_selector)[:max_search_results]
-                    
+
                     if results:
                         self.selector_rl.update_q_value(engine_name, search_box_selector, 1)
                         self.selector_rl.update_q_value(engine_name, result_selector, 1)
                     else:
                         new_search_box_selector = self.find_new_selector(driver, "search_box")
                         new_result_selector = self.find_new_selector(driver, "result")
-                        
+
                         if new_search_box_selector and new_result_selector:
                             self.selector_rl.add_new_selector(engine_name, "search_box", new_search_box_selector)
                             self.selector_rl.add_new_selector(engine_name, "result", new_result_selector)
 
                             # Retry with new selectors
                             driver.get(engine_url)
-                            search_box = WebDriverWait(driver, 10).until(
+                            search_box = WebDriverWait(driver, wait_timeout).until(
                                 EC.presence_of_element_located((By.CSS_SELECTOR, new_search_box_selector))
                             )
-                            search_box.send_keys(combined_query)
+                            search_box.send_keys(query)
                             search_box.send_keys(Keys.RETURN)
-                            
-                            WebDriverWait(driver, 10).until(
+
+                            WebDriverWait(driver, wait_timeout).until(
                                 EC.presence_of_element_located((By.CSS_SELECTOR, new_result_selector))
                             )
-                            
+
                             soup = BeautifulSoup(driver.page_source, 'html.parser')
                             results = soup.select(new_result_selector)[:max_search_results]
-                    
-                    with ThreadPoolExecutor(max_workers=5) as executor:
-                        future_to_result = {executor.submit(self.process_search_result, result, engine_name, query): result for result in results}
-                        for future in as_completed(future_to_result):
-                            all_search_results.extend(future.result())
+                    return results
 
                 except (NoSuchElementException, TimeoutException) as e:
                     logging.error(f"Error with {engine_name} search: {e}")
                     self.selector_rl.update_q_value(engine_name, search_box_selector, -1)
                     self.selector_rl.update_q_value(engine_name, result_selector, -1)
-            except WebDriverException as e:
+        except WebDriverException as e:
+            logging.error(f"Error with {engine_name} search: {e}")
+        return []
+
+    def close(self):
+        self.selector_rl.save_state(force=True)
+        self.driver_pool.close()
+
+    def research_engine(self, engine_url, engine_name, query, deduplicator=None, on_results=None, stop_event=None):
+        """
+        Search one engine, crawl its result links and return the scored pages.
+
+        Each crawled site is scored as soon as it finishes and passed to
+        on_results, so callers can consume results before the engine is done.
+        Once stop_event is set no further sites are crawled.
+        """
+        started = time.monotonic()
+        scored = []
+        results = self.search_engine(engine_url, engine_name, query,
+                                     wait_timeout=self.selector_rl.wait_timeout(engine_name, self.engine_deadline))
+        search_latency = time.monotonic() - started
+        if results:
+            executor = ThreadPoolExecutor(max_workers=5)
+            try:
+                futures = [executor.submit(self.process_search_result, result, engine_name, query, stop_event) for result in results]
+                for future in as_completed(futures):
+                    pages = future.result()
+                    if deduplicator:
+                        # Mirrors, paginated copies and pages already returned by another engine are dropped before scoring
+                        pages = deduplicator.filter(pages)
+                    site_results = self.score_results(query, pages)
+                    scored.extend(site_results)
+                    if on_results and site_results:
+                        on_results(site_results)
+                    if stop_event and stop_event.is_set():
+                        break
+            finally:
+                executor.shutdown(wait=not (stop_event and stop_event.is_set()), cancel_futures=True)
+        self.selector_rl.record_engine_run(
+            engine_name, search_latency, time.monotonic() - started, bool(results),
+            sum(len(page["content"].encode("utf-8")) for page in scored)
+        )
+        return scored
+
+    def iter_research(self, query, fan_out=True, stop_event=None):
+        """
+        Yield scored result pages as soon as each crawled site has been scored.
+
+        Engines are chosen by the selector scheduler and run concurrently (or one
+        after another when fan_out is False). Closing the generator, or setting
+        stop_event, stops further crawling and cancels outstanding work, so a
+        consumer can stop as soon as it has enough.
+        """
+        stop_event = stop_event or threading.Event()
+        self.session.reset_stats()
+        self.crawl_budget = ByteBudget(max_crawl_bytes)
+        deduplicator = Deduplicator(self.simhash_index)
+        engine_urls = {engine_name: engine_url for engine_url, engine_name in self.search_engines}
+        # Search latency includes a WebDriverWait capped at search_wait_timeout, so that is the budget a slow engine is measured against
+        scheduled = self.selector_rl.schedule_engines(list(engine_urls), min(self.engine_deadline, search_wait_timeout),
+                                                      engines_per_query)
+        results = queue.Queue()
+        finished = object()
+
+        def run_engine(engine_name):
+            try:
+                self.research_engine(engine_urls[engine_name], engine_name, query, deduplicator,
+                                     on_results=results.put, stop_event=stop_event)
+            except Exception as e:
                 logging.error(f"Error with {engine_name} search: {e}")
             finally:
-                driver.quit()
-
-            time.sleep(2)  # Add a delay between search engine queries
-
-        self.selector_rl.save_state()
+                if not fan_out:
+                    stop_event.wait(2)  # Add a delay between search engine queries
+                results.put(finished)
+
+        # Fanned out, latency is bounded by the slowest engine (or the deadline), not the sum
+        executor = ThreadPoolExecutor(max_workers=len(scheduled) if fan_out else 1)
+        futures = {executor.submit(run_engine, engine_name): engine_name for engine_name in scheduled}
+        deadline = time.monotonic() + self.engine_deadline
+        running = len(futures)
+        try:
+            while running:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining <= 0:
+                        raise queue.Empty
+                    site_results = results.get(timeout=remaining)
+                except queue.Empty:
+                    pending = [name for future, name in futures.items() if not future.done()]
+                    logging.warning(f"Search engines missed the {self.engine_deadline}s deadline: {', '.join(pending)}")
+                    break
+                if site_results is finished:
+                    running -= 1
+                else:
+                    yield from site_results
+        finally:
+            stop_event.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.selector_rl.save_state()
+            self.last_cache_stats = self.session.reset_stats()
+            logging.info(CachingSession.format_stats(self.last_cache_stats))
+            self.last_dedup_stats = deduplicator.stats()
+            logging.info(f"Near-duplicate pages removed: {self.last_dedup_stats['duplicates']} ({self.last_dedup_stats['bytes_eliminated']} bytes)")
+
+    def web_research(self, query, fan_out=True):
+        combined_query = query
+        top_results = TopResults(top_k_results, self.max_content_length, early_stop_similarity)
 
+        stream = self.iter_research(combined_query, fan_out=fan_out)
+        try:
+            for result in stream:
+                top_results.push(result)
+                if top_results.is_full():
+                    logging.info("Enough relevant content gathered; stopping remaining crawls.")
+                    break
+        finally:
+            stream.close()
+
+        all_search_results = top_results.sorted()
         if not all_search_results:
             return f"No results found for the query: {combined_query}"
 
-        # Sort results by similarity
-        all_search_results.sort(key=lambda x: x['similarity'], reverse=True)
-
-        aggregated_content = ""
-        for result in all_search_results:
-            if len(aggregated_content) + len(result['content']) <= self.max_content_length:
-                aggregated_content += f"[Source: {result['link']}]\n{result['content']}\n\n"
-            else:
-                remaining_chars = self.max_content_length - len(aggregated_content)
-                aggregated_content += f"[Source: {result['link']}]\n{result['content'][:remaining_chars]}"
-                break
-
-        return self.summarize_results(aggregated_content, combined_query)
+        # The summarizer's token budget bounds the output, so every kept page goes in whole
+        return self.summarize_results([(r["link"], r["content"]) for r in all_search_results], combined_query)
 
-    def summarize_results(self, aggregated_content, query):
-        # This method can be expanded to provide a more concise summary of the research results
+    def summarize_results(self, sources, query):
         summary = f"Research results for query: {query}\n\n"
         summary += "Key findings:\n"
-        
-        # Extract main points (this is a simple implementation and can be improved)
-        sentences = aggregated_content.split('.')
-        main_points = [sentence.strip() for sentence in sentences if query.lower() in sentence.lower()][:5]
-        
-        for i, point in enumerate(main_points, 1):
-            summary += f"{i}. {point}.\n"
-        
-        summary += f"\nDetailed information:\n{aggregated_content}"
-        
+        summary += self.summarizer.summarize(sources, query) or "No extractable sentences found."
         return summary
 
 if __name__ == "__main__":
@@ -1,22 +1,73 @@
 import os
+import shlex
 import subprocess
+import sys
 import tempfile
 import logging
-import cProfile
 import pstats
 import io
 import ast
-import astroid
-import pylint.lint
+import json
 import traceback
-import pytest
-from pylint import config
+from fork_server import shared_sandbox
+from lint_service import LintService
+from format_service import FormatService
+from utils.paths import data_path
+
+command_timeout = 600  # Wall-clock seconds for shell commands such as pip install or git clone
+lint_cache_path = data_path("cache", "lint.sqlite")
+format_cache_path = data_path("cache", "format.sqlite")
+profile_top_n = 15  # Hotspots and allocation sites kept in a profile report
+profile_harness = """
+import cProfile, json, os, pkgutil, runpy, sys, tracemalloc  # pkgutil: runpy would import it inside the profile
+target, function, stats_path, allocations_path, top_n = sys.argv[1:6]
+sys.argv = [target]
+sys.path.insert(0, os.path.dirname(os.path.abspath(target)))
+if function:
+    call = runpy.run_path(target, run_name="__profiled__")[function]
+else:
+    call = lambda: runpy.run_path(target, run_name="__main__")
+profiler = cProfile.Profile()
+tracemalloc.start()
+result = None
+try:
+    result = profiler.runcall(call)
+finally:
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib.*>"),
+        tracemalloc.Filter(False, "<frozen zipimport>"),
+        tracemalloc.Filter(False, "<frozen runpy>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+    tracemalloc.stop()
+    profiler.dump_stats(stats_path)
+    allocations = [
+        {"location": f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+         "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+        for stat in snapshot.statistics("lineno")[:int(top_n)]
+    ]
+    with open(allocations_path, "w") as f:
+        json.dump({"current_kb": round(current / 1024, 1), "peak_kb": round(peak / 1024, 1), "allocations": allocations}, f)
+"""
+message_categories = {
+    "convention": "Convention Violation",
+    "refactor": "Refactoring Opportunity",
+    "warning": "Potential Bug",
+    "error": "Error",
+    "fatal": "Error"
+}
+
 
 class CodeExecutionManager:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self.workspace_folder = "workspace"
         os.makedirs(self.workspace_folder, exist_ok=True)
+        self.sandbox = shared_sandbox()
+        self.lint_service = LintService(cache_path=lint_cache_path)
+        self.format_service = FormatService(cache_path=format_cache_path)
 
     def save_file(self, filepath, content):
         """
@@ -84,9 +135,30 @@ class CodeExecutionManager:
             self.logger.exception(f"Error listing files in workspace: {str(e)}")
             return {"status": "error", "error_message": str(e)}
 
+    def _test_result(self, run):
+        """Turn a Sandbox.run_pytest result into the status dictionary returned by the test methods."""
+        result = {
+            "output": run["stdout"],
+            "stderr": run["stderr"],
+            "tests": run["tests"],
+            "summary": run["summary"],
+            "duration": run["duration"]
+        }
+        if run["timed_out"] or run["cpu_limit_exceeded"]:
+            limit = "CPU time limit" if run["cpu_limit_exceeded"] else f"timeout of {self.sandbox.timeout} seconds"
+            self.logger.error(f"Tests execution exceeded the {limit}.")
+            return dict(result, status="error", error_message=f"Execution exceeded the {limit}.")
+        if run["returncode"] == 0:
+            self.logger.info(f"Tests execution successful: {run['summary']['passed']} passed.")
+            return dict(result, status="success")
+        failed = [f"{test['name']}: {test['message']}" for test in run["tests"] if test["outcome"] in ("failed", "error")]
+        self.logger.error(f"Tests execution failed: {run['summary']}")
+        return dict(result, status="failure",
+                    error_message="\n".join(failed) or run["stderr"] or run["stdout"] or f"pytest exited with code {run['returncode']}")
+
     def test_code(self, code):
         """
-        Run tests on the provided code using pytest.
+        Run tests on the provided code using pytest in a sandboxed worker process.
 
         Args:
             code (str): The code to be tested.
@@ -94,8 +166,10 @@ class CodeExecutionManager:
         Returns:
             dict: A dictionary containing the status, test output, and error message (if any).
                 - status (str): "success" if the tests passed, "failure" if the tests failed, "error" if an error occurred.
-                - output (str): The output of the test execution.
-                - error_message (str): The error message if an error occurred during test execution.
+                - output (str): The (size-bounded) output of the test execution.
+                - tests (list): One entry per test with name, outcome, duration and failure message.
+                - summary (dict): Number of passed, failed, error and skipped tests.
+                - error_message (str): The error message if the tests failed or could not be run.
         """
         if not code:
             return {"status": "error", "error_message": "No code provided."}
@@ -106,42 +180,268 @@ class CodeExecutionManager:
                 f.write(code)
 
             try:
-                # Use pytest to run tests and capture output
-                result = pytest.main([script_path, "--verbose"])
-                
-                if result == 0:
-                    self.logger.info("Tests execution successful.")
-                    return {"status": "success", "output": "All tests passed."}
-                else:
-                    self.logger.error("Tests execution failed.")
-                    return {"status": "failure", "output": "Some tests failed."}
-            except subprocess.TimeoutExpired:
-                self.logger.error("Tests execution timed out after 30 seconds.")
-                return {"status": "error", "error_message": "Execution timed out after 30 seconds."}
+                return self._test_result(self.sandbox.run_pytest('temp_script.py', cwd=temp_dir))
             except Exception as e:
                 self.logger.exception(f"Tests execution error: {str(e)}")
                 return {"status": "error", "error_message": f"Error: {str(e)}\nTraceback: {traceback.format_exc()}"}
 
+    def run_tests(self, filepaths):
+        """
+        Run pytest on several workspace files in parallel, one sandboxed worker process each.
+
+        Args:
+            filepaths (list): Paths of test targets relative to the workspace folder.
+
+        Returns:
+            dict: A dictionary containing the overall status and the per-target results.
+                - status (str): "success" if every target passed, "failure" otherwise.
+                - results (dict): Maps each path to the dictionary test_code would return for it.
+        """
+        def run_target(filepath):
+            try:
+                return self._test_result(self.sandbox.run_pytest(filepath, cwd=self.workspace_folder))
+            except Exception as e:
+                self.logger.exception(f"Tests execution error for '{filepath}': {str(e)}")
+                return {"status": "error", "error_message": str(e)}
+
+        results = dict(zip(filepaths, self.sandbox.map(run_target, filepaths)))
+        status = "success" if all(result["status"] == "success" for result in results.values()) else "failure"
+        return {"status": status, "results": results}
+
+    def run_code(self, code, args=()):
+        """
+        Run a Python script in a sandboxed child forked from the warm interpreter.
+
+        Args:
+            code (str): The Python source to run as __main__.
+            args (list): Command line arguments for the script.
+
+        Returns:
+            dict: A dictionary containing the status, output, and error message (if any).
+                - status (str): "success" if the script exited with code 0, "failure" if it exited otherwise, "error" if it hit a limit.
+                - stdout (str): The (size-bounded) standard output.
+                - stderr (str): The (size-bounded) standard error.
+                - returncode (int): The exit code, negative if the script was killed by a signal.
+                - duration (float): Wall-clock seconds.
+        """
+        if not code:
+            return {"status": "error", "error_message": "No code provided."}
+        try:
+            result = self.sandbox.run_code(code, args, cwd=self.workspace_folder)
+        except Exception as e:
+            self.logger.exception(f"Code execution error: {str(e)}")
+            return {"status": "error", "error_message": str(e)}
+        return self._run_result(result)
+
+    def _run_result(self, result):
+        output = {key: result[key] for key in ("stdout", "stderr", "returncode", "duration")}
+        if result["timed_out"] or result["cpu_limit_exceeded"]:
+            limit = "CPU time limit" if result["cpu_limit_exceeded"] else f"timeout of {self.sandbox.timeout} seconds"
+            self.logger.error(f"Execution exceeded the {limit}.")
+            return dict(output, status="error", error_message=f"Execution exceeded the {limit}.")
+        if result["returncode"] != 0:
+            return dict(output, status="failure", error_message=result["stderr"] or f"Exited with code {result['returncode']}")
+        return dict(output, status="success")
+
+    def _profile(self, script_path, output_dir, function, top_n, cwd):
+        """
+        Profile one script in the sandbox, with the raw statistics written to output_dir.
+
+        Returns:
+            tuple: The report dictionary, and a map from (file, function name) to (calls, cumulative time)
+                over every profiled function, which compare_profiles matches across revisions.
+        """
+        stats_path = os.path.abspath(os.path.join(output_dir, "profile.stats"))
+        allocations_path = os.path.abspath(os.path.join(output_dir, "allocations.json"))
+        run = self.sandbox.run_code(profile_harness, [script_path, function or "", stats_path, allocations_path, str(top_n)], cwd=cwd)
+        result = self._run_result(run)
+        if result["status"] == "error":
+            return result, {}
+        if not os.path.exists(stats_path):
+            return dict(result, status="failure", error_message=run["stderr"] or "The profiler did not produce any statistics."), {}
+
+        stats = pstats.Stats(stats_path, stream=io.StringIO())
+        functions = {}
+        # The harness, runpy and the import system; the code's own imports still show up as the modules' <module> entries
+        harness_file = lambda filename: filename == "<string>" or "runpy" in filename \
+            or filename.startswith(("<frozen importlib.", "<frozen zipimport>"))
+        for func, (primitive_calls, calls, total_time, cumulative_time, callers) in list(stats.stats.items()):
+            filename, _, name = func
+            if harness_file(filename) or name == "<method 'disable' of '_lsprof.Profiler' objects>" \
+                    or (filename == "~" and callers and all(harness_file(caller[0]) for caller in callers)):
+                del stats.stats[func]  # Not the profiled code
+                continue
+            functions[(os.path.basename(filename), name)] = (calls, cumulative_time)
+        stats.strip_dirs().sort_stats(pstats.SortKey.CUMULATIVE)
+        hotspots = []
+        for func in stats.fcn_list[:top_n]:
+            primitive_calls, calls, total_time, cumulative_time, _ = stats.stats[func]
+            hotspots.append({
+                "function": pstats.func_std_string(func),
+                "calls": calls,
+                "primitive_calls": primitive_calls,
+                "total_time": round(total_time, 6),
+                "cumulative_time": round(cumulative_time, 6)
+            })
+        with open(allocations_path, "r", encoding="utf-8") as f:
+            memory = json.load(f)
+        report = dict(
+            result,
+            total_time=round(stats.total_tt, 6),
+            function_calls=stats.total_calls,
+            primitive_calls=stats.prim_calls,
+            hotspots=hotspots,
+            peak_memory_kb=memory["peak_kb"],
+            retained_memory_kb=memory["current_kb"],
+            allocations=memory["allocations"]
+        )
+        return report, functions
+
+    @staticmethod
+    def compare_profiles(baseline, baseline_functions, current, current_functions, top_n=profile_top_n):
+        """
+        Compare two profiles produced by _profile, matching functions by file and name so that
+        edits which move a function to another line still compare.
+
+        Returns:
+            dict: Total time and peak memory of both revisions, their ratio/difference, and the
+                functions whose cumulative time changed the most.
+        """
+        changes = []
+        for key in set(baseline_functions) | set(current_functions):
+            old_calls, old_time = baseline_functions.get(key, (0, 0.0))
+            new_calls, new_time = current_functions.get(key, (0, 0.0))
+            changes.append({
+                "function": f"{key[0]}:{key[1]}",
+                "baseline_calls": old_calls,
+                "calls": new_calls,
+                "baseline_cumulative_time": round(old_time, 6),
+                "cumulative_time": round(new_time, 6),
+                "delta": round(new_time - old_time, 6)
+            })
+        changes.sort(key=lambda change: abs(change["delta"]), reverse=True)
+        return {
+            "baseline_total_time": baseline["total_time"],
+            "total_time": current["total_time"],
+            "time_ratio": round(current["total_time"] / baseline["total_time"], 3) if baseline["total_time"] else None,
+            "baseline_peak_memory_kb": baseline["peak_memory_kb"],
+            "peak_memory_kb": current["peak_memory_kb"],
+            "peak_memory_delta_kb": round(current["peak_memory_kb"] - baseline["peak_memory_kb"], 1),
+            "changed_functions": changes[:top_n]
+        }
+
+    def profile_code(self, code=None, filepath=None, function=None, baseline_code=None, top_n=profile_top_n):
+        """
+        Profile a script or one of its functions under cProfile and tracemalloc in the sandbox.
+
+        Args:
+            code (str): The Python source to profile. Ignored if filepath is given.
+            filepath (str): A workspace script to profile in place, so it can import its neighbours.
+            function (str): Name of a zero-argument function to profile; the script's module level
+                runs unprofiled first. By default the whole script is profiled as __main__.
+            baseline_code (str): An earlier revision of the code to profile the same way and compare against.
+            top_n (int): Number of hotspots and allocation sites to report.
+
+        Returns:
+            dict: A dictionary containing the status and the profile report.
+                - status (str): "success" if the code ran to completion, "failure" if it raised, "error" otherwise.
+                - total_time (float): Profiled seconds, which include the profiler's overhead.
+                - function_calls (int): Total function calls.
+                - hotspots (list): Top functions by cumulative time with calls, total_time and cumulative_time.
+                - peak_memory_kb (float): Peak memory traced by tracemalloc.
+                - allocations (list): Largest allocation sites (location, size_kb, count) still alive at the end of the run.
+                - comparison (dict): Present with baseline_code; see compare_profiles.
+                - stdout, stderr, returncode, duration: As returned by run_code.
+        """
+        if not code and not filepath:
+            return {"status": "error", "error_message": "No code provided."}
+        script_name = os.path.basename(filepath) if filepath else "profiled_code.py"
+        try:
+            with tempfile.TemporaryDirectory(dir=self.workspace_folder) as temp_dir:
+                def write_revision(label, source):
+                    revision_dir = os.path.join(temp_dir, label)
+                    os.makedirs(revision_dir)
+                    script_path = os.path.abspath(os.path.join(revision_dir, script_name))
+                    with open(script_path, "w", encoding="utf-8") as f:
+                        f.write(source)
+                    return script_path, revision_dir
+
+                if filepath:
+                    # Profile the workspace file in place so it can import its neighbours
+                    script_path = os.path.abspath(os.path.join(self.workspace_folder, filepath))
+                    if not os.path.exists(script_path):
+                        return {"status": "error", "error_message": f"File '{filepath}' not found."}
+                    output_dir = os.path.join(temp_dir, "current")
+                    os.makedirs(output_dir)
+                else:
+                    script_path, output_dir = write_revision("current", code)
+                cwd = self.workspace_folder if filepath else output_dir
+                revisions = [self._profile(script_path, output_dir, function, top_n, cwd)]
+                if baseline_code:
+                    script_path, output_dir = write_revision("baseline", baseline_code)
+                    cwd = self.workspace_folder if filepath else output_dir
+                    revisions.append(self._profile(script_path, output_dir, function, top_n, cwd))
+        except Exception as e:
+            self.logger.exception(f"Error during profiling: {str(e)}")
+            return {"status": "error", "error_message": str(e)}
+
+        report, functions = revisions[0]
+        if len(revisions) == 2:
+            baseline, baseline_functions = revisions[1]
+            if "total_time" in report and "total_time" in baseline:
+                report["comparison"] = self.compare_profiles(baseline, baseline_functions, report, functions, top_n)
+            else:
+                failed = report if "total_time" not in report else baseline
+                report["comparison"] = {"error_message": f"Profiles could not be compared: {failed.get('error_message')}"}
+        if "total_time" in report:
+            self.logger.info(f"Profiled {filepath or 'code'}: {report['total_time']:.3f} s, {report['function_calls']} calls, "
+                             f"peak {report['peak_memory_kb']:.0f} KiB")
+        return report
+
     def execute_command(self, command):
         """
-        Execute a shell command.
+        Execute a shell command in the sandbox.
+
+        Python invocations (python script.py, python -m module, python -c code)
+        are forked from the warm interpreter under the sandbox resource limits;
+        anything else runs through the shell in a fresh process limited only
+        by command_timeout, so installs, clones and servers are not cut short.
 
         Args:
             command (str): The command to be executed.
 
         Returns:
             dict: A dictionary containing the status, stdout, and stderr.
-                - status (str): "success" if the command executed successfully, "error" otherwise.
+                - status (str): "success" if the command ran to completion, "error" otherwise.
                 - stdout (str): The standard output of the command execution.
                 - stderr (str): The standard error of the command execution.
+                - returncode (int): The exit code of the command.
         """
         try:
-            result = subprocess.run(command, capture_output=True, text=True, shell=True)
+            try:
+                argv = shlex.split(command)
+            except ValueError:
+                argv = []
+            python_names = ("python", "python3", os.path.basename(sys.executable))
+            if len(argv) >= 2 and os.path.basename(argv[0]) in python_names:
+                if argv[1] == "-m" and len(argv) >= 3:
+                    result = self.sandbox.run_module(argv[2], argv[3:])
+                elif argv[1] == "-c" and len(argv) >= 3:
+                    result = self.sandbox.run_code(argv[2], argv[3:])
+                elif not argv[1].startswith("-"):
+                    result = self.sandbox.run_python(argv[1], argv[2:])
+                else:
+                    result = self.sandbox.run(argv)
+            else:
+                shell = ["/bin/sh", "-c", command] if os.name == "posix" else ["cmd", "/c", command]
+                result = self.sandbox.run(shell, timeout=command_timeout, rlimits=False)
             self.logger.info(f"Command executed: {command}")
-            return {"status": "success", "stdout": result.stdout, "stderr": result.stderr}
         except Exception as e:
             self.logger.exception(f"Error executing command: {str(e)}")
             return {"status": "error", "error_message": str(e)}
+        if result["timed_out"] or result["cpu_limit_exceeded"]:
+            return self._run_result(result)
+        return {"status": "success", "stdout": result["stdout"], "stderr": result["stderr"], "returncode": result["returncode"]}
 
     def optimize_code(self, code):
         """
@@ -154,51 +454,46 @@ class CodeExecutionManager:
             dict: A dictionary containing the status and optimization suggestions.
                 - status (str): "success" if the optimization completed successfully, "error" otherwise.
                 - suggestions (str): The optimization suggestions provided by Pylint.
+                - messages (list): The Pylint messages with line, column, category, symbol and message.
         """
         try:
-            # Save the code to a temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".py") as tmp:
-                tmp.write(code.encode('utf-8'))
-                tmp_file_path = tmp.name
-
-            # Configure Pylint with custom settings
-            pylint_config_path = pylint.config.find_pylintrc()
-            pylint_args = [tmp_file_path, "--rcfile", pylint_config_path]
-
-            # Run Pylint analysis
-            pylint_output = subprocess.check_output(["pylint"] + pylint_args, universal_newlines=True)
-
-            # Parse Pylint output and provide actionable suggestions
-            suggestions = []
-            for line in pylint_output.splitlines():
-                if line.startswith("C:") or line.startswith("R:") or line.startswith("W:"):
-                    msg_id, _, msg = line.partition(":")
-                    suggestion = f"Suggestion: {msg.strip()}"
-                    if msg_id.startswith("C:"):
-                        suggestion += " (Convention Violation)"
-                    elif msg_id.startswith("R:"):
-                        suggestion += " (Refactoring Opportunity)"
-                    elif msg_id.startswith("W:"):
-                        suggestion += " (Potential Bug)"
-                    suggestions.append(suggestion)
-
-            # Cleanup temporary file
-            os.remove(tmp_file_path)
+            messages = self.lint_service.lint_code(code)
+            suggestions = [
+                f"Suggestion: line {message['line']}: {message['message']} ({message['symbol']}) ({message_categories[message['category']]})"
+                for message in messages if message["category"] in message_categories
+            ]
 
             if suggestions:
                 optimization_suggestions = "\n".join(suggestions)
                 self.logger.info(f"Optimization suggestions:\n{optimization_suggestions}")
-                return {"status": "success", "suggestions": optimization_suggestions}
+                return {"status": "success", "suggestions": optimization_suggestions, "messages": messages}
             else:
                 self.logger.info("No optimization suggestions found.")
-                return {"status": "success", "suggestions": "No optimization suggestions found."}
+                return {"status": "success", "suggestions": "No optimization suggestions found.", "messages": messages}
 
-        except subprocess.CalledProcessError as e:
-            self.logger.error(f"Pylint analysis failed: {e.output}")
+        except Exception as e:
+            self.logger.exception(f"Error during optimization: {str(e)}")
             return {"status": "error", "error_message": str(e)}
 
+    def lint_workspace(self, filepaths=None):
+        """
+        Lint workspace files in parallel, skipping files that have not changed since they were last linted.
+
+        Args:
+            filepaths (list): Paths relative to the workspace folder; every .py file in it by default.
+
+        Returns:
+            dict: A dictionary containing the status and the messages per file.
+                - status (str): "success" if linting completed, "error" otherwise.
+                - results (dict): Maps each path to its list of Pylint messages.
+        """
+        try:
+            if filepaths is None:
+                filepaths = [name for name in os.listdir(self.workspace_folder) if name.endswith(".py")]
+            results = self.lint_service.lint_files([os.path.join(self.workspace_folder, path) for path in filepaths])
+            return {"status": "success", "results": {os.path.relpath(path, self.workspace_folder): messages for path, messages in results.items()}}
         except Exception as e:
-            self.logger.exception(f"Error during optimization: {str(e)}")
+            self.logger.exception(f"Error during linting: {str(e)}")
             return {"status": "error", "error_message": str(e)}
 
     def format_code(self, code):
@@ -214,30 +509,35 @@ class CodeExecutionManager:
                 - formatted_code (str): The formatted code.
         """
         try:
-            # Save the code to a temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".py") as tmp:
-                tmp.write(code.encode('utf-8'))
-                tmp_file_path = tmp.name
-
-            # Run Black code formatter
-            subprocess.run(["black", tmp_file_path], check=True)
-
-            # Read the formatted code from the temporary file
-            with open(tmp_file_path, "r", encoding="utf-8") as f:
-                formatted_code = f.read()
-
-            # Cleanup temporary file
-            os.remove(tmp_file_path)
-
+            formatted_code = self.format_service.format_code(code)
             self.logger.info("Code formatting completed.")
             return {"status": "success", "formatted_code": formatted_code}
 
-        except subprocess.CalledProcessError as e:
-            self.logger.error(f"Code formatting failed: {e.output}")
+        except Exception as e:
+            self.logger.error(f"Code formatting failed: {str(e)}")
             return {"status": "error", "error_message": str(e)}
 
+    def format_workspace(self, filepaths=None):
+        """
+        Format workspace files in place across a process pool, skipping files that are already formatted.
+
+        Args:
+            filepaths (list): Paths relative to the workspace folder; every .py file in it by default.
+
+        Returns:
+            dict: A dictionary containing the status and the outcome per file.
+                - status (str): "success" if every file could be formatted, "error" otherwise.
+                - results (dict): Maps each path to "unchanged", "reformatted" or "error: <message>".
+        """
+        try:
+            if filepaths is None:
+                filepaths = [name for name in os.listdir(self.workspace_folder) if name.endswith(".py")]
+            results = self.format_service.format_files([os.path.join(self.workspace_folder, path) for path in filepaths])
+            results = {os.path.relpath(path, self.workspace_folder): outcome for path, outcome in results.items()}
+            status = "error" if any(outcome.startswith("error") for outcome in results.values()) else "success"
+            return {"status": status, "results": results}
         except Exception as e:
-            self.logger.exception(f"Error during code formatting: {str(e)}")
+            self.logger.exception(f"Error during workspace formatting: {str(e)}")
             return {"status": "error", "error_message": str(e)}
 
     def generate_documentation(self, code):
@@ -0,0 +1,116 @@
+import hashlib
+import logging
+
+from utils.tokens import estimate_tokens
+
+
+class ContextRetriever:
+    """
+    Retrieval stage that feeds agents only the context relevant to their task.
+
+    Workspace files and agent outputs are split into overlapping line chunks
+    and indexed through MemoryManager. Chunk ids include a content hash, and
+    the memory manager's manifest skips content it has already embedded, so
+    re-indexing an unchanged workspace every iteration costs only hashing.
+    Chunks of earlier versions of a file stay in the store, so the retriever
+    remembers the chunk ids of each file's latest indexing and build_context
+    leaves out the rest. build_context retrieves the best chunks for a task
+    and packs them into a fixed token budget.
+    """
+
+    def __init__(self, memory_manager, chunk_lines=40, overlap_lines=5, top_k=8, max_context_tokens=1500):
+        self.memory_manager = memory_manager
+        self.chunk_lines = chunk_lines
+        self.overlap_lines = overlap_lines
+        self.top_k = top_k
+        self.max_context_tokens = max_context_tokens
+        self.logger = logging.getLogger(__name__)
+        self._current_chunks = {}  # File path -> chunk ids of its latest indexing
+
+    def chunk_text(self, text):
+        """Yield (start_line, chunk) pairs of overlapping line windows."""
+        lines = text.splitlines()
+        step = max(1, self.chunk_lines - self.overlap_lines)
+        for start in range(0, max(len(lines), 1), step):
+            chunk = "\n".join(lines[start:start + self.chunk_lines]).strip()
+            if chunk:
+                yield start + 1, chunk
+            if start + self.chunk_lines >= len(lines):
+                break
+
+    def _memories(self, source, text, metadata):
+        memories = []
+        for start_line, chunk in self.chunk_text(text):
+            digest = hashlib.sha1(chunk.encode("utf-8")).hexdigest()[:12]
+            chunk_metadata = dict(metadata, source=source, start_line=start_line)
+            memories.append((f"{source}:{start_line}:{digest}", chunk, chunk_metadata))
+        return memories
+
+    def index_files(self, files, iteration=None):
+        """
+        Index workspace files given as a {path: content} mapping.
+
+        Returns the number of new chunks embedded.
+        """
+        memories = []
+        for path, content in files.items():
+            metadata = {"kind": "file"}
+            if iteration is not None:
+                metadata["iteration"] = iteration
+            file_memories = self._memories(path, content, metadata)
+            self._current_chunks[path] = {memory_id for memory_id, _, _ in file_memories}
+            memories.extend(file_memories)
+        return self.memory_manager.save_memories(memories)
+
+    def _is_current(self, memory):
+        """False for chunks of a file that has since been re-indexed with different content."""
+        metadata = memory.get("metadata") or {}
+        current = self._current_chunks.get(metadata.get("source")) if metadata.get("kind") == "file" else None
+        return current is None or memory["id"] in current
+
+    def index_agent_output(self, agent, content, iteration=None, kind="agent_output"):
+        metadata = {"kind": kind, "agent": agent}
+        if iteration is not None:
+            metadata["iteration"] = iteration
+        source = f"{agent}-{kind}-{iteration}" if iteration is not None else f"{agent}-{kind}"
+        return self.memory_manager.save_memories(self._memories(source, content, metadata))
+
+    def build_context(self, query, top_k=None, max_tokens=None, where=None):
+        """
+        Return the most relevant indexed chunks for query, packed under max_tokens.
+
+        Chunks are ranked with an MMR re-rank so near-identical chunks (for
+        example the same function in two snapshots) do not crowd out others.
+        Chunks of superseded file versions are skipped, fetching more
+        candidates if that leaves fewer than top_k.
+        """
+        top_k = top_k or self.top_k
+        max_tokens = max_tokens or self.max_context_tokens
+        fetch = top_k
+        try:
+            while True:
+                candidates = self.memory_manager.search_memories(query, k=fetch, where=where, mmr=True)
+                memories = [memory for memory in candidates if self._is_current(memory)]
+                if len(memories) >= top_k or len(candidates) < fetch:
+                    break
+                fetch *= 2
+        except Exception as e:
+            self.logger.error(f"Context retrieval failed: {e}")
+            return ""
+        memories = memories[:top_k]
+
+        sections = []
+        used_tokens = 0
+        for memory in memories:
+            metadata = memory.get("metadata") or {}
+            header = f"[{metadata.get('source', memory['id'])} line {metadata.get('start_line', 1)}, score {memory['score']:.2f}]"
+            section = f"{header}\n{memory['document']}"
+            section_tokens = estimate_tokens(section)
+            if used_tokens + section_tokens > max_tokens:
+                remaining_chars = (max_tokens - used_tokens) * 4 - len(header) - 1
+                if remaining_chars > 200:
+                    sections.append(f"{header}\n{memory['document'][:remaining_chars]}")
+                break
+            sections.append(section)
+            used_tokens += section_tokens
+        return "\n\n".join(sections)
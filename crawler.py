@@ -0,0 +1,283 @@
+import heapq
+import itertools
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse, urlunparse, urljoin, parse_qsl, urlencode
+
+import networkx as nx
+from bs4 import BeautifulSoup
+from requests.exceptions import RequestException
+
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+# Path or anchor words that mark navigation and account pages rather than content
+NAVIGATION_TOKENS = {"login", "logout", "signin", "signup", "register", "account", "cart", "checkout",
+                     "tag", "tags", "category", "categories", "archive", "author", "feed", "rss",
+                     "privacy", "terms", "cookie", "cookies", "contact", "share", "print", "page"}
+token_pattern = re.compile(r"[a-z0-9]+")
+
+
+def normalize_url(url, base=None):
+    """
+    Canonicalise a URL so trivially different spellings map to one frontier entry.
+
+    Resolves against base, lowercases scheme and host, drops default ports,
+    fragments and tracking parameters, and sorts the query string. Returns
+    None for non-HTTP(S) links.
+    """
+    if base:
+        url = urljoin(base, url)
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parsed.hostname:
+        return None
+    netloc = parsed.hostname.lower()
+    if parsed.port and parsed.port != DEFAULT_PORTS[scheme]:
+        netloc += f":{parsed.port}"
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    ))
+    return urlunparse((scheme, netloc, parsed.path or "/", "", query, ""))
+
+
+class HostLimiter:
+    """Per-host concurrency cap plus a minimum delay between request starts to the same host."""
+
+    def __init__(self, concurrency=2, delay=1.0):
+        self.concurrency = concurrency
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._next_start = {}
+
+    def acquire(self, host):
+        with self._lock:
+            semaphore = self._semaphores.setdefault(host, threading.Semaphore(self.concurrency))
+        semaphore.acquire()
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + self.delay
+        if start > now:
+            time.sleep(start - now)
+
+    def release(self, host):
+        self._semaphores[host].release()
+
+
+class ByteBudget:
+    """Thread-safe download budget that several crawls can draw from."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self.used = 0
+
+    def add(self, byte_count):
+        with self._lock:
+            self.used += byte_count
+
+    def exhausted(self):
+        return self.used >= self.limit
+
+
+def tokenize(text):
+    return set(token_pattern.findall((text or "").lower()))
+
+
+class LinkScorer:
+    """
+    Estimates how relevant an unfetched link is to a query.
+
+    The score is a weighted sum of the query-term coverage of the anchor
+    text, of the URL path, and of the page the link was found on, scaled
+    down for links that look like navigation or account pages.
+    """
+
+    def __init__(self, query, anchor_weight=0.4, path_weight=0.3, parent_weight=0.3, navigation_penalty=0.2):
+        self.query_tokens = {token for token in tokenize(query) if len(token) > 2}
+        self.anchor_weight = anchor_weight
+        self.path_weight = path_weight
+        self.parent_weight = parent_weight
+        self.navigation_penalty = navigation_penalty
+
+    def coverage(self, tokens):
+        if not self.query_tokens:
+            return 0.0
+        return len(self.query_tokens & tokens) / len(self.query_tokens)
+
+    def page_relevance(self, text):
+        return self.coverage(tokenize(text))
+
+    def score(self, url, anchor_text, parent_relevance):
+        anchor_tokens = tokenize(anchor_text)
+        path_tokens = tokenize(urlparse(url).path)
+        score = (self.anchor_weight * self.coverage(anchor_tokens)
+                 + self.path_weight * self.coverage(path_tokens)
+                 + self.parent_weight * parent_relevance)
+        if (anchor_tokens | path_tokens) & NAVIGATION_TOKENS:
+            score *= self.navigation_penalty
+        return score
+
+
+class Crawler:
+    """
+    Concurrent same-site crawler that downloads every page exactly once.
+
+    The response body is used both for link discovery and for text extraction
+    (via the extract_text(html, url) callback). Fetches run on a thread pool
+    under per-host concurrency and delay limits, and the crawl stops at
+    max_pages pages or max_bytes downloaded, whichever comes first. Setting
+    stop_event stops the crawl from scheduling further fetches and returns
+    what was gathered.
+
+    Passing a shared host_limiter and byte_budget makes the host limits and
+    the download budget hold across several crawlers; byte_budget then
+    replaces max_bytes.
+
+    The frontier is a priority queue. With a query, links are scored by a
+    LinkScorer and the most promising URL is fetched first; links scoring
+    below min_link_score are pruned. Without a query it degrades to
+    breadth-first order. Links deeper than max_depth clicks from the start
+    page are never fetched.
+    """
+
+    def __init__(self, session, extract_text, max_pages=10, max_bytes=5000000, max_page_bytes=2000000,
+                 max_workers=8, per_host_concurrency=2, per_host_delay=1.0, timeout=10, stop_event=None,
+                 query=None, max_depth=None, min_link_score=0.0, host_limiter=None, byte_budget=None):
+        self.session = session
+        self.extract_text = extract_text
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.max_page_bytes = max_page_bytes
+        self.max_workers = max_workers
+        self.host_limiter = host_limiter or HostLimiter(per_host_concurrency, per_host_delay)
+        self.byte_budget = byte_budget
+        self.timeout = timeout
+        self.stop_event = stop_event
+        self.link_scorer = LinkScorer(query) if query else None
+        self.max_depth = max_depth
+        self.min_link_score = min_link_score
+
+    def stopped(self):
+        return self.stop_event is not None and self.stop_event.is_set()
+
+    def fetch(self, url):
+        """Download up to max_page_bytes of url; returns (html, byte_count) or (None, byte_count)."""
+        host = urlparse(url).hostname
+        self.host_limiter.acquire(host)
+        try:
+            with self.session.get(url, timeout=self.timeout, stream=True) as response:
+                response.raise_for_status()
+                # Checked before reading, so PDFs, images and archives cost no download
+                if "html" not in response.headers.get("Content-Type", "text/html"):
+                    return None, 0
+                body = bytearray()
+                for chunk in response.iter_content(chunk_size=65536):
+                    body.extend(chunk)
+                    if len(body) >= self.max_page_bytes:
+                        break
+                encoding = response.encoding or response.apparent_encoding or "utf-8"
+                return bytes(body).decode(encoding, errors="replace"), len(body)
+        finally:
+            self.host_limiter.release(host)
+
+    def process_page(self, url, html):
+        """Extract text and (url, anchor text) pairs for the links on a fetched page."""
+        soup = BeautifulSoup(html, "html.parser")
+        links = []
+        for link in soup.find_all("a", href=True):
+            full_url = normalize_url(link["href"], base=url)
+            if full_url:
+                links.append((full_url, link.get_text(" ", strip=True)))
+        return self.extract_text(html, url), links
+
+    def _fetch_and_process(self, url):
+        html, byte_count = self.fetch(url)
+        if html is None:
+            return None, [], byte_count
+        text, links = self.process_page(url, html)
+        return text, links, byte_count
+
+    def crawl(self, start_url):
+        """
+        Crawl pages under start_url.
+
+        Returns:
+            tuple: (networkx.DiGraph of links, dict mapping URL to extracted text)
+        """
+        graph = nx.DiGraph()
+        content = {}
+        root = normalize_url(start_url)
+        if root is None:
+            return graph, content
+
+        # Heap entries are (-score, depth, sequence, url); the sequence keeps ties in discovery order
+        counter = itertools.count()
+        frontier = [(-1.0, 0, next(counter), root)]
+        best_score = {root: 1.0}
+        depths = {root: 0}
+        fetched = set()
+        scheduled = 0
+        pruned = set()
+        bytes_fetched = 0
+        byte_budget = self.byte_budget or ByteBudget(self.max_bytes)
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while frontier or in_flight:
+                if self.stopped():
+                    for future in in_flight:
+                        future.cancel()
+                    logging.info(f"Crawl of {root} stopped early")
+                    break
+                while frontier and scheduled < self.max_pages and not byte_budget.exhausted() and len(in_flight) < self.max_workers:
+                    _, depth, _, url = heapq.heappop(frontier)
+                    if url in fetched:
+                        continue  # A stale entry left behind when the link was re-queued with a higher score
+                    fetched.add(url)
+                    in_flight[executor.submit(self._fetch_and_process, url)] = url
+                    scheduled += 1
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url = in_flight.pop(future)
+                    try:
+                        text, links, byte_count = future.result()
+                    except RequestException as e:
+                        logging.warning(f"Error crawling {url}: {e}")
+                        continue
+                    except Exception as e:
+                        logging.error(f"Error processing {url}: {e}")
+                        continue
+                    bytes_fetched += byte_count
+                    byte_budget.add(byte_count)
+                    if text:
+                        content[url] = text
+                    depth = depths[url] + 1
+                    if self.max_depth is not None and depth > self.max_depth:
+                        continue
+                    parent_relevance = self.link_scorer.page_relevance(text) if self.link_scorer else 0.0
+                    for link, anchor_text in links:
+                        if not link.startswith(root):  # Stay on the same site
+                            continue
+                        graph.add_edge(url, link)
+                        if link in fetched:
+                            continue
+                        score = self.link_scorer.score(link, anchor_text, parent_relevance) if self.link_scorer else 0.0
+                        if self.link_scorer and score < self.min_link_score:
+                            pruned.add(link)
+                            continue
+                        if link not in best_score or score > best_score[link]:
+                            best_score[link] = score
+                            depths[link] = min(depth, depths.get(link, depth))
+                            heapq.heappush(frontier, (-score, depths[link], next(counter), link))
+
+        logging.info(f"Crawled {scheduled} pages ({bytes_fetched} bytes) from {root}, pruned {len(pruned)} low-scoring links")
+        return graph, content
@@ -0,0 +1,112 @@
+import hashlib
+import re
+import threading
+
+import numpy as np
+
+from utils.paths import data_path
+from utils.sqlite import ThreadLocalConnection
+
+token_pattern = re.compile(r"\w+")
+
+
+def simhash(text, shingle_size=3):
+    """64-bit SimHash over word shingles; near-identical texts differ in only a few bits."""
+    words = token_pattern.findall(text.lower())
+    if len(words) < shingle_size:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little") for shingle in shingles],
+        dtype=np.uint64
+    )
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(hashes)
+    return int.from_bytes(np.packbits(votes > 0, bitorder="little").tobytes(), "little")
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+def _to_signed(value):
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+class SimHashIndex:
+    """
+    Persistent near-duplicate index of page SimHash signatures.
+
+    Signatures are split into `bands` 16-bit bands stored in indexed columns;
+    two signatures within max_distance bits (max_distance < bands) must agree
+    on at least one band, so candidates come from an indexed lookup rather
+    than a scan. The first URL seen for a piece of content becomes its
+    canonical URL, across queries and across runs.
+    """
+
+    bands = 4
+
+    def __init__(self, path=None, max_distance=3):
+        self.path = path or data_path("cache", "simhash.sqlite")
+        self.max_distance = max_distance
+        schema = "CREATE TABLE IF NOT EXISTS signatures (url TEXT PRIMARY KEY, signature INTEGER, "
+        schema += ", ".join(f"band{i} INTEGER" for i in range(self.bands)) + ");\n"
+        schema += "".join(f"CREATE INDEX IF NOT EXISTS idx_signatures_band{i} ON signatures(band{i});\n" for i in range(self.bands))
+        self._db = ThreadLocalConnection(self.path, schema=schema)
+        self._lock = threading.Lock()
+
+    def _bands(self, signature):
+        return [(signature >> (16 * i)) & 0xFFFF for i in range(self.bands)]
+
+    def find_duplicate(self, signature):
+        """Return the canonical URL of an indexed near-duplicate, or None."""
+        bands = self._bands(signature)
+        where = " OR ".join(f"band{i} = ?" for i in range(self.bands))
+        for url, candidate in self._db.connection().execute(f"SELECT url, signature FROM signatures WHERE {where}", bands):
+            if hamming_distance(signature, candidate % (1 << 64)) <= self.max_distance:
+                return url
+        return None
+
+    def canonicalize(self, url, text):
+        """Return the canonical URL for this page's content, registering it if the content is new."""
+        signature = simhash(text)
+        with self._lock:
+            duplicate = self.find_duplicate(signature)
+            if duplicate:
+                return duplicate
+            with self._db.connection() as conn:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO signatures VALUES (?, ?, {', '.join('?' * self.bands)})",
+                    [url, _to_signed(signature)] + self._bands(signature)
+                )
+        return url
+
+
+class Deduplicator:
+    """Collapses near-duplicate pages within one research call and counts what was removed."""
+
+    def __init__(self, index):
+        self.index = index
+        self._lock = threading.Lock()
+        self._seen = set()
+        self.duplicates = 0
+        self.bytes_eliminated = 0
+
+    def filter(self, pages):
+        """Return pages whose content has not been seen in this call, tagged with a canonical URL."""
+        unique = []
+        for page in pages:
+            canonical = self.index.canonicalize(page["link"], page["content"])
+            with self._lock:
+                if canonical in self._seen:
+                    self.duplicates += 1
+                    self.bytes_eliminated += len(page["content"].encode("utf-8"))
+                    continue
+                self._seen.add(canonical)
+            unique.append(dict(page, canonical=canonical))
+        return unique
+
+    def stats(self):
+        return {"duplicates": self.duplicates, "bytes_eliminated": self.bytes_eliminated}
@@ -0,0 +1,104 @@
+import re
+import zlib
+
+import numpy as np
+
+
+class EmbeddingProvider:
+    """
+    Interface for the embedding backends used by MemoryManager.
+
+    model_name identifies the embedding space; it is part of the embedding
+    cache and manifest keys, so two providers must not share a name unless
+    their vectors are interchangeable.
+    """
+
+    model_name = None
+
+    def embed(self, texts):
+        """Return one embedding (a list or 1-D array of floats) per text."""
+        raise NotImplementedError
+
+
+class OllamaEmbeddingProvider(EmbeddingProvider):
+    def __init__(self, model_name, client):
+        self.model_name = model_name
+        self.client = client
+
+    def embed(self, texts):
+        return self.client.embed(model=self.model_name, input=list(texts))["embeddings"]
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Deterministic, dependency-free embeddings from feature hashing.
+
+    Each text is tokenised into lowercase words plus character n-grams of those
+    words; every feature is hashed with CRC32 into one of `dimension` buckets
+    with a hash-derived sign, and the resulting vector is L2-normalised. Texts
+    sharing vocabulary get high cosine similarity, which is enough to exercise
+    indexing, filtering and ranking without an Ollama server. Results are
+    identical across processes and machines.
+    """
+
+    token_pattern = re.compile(r"\w+")
+
+    def __init__(self, dimension=384, ngram_range=(3, 4), max_cached_words=1000000):
+        self.dimension = dimension
+        self.ngram_range = ngram_range
+        self.max_cached_words = max_cached_words
+        self.model_name = f"hashing-{dimension}-{ngram_range[0]}-{ngram_range[1]}"
+        self._word_cache = {}
+
+    def word_features(self, word):
+        padded = f"<{word}>"
+        features = [word]
+        for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+            features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return features
+
+    def _word_buckets(self, word):
+        # Natural text reuses a small vocabulary, so each word is hashed only once
+        buckets = self._word_cache.get(word)
+        if buckets is None:
+            hashes = np.fromiter((zlib.crc32(feature.encode("utf-8")) for feature in self.word_features(word)), dtype=np.uint32)
+            buckets = ((hashes % self.dimension).astype(np.int64), np.where(hashes & 0x80000000, -1.0, 1.0))
+            if len(self._word_cache) >= self.max_cached_words:
+                self._word_cache.clear()
+            self._word_cache[word] = buckets
+        return buckets
+
+    def embed_matrix(self, texts):
+        matrix = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            buckets = [self._word_buckets(word) for word in self.token_pattern.findall(text.lower())]
+            if not buckets:
+                continue
+            columns = np.concatenate([columns for columns, _ in buckets])
+            signs = np.concatenate([signs for _, signs in buckets])
+            matrix[row] = np.bincount(columns, weights=signs, minlength=self.dimension)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def embed(self, texts):
+        return list(self.embed_matrix(list(texts)))
+
+
+class StubGenerator:
+    """
+    Offline stand-in for the Ollama text generator.
+
+    Returns the first max_sentences sentences of the memory, which keeps
+    summarization pipelines deterministic and cheap for tests and benchmarks.
+    """
+
+    sentence_pattern = re.compile(r"(?<=[.!?])\s+")
+
+    def __init__(self, max_sentences=3, max_chars=500):
+        self.max_sentences = max_sentences
+        self.max_chars = max_chars
+
+    def generate(self, prompt, memory):
+        sentences = self.sentence_pattern.split(str(memory).strip())
+        return " ".join(sentences[:self.max_sentences])[:self.max_chars]
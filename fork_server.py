@@ -0,0 +1,307 @@
+import importlib
+import itertools
+import json
+import os
+import runpy
+import select
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+from sandbox import Sandbox, apply_resource_limits, bounded_text
+
+default_preload = ("numpy", "requests", "pytest")
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def _child_main(request):
+    """Runs in a freshly forked child: isolate, limit, redirect output, then run the target as __main__."""
+    os.setsid()  # Own process group, so a timeout also kills anything the code spawns
+    apply_resource_limits(*request["limits"])
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.close(devnull)
+    for fd, path in ((1, request["stdout_path"]), (2, request["stderr_path"])):
+        file_fd = os.open(path, os.O_WRONLY)
+        os.dup2(file_fd, fd)
+        os.close(file_fd)
+    os.environ.clear()
+    os.environ.update(request["env"])
+    kind, target, args = request["kind"], request["target"], request["args"]
+    exit_code = 0
+    try:
+        os.chdir(request["cwd"])
+        if kind == "path":
+            sys.argv = [target, *args]
+            sys.path.insert(0, os.path.dirname(os.path.abspath(target)))
+            runpy.run_path(target, run_name="__main__")
+        elif kind == "module":
+            sys.argv = [target, *args]
+            sys.path.insert(0, os.getcwd())
+            runpy.run_module(target, run_name="__main__", alter_sys=True)
+        else:
+            sys.argv = ["-c", *args]
+            sys.path.insert(0, os.getcwd())
+            exec(compile(target, "<string>", "exec"), {"__name__": "__main__", "__builtins__": __builtins__})
+    except SystemExit as e:
+        if isinstance(e.code, int) or e.code is None:
+            exit_code = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+    os._exit(exit_code)
+
+
+def serve(preload):
+    """
+    Fork server main loop.
+
+    Imports the preload modules once, then reads JSON requests line by line
+    from stdin, forks a child per request and answers with {"id", "pid"}
+    straight away and {"id", "exitcode"} once the child has been reaped.
+    """
+    for name in preload:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"Fork server could not preload {name}: {e}", file=sys.stderr)
+
+    # Keep the protocol on a private descriptor so stray prints cannot corrupt it
+    protocol_fd = os.dup(1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+
+    def send(message):
+        os.write(protocol_fd, (json.dumps(message) + "\n").encode("utf-8"))
+
+    wakeup_r, wakeup_w = os.pipe()
+    os.set_blocking(wakeup_r, False)
+    os.set_blocking(wakeup_w, False)
+    signal.set_wakeup_fd(wakeup_w)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+    children = {}
+
+    def reap():
+        while children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            send({"id": children.pop(pid), "exitcode": os.waitstatus_to_exitcode(status)})
+
+    send({"ready": True})
+    buffer = b""
+    while True:
+        readable, _, _ = select.select([0, wakeup_r], [], [])
+        if wakeup_r in readable:
+            try:
+                while os.read(wakeup_r, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+        reap()
+        if 0 not in readable:
+            continue
+        data = os.read(0, 65536)
+        if not data:
+            break  # The client went away
+        buffer += data
+        while b"\n" in buffer:
+            line, buffer = buffer.split(b"\n", 1)
+            request = json.loads(line)
+            pid = os.fork()
+            if pid == 0:
+                signal.set_wakeup_fd(-1)
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                for fd in (wakeup_r, wakeup_w, protocol_fd):
+                    os.close(fd)
+                _child_main(request)
+            children[pid] = request["id"]
+            send({"id": request["id"], "pid": pid})
+
+
+class WarmSandbox(Sandbox):
+    """
+    Sandbox that forks runs from a warm interpreter instead of starting Python each time.
+
+    A long-lived fork server process imports the `preload` modules once;
+    run_python/run_module/run_code fork a fresh child from it per call, so
+    runs stay isolated from each other without paying interpreter startup and
+    the imports again. Children get the same timeout, rlimits and bounded
+    output as Sandbox. run() (arbitrary commands) still starts a new process,
+    and on platforms without fork everything falls back to Sandbox.
+    """
+
+    def __init__(self, preload=default_preload, **kwargs):
+        super().__init__(**kwargs)
+        self.preload = list(preload)
+        self.enabled = hasattr(os, "fork")
+        self.server = None
+        self._server_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._ids = itertools.count()
+        self._pending = {}
+
+    def warm(self):
+        """Start the fork server, importing the preload modules, if it is not running."""
+        with self._server_lock:
+            if self.server is not None and self.server.poll() is None:
+                return self.server
+            server = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--serve", *self.preload],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, start_new_session=True
+            )
+            ready = server.stdout.readline()
+            if not ready:
+                raise RuntimeError("Fork server failed to start")
+            threading.Thread(target=self._read_responses, args=(server,), daemon=True).start()
+            self.server = server
+            self.logger.info(f"Fork server started with preloaded modules: {', '.join(self.preload)}")
+            return server
+
+    def warm_async(self):
+        if self.enabled:
+            threading.Thread(target=self.warm, daemon=True).start()
+
+    def _read_responses(self, server):
+        for line in server.stdout:
+            message = json.loads(line)
+            pending = self._pending.get(message["id"])
+            if pending is None:
+                continue
+            if "pid" in message:
+                pending["pid"] = message["pid"]
+                pending["started"].set()
+            else:
+                pending["exitcode"] = message["exitcode"]
+                pending["finished"].set()
+        # The server died; release anyone still waiting on it
+        for pending in list(self._pending.values()):
+            pending["started"].set()
+            pending["finished"].set()
+
+    def _run_forked(self, kind, target, args, cwd, timeout, env):
+        timeout = timeout or self.timeout
+        server = self.warm()
+        with tempfile.NamedTemporaryFile(prefix="warm_stdout_", delete=False) as out, \
+                tempfile.NamedTemporaryFile(prefix="warm_stderr_", delete=False) as err:
+            stdout_path, stderr_path = out.name, err.name
+        request_id = next(self._ids)
+        pending = self._pending[request_id] = {
+            "pid": None, "exitcode": None, "started": threading.Event(), "finished": threading.Event()
+        }
+        request = {
+            "id": request_id, "kind": kind, "target": target, "args": list(args),
+            # The caller's current directory and environment, as a fresh subprocess would get
+            "cwd": os.path.abspath(cwd or os.getcwd()),
+            "env": dict(os.environ, PYTHONDONTWRITEBYTECODE="1", **(env or {})),
+            "stdout_path": stdout_path, "stderr_path": stderr_path,
+            "limits": [self.cpu_time, self.memory_mb, self.max_file_mb]
+        }
+        try:
+            started = time.perf_counter()
+            with self._write_lock:
+                server.stdin.write((json.dumps(request) + "\n").encode("utf-8"))
+                server.stdin.flush()
+            timed_out = not pending["finished"].wait(timeout)
+            if timed_out:
+                pending["started"].wait()
+                self._kill_group(pending["pid"])
+                pending["finished"].wait()
+                self.logger.warning(f"Sandboxed run timed out after {timeout}s: {kind} {target if kind != 'code' else '<code>'}")
+            # Whatever the child left running in its group goes too, as with Sandbox.run
+            self._kill_group(pending["pid"])
+            duration = time.perf_counter() - started
+            exitcode = pending["exitcode"]
+            return {
+                "returncode": exitcode,
+                "stdout": self._read_bounded(stdout_path),
+                "stderr": self._read_bounded(stderr_path),
+                "duration": duration,
+                "timed_out": timed_out,
+                "cpu_limit_exceeded": exitcode == -signal.SIGXCPU
+            }
+        finally:
+            self._pending.pop(request_id, None)
+            for path in (stdout_path, stderr_path):
+                os.remove(path)
+
+    @staticmethod
+    def _kill_group(pid):
+        if pid:
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def _read_bounded(self, path):
+        with open(path, "rb") as f:
+            data = f.read(self.max_output_bytes)
+        return bounded_text(data, os.path.getsize(path), self.max_output_bytes)
+
+    def run_python(self, script_path, args=(), cwd=None, timeout=None, env=None):
+        if not self.enabled:
+            return super().run_python(script_path, args, cwd, timeout, env)
+        return self._run_forked("path", script_path, args, cwd, timeout, env)
+
+    def run_module(self, module, args=(), cwd=None, timeout=None, env=None):
+        if not self.enabled:
+            return super().run_module(module, args, cwd, timeout, env)
+        return self._run_forked("module", module, args, cwd, timeout, env)
+
+    def run_code(self, code, args=(), cwd=None, timeout=None, env=None):
+        if not self.enabled:
+            return super().run_code(code, args, cwd, timeout, env)
+        return self._run_forked("code", code, args, cwd, timeout, env)
+
+    def close(self):
+        super().close()
+        with self._server_lock:
+            if self.server is not None:
+                self.server.stdin.close()
+                self.server.wait()
+                self.server = None
+
+
+def shared_sandbox():
+    """The process-wide WarmSandbox, so every caller forks from the same warm interpreter."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = WarmSandbox()
+            _shared.warm_async()
+        return _shared
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--serve":
+        serve(sys.argv[2:])
+    else:
+        script = "import numpy, requests\nprint(numpy.arange(10).sum())\n"
+        for label, sandbox in (("subprocess", Sandbox()), ("fork server", WarmSandbox())):
+            if isinstance(sandbox, WarmSandbox):
+                sandbox.warm()
+            timings = []
+            for _ in range(10):
+                result = sandbox.run_code(script)
+                timings.append(result["duration"])
+            timings.sort()
+            print(f"{label:<12} median {timings[len(timings) // 2] * 1000:7.1f} ms  output {result['stdout'].strip()}")
+            sandbox.close()
@@ -0,0 +1,151 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import black
+
+from utils.paths import data_path
+from utils.sqlite import ThreadLocalConnection, trim_lru
+
+
+def _format_file(path, mode, write):
+    """Format one file in a pool process; returns (status, original, formatted) with status "unchanged", "reformatted" or "error"."""
+    with open(path, "r", encoding="utf-8") as f:
+        original = f.read()
+    try:
+        formatted = black.format_str(original, mode=mode)
+    except Exception as e:
+        return "error", original, str(e)
+    if formatted == original:
+        return "unchanged", original, formatted
+    if write:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(formatted)
+    return "reformatted", original, formatted
+
+
+def find_mode(search_start=None):
+    """black.Mode from the [tool.black] settings black itself would find, or the defaults."""
+    path = black.find_pyproject_toml((search_start or os.getcwd(),))
+    config = black.parse_pyproject_toml(path) if path else {}
+    return black.Mode(
+        target_versions={black.TargetVersion[version.upper()] for version in config.get("target_version", [])},
+        line_length=config.get("line_length", black.DEFAULT_LINE_LENGTH),
+        string_normalization=not config.get("skip_string_normalization", False),
+        is_pyi=config.get("pyi", False),
+        skip_source_first_line=config.get("skip_source_first_line", False),
+        magic_trailing_comma=not config.get("skip_magic_trailing_comma", False),
+        preview=config.get("preview", False)
+    )
+
+
+class FormatService:
+    """
+    Black formatting without a subprocess per snippet.
+
+    Snippets are formatted in-process with black.format_str. Output is cached
+    in SQLite keyed by the hash of (black version, mode, content), and every
+    formatted result is also recorded as its own fixed point, so formatting
+    already-formatted code is a cache hit. Workspace batches are formatted on
+    a process pool; files whose output is already cached are answered
+    without being sent to a worker. Without an explicit mode, the
+    pyproject.toml settings black would use are applied.
+    """
+
+    def __init__(self, mode=None, max_workers=None, cache_path=None, max_cache_entries=20000):
+        self.mode = mode or find_mode()
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.cache_path = cache_path or data_path("cache", "format.sqlite")
+        self.max_cache_entries = max_cache_entries
+        self.logger = logging.getLogger(__name__)
+        self._mode_key = f"{black.__version__}:{self.mode!r}"
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._db = ThreadLocalConnection(
+            self.cache_path, schema="CREATE TABLE IF NOT EXISTS formatted (key TEXT PRIMARY KEY, output TEXT, last_access REAL)"
+        )
+
+    def cache_key(self, content):
+        return hashlib.sha256(f"{self._mode_key}\0{content}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, content):
+        key = self.cache_key(content)
+        conn = self._db.connection()
+        row = conn.execute("SELECT output FROM formatted WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute("UPDATE formatted SET last_access = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def _store(self, pairs):
+        now = time.time()
+        rows = []
+        for original, formatted in pairs:
+            rows.append((self.cache_key(original), formatted, now))
+            rows.append((self.cache_key(formatted), formatted, now))  # Formatted output is a fixed point
+        with self._db.connection() as conn:
+            conn.executemany("INSERT OR REPLACE INTO formatted VALUES (?, ?, ?)", rows)
+            trim_lru(conn, "formatted", "key", self.max_cache_entries)
+
+    def format_code(self, code):
+        """Return code formatted by black. Raises black.InvalidInput for code black cannot parse."""
+        formatted = self._lookup(code)
+        if formatted is None:
+            formatted = black.format_str(code, mode=self.mode)
+            self._store([(code, formatted)])
+        return formatted
+
+    def format_files(self, paths, write=True):
+        """
+        Format files in parallel across processes.
+
+        Args:
+            paths (list): Files to format.
+            write (bool): Write reformatted files back to disk.
+
+        Returns:
+            dict: Maps each path to "unchanged", "reformatted" or "error: <message>".
+        """
+        results = {}
+        pending = []
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f:
+                content = f.read()
+            formatted = self._lookup(content)
+            if formatted is None:
+                pending.append(path)
+            elif formatted == content:
+                results[path] = "unchanged"
+            else:
+                if write:
+                    with open(path, "w", encoding="utf-8") as f:
+                        f.write(formatted)
+                results[path] = "reformatted"
+        if pending:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                executor = self._executor
+            futures = {path: executor.submit(_format_file, path, self.mode, write) for path in pending}
+            formatted_pairs = []
+            for path, future in futures.items():
+                status, original, output = future.result()
+                if status == "error":
+                    results[path] = f"error: {output}"
+                else:
+                    results[path] = status
+                    formatted_pairs.append((original, output))
+            if formatted_pairs:
+                self._store(formatted_pairs)
+        self.logger.info(f"Formatted {len(pending)} of {len(paths)} files ({len(paths) - len(pending)} answered from the cache)")
+        return results
+
+    def close(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
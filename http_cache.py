@@ -0,0 +1,291 @@
+import email.utils
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from crawler import normalize_url
+from utils.paths import data_path
+from utils.sqlite import ThreadLocalConnection, trim_lru
+
+index_schema = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    url TEXT,
+    status INTEGER,
+    headers TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    expires REAL,
+    size INTEGER,
+    last_access REAL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access);
+CREATE TABLE IF NOT EXISTS extracted_text (body_hash TEXT PRIMARY KEY, text TEXT, last_access REAL);
+"""
+
+def parse_cache_control(value):
+    directives = {}
+    for part in (value or "").split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') or True
+    return directives
+
+
+class CachingSession(requests.Session):
+    """
+    requests.Session with a disk-backed HTTP cache for GET requests.
+
+    Bodies are stored as files under `directory` (cache/http in the data
+    directory by default), indexed in SQLite by normalised URL; both are
+    created on first use. Cache-Control (no-store, no-cache, max-age) and Expires
+    decide freshness; stale entries with an ETag or Last-Modified are
+    revalidated with a conditional request, and a 304 is answered from disk.
+    Responses without caching headers are only stored when they carry a
+    validator, and are then revalidated on every use. Bodies are written to
+    the cache as the caller reads them, so stream=True keeps its memory
+    bound; a body is only kept once it has been read in full and stayed
+    within max_entry_bytes. Total body size is capped at max_bytes with
+    least-recently-used eviction.
+
+    The same store caches text extracted from page bodies (keyed on the body
+    hash), so pages that come back unchanged are not re-parsed either.
+    """
+
+    def __init__(self, directory=None, max_bytes=200 * 1024 * 1024, max_entry_bytes=10 * 1024 * 1024,
+                 max_text_entries=50000):
+        super().__init__()
+        self.directory = directory or data_path("cache", "http")
+        self.bodies_directory = os.path.join(self.directory, "bodies")
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.max_text_entries = max_text_entries
+        self.logger = logging.getLogger(__name__)
+        self._db = ThreadLocalConnection(os.path.join(self.directory, "index.sqlite"), schema=index_schema)
+        self._stats_lock = threading.Lock()
+        self.stats = self._empty_stats()
+
+    # Statistics
+
+    @staticmethod
+    def _empty_stats():
+        return {"hits": 0, "revalidated": 0, "misses": 0, "bytes_saved": 0, "bytes_downloaded": 0, "text_hits": 0}
+
+    def _count(self, **increments):
+        with self._stats_lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+
+    def reset_stats(self):
+        """Return the statistics gathered so far and start counting from zero."""
+        with self._stats_lock:
+            stats, self.stats = self.stats, self._empty_stats()
+        return stats
+
+    @staticmethod
+    def format_stats(stats):
+        requests_made = stats["hits"] + stats["revalidated"] + stats["misses"]
+        hit_rate = (stats["hits"] + stats["revalidated"]) / requests_made if requests_made else 0.0
+        return (f"HTTP cache: {requests_made} requests, hit rate {hit_rate:.0%} "
+                f"({stats['hits']} fresh, {stats['revalidated']} revalidated), "
+                f"{stats['bytes_saved']} bytes saved, {stats['bytes_downloaded']} downloaded, "
+                f"{stats['text_hits']} extraction cache hits")
+
+    # HTTP caching
+
+    def _body_path(self, key):
+        return os.path.join(self.bodies_directory, hashlib.sha256(key.encode("utf-8")).hexdigest())
+
+    def _freshness(self, headers, now):
+        """Return (storable, expires) for a response's headers."""
+        directives = parse_cache_control(headers.get("Cache-Control"))
+        if "no-store" in directives:
+            return False, 0.0
+        if "no-cache" in directives:
+            return True, 0.0
+        if "max-age" in directives:
+            try:
+                return True, now + int(directives["max-age"])
+            except ValueError:
+                return True, 0.0
+        if headers.get("Expires"):
+            try:
+                return True, email.utils.parsedate_to_datetime(headers["Expires"]).timestamp()
+            except (TypeError, ValueError):
+                return True, 0.0
+        # Without caching headers a stored copy is only useful as a revalidation target
+        return bool(headers.get("ETag") or headers.get("Last-Modified")), 0.0
+
+    def _cached_response(self, entry, request_url):
+        key, url, status, headers = entry[:4]
+        try:
+            with open(self._body_path(key), "rb") as f:
+                body = f.read()
+        except FileNotFoundError:
+            return None
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response._content = body
+        response._content_consumed = True
+        response.url = url or request_url
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.reason = "OK (cached)"
+        return response
+
+    def _tee(self, response, key=None, expires=None, now=None):
+        """
+        Count the body as it is read and, given a key, write it to the cache.
+
+        Wraps response.iter_content, which response.content also reads
+        through. The entry is only committed once the body has been read in
+        full; past max_entry_bytes, or if the reader stops early, the partial
+        file is discarded.
+        """
+        iter_content = response.iter_content
+
+        def tee(chunk_size=1, decode_unicode=False):
+            f = temp_path = None
+            if key is not None and not decode_unicode:
+                os.makedirs(self.bodies_directory, exist_ok=True)
+                fd, temp_path = tempfile.mkstemp(dir=self.bodies_directory, suffix=".tmp")
+                f = os.fdopen(fd, "wb")
+            size = 0
+            complete = False
+            try:
+                for chunk in iter_content(chunk_size, decode_unicode):
+                    if not decode_unicode:
+                        size += len(chunk)
+                        self._count(bytes_downloaded=len(chunk))
+                    if f is not None:
+                        if size > self.max_entry_bytes:
+                            f.close()
+                            f = None
+                            os.remove(temp_path)
+                        else:
+                            f.write(chunk)
+                    yield chunk
+                complete = True
+            finally:
+                if f is not None:
+                    f.close()
+                    if complete:
+                        self._store(key, response, expires, now, temp_path, size)
+                    else:
+                        os.remove(temp_path)
+
+        response.iter_content = tee
+
+    def _store(self, key, response, expires, now, temp_path, size):
+        os.replace(temp_path, self._body_path(key))
+        headers = {name: value for name, value in response.headers.items() if name.lower() not in ("content-encoding", "transfer-encoding", "content-length")}
+        with self._db.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, response.url, response.status_code, json.dumps(headers), response.headers.get("ETag"),
+                 response.headers.get("Last-Modified"), expires, size, now)
+            )
+        self._evict()
+
+    def _evict(self):
+        conn = self._db.connection()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            if total <= self.max_bytes * 0.9:
+                break
+            victims.append(key)
+            total -= size
+        with conn:
+            conn.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key in victims])
+        for key in victims:
+            try:
+                os.remove(self._body_path(key))
+            except FileNotFoundError:
+                pass
+
+    def request(self, method, url, **kwargs):
+        if method.upper() != "GET":
+            return super().request(method, url, **kwargs)
+        if kwargs.get("params"):
+            url = requests.Request("GET", url, params=kwargs.pop("params")).prepare().url
+        key = normalize_url(url)
+        if key is None:
+            return super().request(method, url, **kwargs)
+
+        now = time.time()
+        conn = self._db.connection()
+        entry = conn.execute("SELECT * FROM responses WHERE key = ?", (key,)).fetchone()
+        if entry and entry[6] > now:
+            response = self._cached_response(entry, url)
+            if response is not None:
+                with conn:
+                    conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                self._count(hits=1, bytes_saved=entry[7])
+                return response
+
+        # Always stream underneath so the body can be capped and written to disk as it is read
+        stream = kwargs.pop("stream", False)
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry:
+            if entry[4]:
+                headers["If-None-Match"] = entry[4]
+            if entry[5]:
+                headers["If-Modified-Since"] = entry[5]
+        response = super().request(method, url, headers=headers, stream=True, **kwargs)
+
+        if response.status_code == 304 and entry:
+            response.close()
+            storable, expires = self._freshness(response.headers, now)
+            with conn:
+                conn.execute("UPDATE responses SET expires = ?, last_access = ? WHERE key = ?", (expires, now, key))
+            cached = self._cached_response(entry, url)
+            if cached is not None:
+                self._count(revalidated=1, bytes_saved=entry[7])
+                return cached
+            # The body file vanished; fetch it again unconditionally
+            kwargs["headers"] = {k: v for k, v in headers.items() if k not in ("If-None-Match", "If-Modified-Since")}
+            response = super().request(method, url, stream=True, **kwargs)
+
+        storable, expires = self._freshness(response.headers, now)
+        content_length = int(response.headers.get("Content-Length") or 0)
+        if response.status_code == 200 and storable and content_length <= self.max_entry_bytes:
+            self._tee(response, key, expires, now)
+        else:
+            self._tee(response)
+        self._count(misses=1)
+        if not stream:
+            response.content  # Read (and cache) the body now, as requests does without stream=True
+        return response
+
+    # Extracted text caching
+
+    @staticmethod
+    def body_hash(html):
+        return hashlib.sha256(html.encode("utf-8", errors="replace")).hexdigest()
+
+    def get_extracted_text(self, html):
+        """Return (found, text) for the text previously extracted from this exact body."""
+        body_hash = self.body_hash(html)
+        conn = self._db.connection()
+        row = conn.execute("SELECT text FROM extracted_text WHERE body_hash = ?", (body_hash,)).fetchone()
+        if row is None:
+            return False, None
+        with conn:
+            conn.execute("UPDATE extracted_text SET last_access = ? WHERE body_hash = ?", (time.time(), body_hash))
+        self._count(text_hits=1)
+        return True, row[0]
+
+    def put_extracted_text(self, html, text):
+        with self._db.connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO extracted_text VALUES (?, ?, ?)", (self.body_hash(html), text, time.time()))
+            trim_lru(conn, "extracted_text", "body_hash", self.max_text_entries)
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.paths import data_path
+from utils.sqlite import ThreadLocalConnection, trim_lru
+
+_worker_rcfile = None
+_worker_directory = None
+
+
+def _init_worker(rcfile):
+    """Runs once per pool process: import pylint and fill astroid's module cache with the usual imports."""
+    global _worker_rcfile, _worker_directory
+    _worker_rcfile = rcfile
+    _worker_directory = tempfile.mkdtemp(prefix="lint_worker_")
+    _lint("warmup.py", "import os\nimport sys\nimport json\nimport re\nimport typing\nimport collections\n", None)
+
+
+def _lint(name, content, path):
+    """Lint path, or content written to a scratch file called name; returns structured messages."""
+    from pylint.lint import Run
+    from pylint.reporters import CollectingReporter
+
+    if path is None:
+        path = os.path.join(_worker_directory, os.path.basename(name))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+    args = [path, "--persistent=n", "--score=n"]
+    if _worker_rcfile:
+        args += ["--rcfile", _worker_rcfile]
+    reporter = CollectingReporter()
+    Run(args, reporter=reporter, exit=False)
+    return [
+        {
+            "path": name,
+            "line": message.line,
+            "column": message.column,
+            "category": message.category,
+            "msg_id": message.msg_id,
+            "symbol": message.symbol,
+            "message": message.msg,
+            "obj": message.obj
+        }
+        for message in sorted(reporter.messages, key=lambda message: (message.line, message.column))
+    ]
+
+
+def find_rcfile():
+    """The configuration file pylint would pick up from the working directory, or None."""
+    from pylint import config
+    if hasattr(config, "find_pylintrc"):  # Removed in pylint 3
+        return config.find_pylintrc()
+    return next(iter(config.find_default_config_files()), None)
+
+
+class LintService:
+    """
+    Pylint as a long-running service.
+
+    Linting happens in a pool of worker processes that import pylint once and
+    keep astroid's parsed-module cache between calls, so the standard library
+    and dependencies are not re-parsed for every file. Results are cached in
+    SQLite by content hash (together with the pylint version, rcfile and file
+    name), and unchanged inputs are answered from the cache without linting.
+    Without an explicit rcfile, the one pylint discovers from the working
+    directory is passed to the workers, whose scratch files live elsewhere.
+    Cache entries do not track the files a module imports, so a changed
+    dependency does not invalidate its importers.
+    """
+
+    def __init__(self, max_workers=None, rcfile=None, cache_path=None, max_cache_entries=20000):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        rcfile = rcfile or find_rcfile()
+        self.rcfile = os.path.abspath(rcfile) if rcfile else None
+        self.cache_path = cache_path or data_path("cache", "lint.sqlite")
+        self.max_cache_entries = max_cache_entries
+        self.logger = logging.getLogger(__name__)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._db = ThreadLocalConnection(
+            self.cache_path, schema="CREATE TABLE IF NOT EXISTS lint_results (key TEXT PRIMARY KEY, messages TEXT, last_access REAL)"
+        )
+        self._config_hash = self._configuration_hash()
+
+    def _configuration_hash(self):
+        from pylint import __version__ as pylint_version
+        digest = hashlib.sha256(pylint_version.encode("utf-8"))
+        if self.rcfile and os.path.exists(self.rcfile):
+            with open(self.rcfile, "rb") as f:
+                digest.update(f.read())
+        return digest.hexdigest()
+
+    def _executor_instance(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker, initargs=(self.rcfile,))
+            return self._executor
+
+    def cache_key(self, name, content):
+        digest = hashlib.sha256(self._config_hash.encode("utf-8"))
+        digest.update(os.path.basename(name).encode("utf-8") + b"\0")
+        digest.update(content.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _cached(self, keys):
+        conn = self._db.connection()
+        found = {}
+        for key in keys:
+            row = conn.execute("SELECT messages FROM lint_results WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                found[key] = json.loads(row[0])
+        if found:
+            with conn:
+                conn.executemany("UPDATE lint_results SET last_access = ? WHERE key = ?", [(time.time(), key) for key in found])
+        return found
+
+    def _store(self, results):
+        with self._db.connection() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO lint_results VALUES (?, ?, ?)",
+                [(key, json.dumps(messages), time.time()) for key, messages in results.items()]
+            )
+            trim_lru(conn, "lint_results", "key", self.max_cache_entries)
+
+    def lint_batch(self, items):
+        """
+        Lint several sources in parallel.
+
+        Args:
+            items (list): (name, content, path) tuples. path is the file to lint in place,
+                or None to lint content from a scratch file called name.
+
+        Returns:
+            dict: Maps each name to its list of message dicts (path, line, column, category,
+                msg_id, symbol, message, obj).
+        """
+        keys = {name: self.cache_key(name, content) for name, content, _ in items}
+        cached = self._cached(set(keys.values()))
+        results = {name: cached[key] for name, key in keys.items() if key in cached}
+        to_lint = [(name, content, path) for name, content, path in items if name not in results]
+        if to_lint:
+            executor = self._executor_instance()
+            futures = {name: executor.submit(_lint, name, content, path) for name, content, path in to_lint}
+            fresh = {}
+            for name, future in futures.items():
+                results[name] = future.result()
+                fresh[keys[name]] = results[name]
+            self._store(fresh)
+        self.logger.info(f"Linted {len(to_lint)} of {len(items)} sources ({len(items) - len(to_lint)} unchanged)")
+        return results
+
+    def lint_code(self, code, name="snippet.py"):
+        return self.lint_batch([(name, code, None)])[name]
+
+    def lint_files(self, paths):
+        """Lint files on disk in parallel; files whose content has not changed are not linted again."""
+        items = []
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f:
+                items.append((path, f.read(), path))
+        return self.lint_batch(items)
+
+    def close(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
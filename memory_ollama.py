@@ -1,40 +1,486 @@
-import chromadb
+import asyncio
+import concurrent.futures
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
 import ollama
 
+from embeddings import OllamaEmbeddingProvider
+from utils.sqlite import ThreadLocalConnection
+from vector_index import VectorIndex
+
+try:
+    import chromadb
+except ImportError:
+    chromadb = None
+
+
+_ollama_clients = {}
+_ollama_clients_lock = threading.Lock()
+
+
+def get_ollama_client(host=None, timeout=None):
+    """Return a process-wide Ollama client per (host, timeout) so HTTP connections are pooled and reused."""
+    key = (host, timeout)
+    with _ollama_clients_lock:
+        client = _ollama_clients.get(key)
+        if client is None:
+            client = ollama.Client(host=host, timeout=timeout)
+            _ollama_clients[key] = client
+        return client
+
+
+class EmbeddingCache:
+    """Thread-safe LRU cache of embeddings keyed on (model, content hash)."""
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model_name, content):
+        return model_name, hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def get(self, model_name, content):
+        key = self.key(model_name, content)
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, model_name, content, embedding):
+        key = self.key(model_name, content)
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class IndexManifest:
+    """
+    Record of the (memory id, content hash) pairs already in the memory collection.
+
+    Keys include the id, so the same text saved under another id (for example
+    the same message in two agents' histories) is still indexed for each of
+    them. With a path the manifest lives in SQLite next to the persistent
+    collection, so a resumed run can tell which memories are indexed without
+    re-embedding or loading anything up front. Without a path it is an
+    in-process set.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._keys = set() if path is None else None
+        self._db = ThreadLocalConnection(path, schema=(
+            "CREATE TABLE IF NOT EXISTS indexed_memories "
+            "(memory_id TEXT, content_hash TEXT, PRIMARY KEY (memory_id, content_hash))"
+        )) if path else None
+
+    def known(self, keys):
+        """Return the subset of (memory_id, content_hash) keys that is already indexed."""
+        keys = set(keys)
+        if self._keys is not None:
+            return keys & self._keys
+        known = set()
+        content_hashes = list({content_hash for _, content_hash in keys})
+        conn = self._db.connection()
+        for i in range(0, len(content_hashes), 500):
+            chunk = content_hashes[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(f"SELECT memory_id, content_hash FROM indexed_memories WHERE content_hash IN ({placeholders})", chunk)
+            known.update(key for key in rows if key in keys)
+        return known
+
+    def record(self, keys):
+        """Mark (memory_id, content_hash) keys as indexed."""
+        if self._keys is not None:
+            self._keys.update(keys)
+            return
+        with self._db.connection() as conn:
+            conn.executemany("INSERT OR IGNORE INTO indexed_memories VALUES (?, ?)", keys)
+
+    def __len__(self):
+        if self._keys is not None:
+            return len(self._keys)
+        return self._db.connection().execute("SELECT COUNT(*) FROM indexed_memories").fetchone()[0]
+
+
+def build_memory_filter(agent=None, kind=None, iteration_range=None):
+    """
+    Build a where filter for MemoryManager searches.
+
+    Args:
+        agent (str): Only return memories written by this agent.
+        kind (str or list): Memory kind(s), e.g. "code", "review" or "tool_output".
+        iteration_range (tuple): Inclusive (first, last) iteration; either bound may be None.
+
+    Returns:
+        dict: A Chroma-style where clause, or None when no filter applies.
+    """
+    conditions = []
+    if agent:
+        conditions.append({"agent": agent})
+    if kind:
+        conditions.append({"kind": {"$in": list(kind)}} if isinstance(kind, (list, tuple, set)) else {"kind": kind})
+    if iteration_range:
+        first, last = iteration_range
+        if first is not None:
+            conditions.append({"iteration": {"$gte": first}})
+        if last is not None:
+            conditions.append({"iteration": {"$lte": last}})
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def maximal_marginal_relevance(query_embedding, embeddings, k, lambda_mult=0.5):
+    """Return the indices of k embeddings chosen by MMR, trading relevance against redundancy."""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if len(embeddings) == 0:
+        return []
+    embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    query = query / max(np.linalg.norm(query), 1e-12)
+    relevance = embeddings @ query
+    selected = [int(np.argmax(relevance))]
+    redundancy = embeddings @ embeddings[selected[0]]
+    while len(selected) < min(k, len(embeddings)):
+        mmr_scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        mmr_scores[selected] = -np.inf
+        best = int(np.argmax(mmr_scores))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, embeddings @ embeddings[best])
+    return selected
+
+
 class MemoryManager:
-    def __init__(self, model_name="mxbai-embed-large"):
-        self.client = chromadb.Client()
-        self.model_name = model_name
-
-        # Check if the collection already exists
-        existing_collections = self.client.list_collections()
-        if any(collection.name == "memory" for collection in existing_collections):
-            self.collection = self.client.get_collection(name="memory")
+    def __init__(self, model_name="mxbai-embed-large", batch_size=32, embedding_cache=None,
+                 backend="chroma", index_directory="memory_index", persist_directory=None,
+                 generation_model="llama3.1:8b", host=None, request_timeout=None,
+                 embedding_provider=None, generator=None):
+        self.generation_model = generation_model
+        self.host = host
+        self.request_timeout = request_timeout
+        self.ollama_client = get_ollama_client(host, request_timeout)
+        # Pluggable backends, e.g. embeddings.HashingEmbeddingProvider and StubGenerator for offline use
+        self.embedding_provider = embedding_provider or OllamaEmbeddingProvider(model_name, self.ollama_client)
+        self.model_name = self.embedding_provider.model_name
+        self.generator = generator
+        self.persist_directory = persist_directory
+        self.batch_size = batch_size
+        self.embedding_cache = embedding_cache or EmbeddingCache()
+        self.logger = logging.getLogger(__name__)
+
+        # Write-behind queue, drained by a background thread started on first use
+        self._write_queue = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+
+        if persist_directory:
+            os.makedirs(persist_directory, exist_ok=True)
+            index_directory = os.path.join(persist_directory, "vectors")
+
+        self.client = None
+        if backend == "chroma":
+            try:
+                self.collection = self._open_chroma_collection()
+            except Exception as e:
+                self.logger.warning(f"Chroma unavailable ({e}); falling back to the built-in vector index.")
+                backend = "numpy"
+        if backend == "numpy":
+            self.collection = VectorIndex(index_directory)
+        elif backend != "chroma":
+            raise ValueError(f"Unknown memory backend: {backend}")
+        self.backend = backend
+        # One manifest per backend: after a fallback to the built-in index, Chroma's manifest says nothing about it
+        if persist_directory:
+            self.manifest = IndexManifest(os.path.join(persist_directory, f"{backend}_manifest.sqlite"))
         else:
-            self.collection = self.client.create_collection(name="memory")
-
-    def save_memory(self, memory_id, content):
-        response = ollama.embeddings(model=self.model_name, prompt=content)
-        embedding = response["embedding"]
-        self.collection.add(
-            ids=[memory_id],
-            embeddings=[embedding],
-            documents=[content]
+            self.manifest = IndexManifest()
+
+    def _open_chroma_collection(self):
+        if chromadb is None:
+            raise ImportError("chromadb is not installed")
+        if self.persist_directory:
+            self.client = chromadb.PersistentClient(path=os.path.join(self.persist_directory, "chroma"))
+        else:
+            self.client = chromadb.Client()
+        return self.client.get_or_create_collection(name="memory", metadata={"hnsw:space": "cosine"})
+
+    def embed_texts(self, texts, batch_size=None, use_cache=True):
+        """Embed texts in batches, only sending unseen content to Ollama."""
+        batch_size = batch_size or self.batch_size
+        embeddings = [self.embedding_cache.get(self.model_name, text) if use_cache else None for text in texts]
+
+        pending = list(OrderedDict.fromkeys(text for text, embedding in zip(texts, embeddings) if embedding is None))
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        computed = {}
+        for batch, batch_embeddings in zip(batches, self._embed_batches(batches)):
+            for text, embedding in zip(batch, batch_embeddings):
+                computed[text] = embedding
+                if use_cache:
+                    self.embedding_cache.put(self.model_name, text, embedding)
+
+        return [embedding if embedding is not None else computed[text] for text, embedding in zip(texts, embeddings)]
+
+    def _embed_batches(self, batches):
+        return [self.embedding_provider.embed(batch) for batch in batches]
+
+    def save_memories(self, memories, batch_size=None):
+        """
+        Save many (memory_id, content) or (memory_id, content, metadata) tuples
+        with batched embedding and insert calls.
+
+        Metadata keys agent, iteration and kind can be used as search filters.
+        Memories whose id and content are already recorded in the manifest are
+        skipped, so re-saving a resumed run's history only embeds what is new;
+        the embedding cache still shares work between ids with the same content.
+        Returns the number of memories written.
+        """
+        batch_size = batch_size or self.batch_size
+        memories = [tuple(memory) + (None,) * (3 - len(memory)) for memory in memories]
+        keys = [(memory_id, self.content_hash(content)) for memory_id, content, _ in memories]
+        known = self.manifest.known(keys)
+        unique = {}
+        for key, memory in zip(keys, memories):
+            if key not in known and key not in unique:
+                unique[key] = memory
+        keys, memories = list(unique), list(unique.values())
+
+        # All batches are embedded up front so concurrent subclasses can overlap the requests
+        embeddings = self.embed_texts([content for _, content, _ in memories], batch_size=batch_size)
+        for i in range(0, len(memories), batch_size):
+            batch = memories[i:i + batch_size]
+            ids = [memory_id for memory_id, _, _ in batch]
+            documents = [content for _, content, _ in batch]
+            # Chroma rejects missing or empty metadata, so untagged memories get a default kind
+            metadatas = [metadata or {"kind": "memory"} for _, _, metadata in batch]
+            self.collection.add(
+                ids=ids,
+                embeddings=embeddings[i:i + batch_size],
+                documents=documents,
+                metadatas=metadatas
+            )
+            self.manifest.record(keys[i:i + batch_size])
+        return len(memories)
+
+    def content_hash(self, content):
+        return hashlib.sha256(f"{self.model_name}\0{content}".encode("utf-8")).hexdigest()
+
+    def save_memory(self, memory_id, content, metadata=None):
+        self.save_memories([(memory_id, content, metadata)])
+
+    def enqueue_memory(self, memory_id, content, metadata=None):
+        """Queue a memory for background indexing so the caller does not block on Ollama."""
+        self._ensure_writer()
+        self._write_queue.put((memory_id, content, metadata))
+
+    def enqueue_memories(self, memories):
+        self._ensure_writer()
+        for memory in memories:
+            self._write_queue.put(memory)
+
+    def flush(self):
+        """Block until every queued memory has been indexed."""
+        self._write_queue.join()
+
+    def _ensure_writer(self):
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_behind_loop, name="memory-writer", daemon=True)
+                self._writer.start()
+
+    def _write_behind_loop(self):
+        while True:
+            batch = [self._write_queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._write_queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.save_memories(batch)
+            except Exception as e:
+                self.logger.error(f"Background memory indexing failed for {len(batch)} items: {e}")
+            finally:
+                for _ in batch:
+                    self._write_queue.task_done()
+
+    def benchmark_embeddings(self, texts, batch_sizes=(1, 8, 32, 128)):
+        """Measure embeddings per second for each batch size, bypassing the cache."""
+        report = {}
+        for batch_size in batch_sizes:
+            start = time.perf_counter()
+            self.embed_texts(texts, batch_size=batch_size, use_cache=False)
+            elapsed = time.perf_counter() - start
+            report[batch_size] = len(texts) / elapsed if elapsed > 0 else float("inf")
+        return report
+
+    def search_memories(self, query, k=5, where=None, mmr=False, fetch_k=None, lambda_mult=0.5):
+        """
+        Return the top-k memories for a query.
+
+        Args:
+            query (str): The text to search for.
+            k (int): Number of results to return.
+            where (dict): Metadata filter, see build_memory_filter. Evaluated by the store.
+            mmr (bool): Re-rank fetch_k candidates with maximal marginal relevance for diversity.
+            fetch_k (int): Candidates fetched before MMR re-ranking (default 4 * k).
+            lambda_mult (float): MMR trade-off, 1.0 is pure relevance and 0.0 pure diversity.
+
+        Returns:
+            list: Dictionaries with id, document, metadata and score (cosine similarity), best first.
+        """
+        query_embedding = self.embed_texts([query])[0]
+        n_results = max(fetch_k or 4 * k, k) if mmr else k
+        include = ["documents", "metadatas", "distances"] + (["embeddings"] if mmr else [])
+        query_args = {"query_embeddings": [query_embedding], "n_results": n_results, "include": include}
+        if where:
+            query_args["where"] = where
+        results = self.collection.query(**query_args)
+
+        ids = results["ids"][0] if results.get("ids") else []
+        if not ids:
+            return []
+        metadatas = (results.get("metadatas") or [[None] * len(ids)])[0]
+        memories = [
+            {"id": memory_id, "document": document, "metadata": metadata, "score": 1.0 - distance}
+            for memory_id, document, metadata, distance in zip(ids, results["documents"][0], metadatas, results["distances"][0])
+        ]
+        if mmr:
+            order = maximal_marginal_relevance(query_embedding, results["embeddings"][0], k, lambda_mult)
+            memories = [memories[i] for i in order]
+        return memories[:k]
+
+    def retrieve_memory(self, query, top_results=1, where=None):
+        memories = self.search_memories(query, k=top_results, where=where)
+        if not memories:
+            return None
+        return memories[0]["document"]
+
+    @staticmethod
+    def _generation_prompt(prompt, memory):
+        return f"Using this memory: {memory}. Respond to this prompt: {prompt}"
+
+    def generate_response(self, prompt, memory):
+        if self.generator:
+            return self.generator.generate(prompt, memory)
+        output = self.ollama_client.generate(
+            model=self.generation_model,
+            prompt=self._generation_prompt(prompt, memory)
         )
+        return output['response']
+
+    def generate_responses(self, prompt, memories):
+        """Answer the same prompt against each memory, e.g. to summarize a list of chunks."""
+        return [self.generate_response(prompt, memory) for memory in memories]
 
-    def retrieve_memory(self, query, top_results=1):
-        response = ollama.embeddings(prompt=query, model=self.model_name)
-        query_embedding = response["embedding"]
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_results
+
+class AsyncMemoryManager(MemoryManager):
+    """
+    MemoryManager that talks to Ollama through a shared AsyncClient.
+
+    Embedding batches and generation requests are issued concurrently, at most
+    max_concurrency at a time, each bounded by request_timeout. The client and
+    its connection pool live on a private event loop thread; the inherited
+    synchronous methods (embed_texts, save_memories, generate_response, ...)
+    submit work to that loop, so existing callers keep working unchanged while
+    async callers can await the a* coroutines directly on the same loop.
+    """
+
+    def __init__(self, *args, max_concurrency=4, request_timeout=120.0, **kwargs):
+        super().__init__(*args, request_timeout=request_timeout, **kwargs)
+        self.max_concurrency = max_concurrency
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, name="ollama-async", daemon=True)
+        self._loop_thread.start()
+        self.async_client = None
+        self._semaphore = None
+        self._run(self._setup())
+
+    async def _setup(self):
+        # Both objects bind to the running loop, so they are created on it
+        self.async_client = ollama.AsyncClient(host=self.host, timeout=self.request_timeout)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    def _run(self, coroutine, timeout=None):
+        future = asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    async def _limited(self, request):
+        async with self._semaphore:
+            return await asyncio.wait_for(request, self.request_timeout)
+
+    async def _gather(self, requests):
+        tasks = [asyncio.ensure_future(self._limited(request)) for request in requests]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            # One failure (or cancellation of the caller) cancels every outstanding request
+            for task in tasks:
+                task.cancel()
+            raise
+
+    async def aembed_batches(self, batches):
+        responses = await self._gather(
+            self.async_client.embed(model=self.model_name, input=batch) for batch in batches
         )
-        retrieved_memory = results['documents'][0][0]
-        return retrieved_memory
+        return [response["embeddings"] for response in responses]
 
-    def generate_response(self, prompt, memory):
-        output = ollama.generate(
-            model="llama3.1:8b",
-            prompt=f"Using this memory: {memory}. Respond to this prompt: {prompt}"
+    async def agenerate_response(self, prompt, memory):
+        output = await self._limited(
+            self.async_client.generate(model=self.generation_model, prompt=self._generation_prompt(prompt, memory))
         )
-        return output['response']
\ No newline at end of file
+        return output['response']
+
+    async def agenerate_responses(self, prompt, memories):
+        outputs = await self._gather(
+            self.async_client.generate(model=self.generation_model, prompt=self._generation_prompt(prompt, memory))
+            for memory in memories
+        )
+        return [output['response'] for output in outputs]
+
+    def _embed_batches(self, batches):
+        if not isinstance(self.embedding_provider, OllamaEmbeddingProvider):
+            return super()._embed_batches(batches)
+        return self._run(self.aembed_batches(batches))
+
+    def generate_response(self, prompt, memory):
+        if self.generator:
+            return super().generate_response(prompt, memory)
+        return self._run(self.agenerate_response(prompt, memory))
+
+    def generate_responses(self, prompt, memories, timeout=None):
+        if self.generator:
+            return super().generate_responses(prompt, memories)
+        return self._run(self.agenerate_responses(prompt, memories), timeout)
+
+    def close(self):
+        self.flush()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join()
+
+
+if __name__ == "__main__":
+    memory_manager = MemoryManager()
+    sample_texts = [f"Memory entry {i}: agent output about iteration {i % 50}" for i in range(512)]
+    for batch_size, rate in memory_manager.benchmark_embeddings(sample_texts).items():
+        print(f"batch_size={batch_size:>4}: {rate:8.1f} embeddings/s")
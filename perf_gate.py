@@ -0,0 +1,254 @@
+import ast
+import hashlib
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from utils.paths import data_path
+
+benchmark_prefixes = ("bench_", "benchmark_")
+benchmark_module = "perf_benchmarks"
+benchmark_harness = """
+import gc, json, runpy, sys, timeit, tracemalloc
+path, names, repeats, output_path = sys.argv[1], sys.argv[2].split(","), int(sys.argv[3]), sys.argv[4]
+namespace = runpy.run_path(path, run_name="__benchmark__")  # By path: the name may shadow a preloaded module
+results = {}
+for name in names:
+    func = namespace.get(name)
+    if not callable(func):
+        continue
+    try:
+        timer = timeit.Timer(func)
+        number, _ = timer.autorange()  # Also serves as the warm-up
+        times = [elapsed / number for elapsed in timer.repeat(repeat=repeats, number=number)]
+        gc.collect()
+        tracemalloc.start()  # A separate, untimed call: tracing would distort the timings
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {"times": times, "number": number, "peak_kb": round(peak / 1024, 1)}
+    except Exception as e:
+        results[name] = {"error": f"{type(e).__name__}: {e}"}
+with open(output_path, "w") as f:
+    json.dump(results, f)
+"""
+
+
+def discover_benchmarks(code):
+    """Names of the top-level bench_*/benchmark_* functions in code that can be called without arguments."""
+    try:
+        module = ast.parse(code)
+    except SyntaxError:
+        return []
+    names = []
+    for node in module.body:
+        if isinstance(node, ast.FunctionDef) and node.name.startswith(benchmark_prefixes):
+            arguments = node.args
+            required = len(arguments.posonlyargs) + len(arguments.args) - len(arguments.defaults)
+            required += sum(default is None for default in arguments.kw_defaults)
+            if required == 0:
+                names.append(node.name)
+    return names
+
+
+def summarize_times(times):
+    """Median and interquartile range of per-call times, in seconds."""
+    if len(times) < 2:
+        return {"median": times[0], "q1": times[0], "q3": times[0], "iqr": 0.0}
+    q1, median, q3 = statistics.quantiles(times, n=4, method="inclusive")
+    return {"median": median, "q1": q1, "q3": q3, "iqr": q3 - q1}
+
+
+def format_seconds(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
+
+
+class PerfGate:
+    """
+    Benchmark-and-compare stage for code revisions.
+
+    Benchmarks are zero-argument functions named bench_* or benchmark_*,
+    either defined in the code itself or supplied separately as a module
+    that imports it. Both revisions run in the sandbox, one after the other;
+    each benchmark is timed with timeit (autoranged loop count, then
+    `repeats` rounds with the garbage collector off) and its peak traced
+    memory is measured in one extra call. A benchmark counts as regressed
+    when its median slows by more than time_threshold and the interquartile
+    ranges of the two revisions do not overlap, or when its peak memory
+    grows by more than memory_threshold. Results are appended to a JSON
+    history per file name so reviews can see the trend; callers should pass
+    the same name for every revision of one program.
+    """
+
+    def __init__(self, sandbox, workspace_folder="workspace", history_dir=None, repeats=5,
+                 time_threshold=0.10, memory_threshold=0.20, min_memory_delta_kb=64, reject_regressions=False,
+                 max_history=50):
+        self.sandbox = sandbox
+        self.workspace_folder = workspace_folder
+        self.history_dir = history_dir or data_path("cache", "perf_history")
+        self.repeats = repeats
+        self.time_threshold = time_threshold
+        self.memory_threshold = memory_threshold
+        self.min_memory_delta_kb = min_memory_delta_kb
+        self.reject_regressions = reject_regressions
+        self.max_history = max_history
+        self.logger = logging.getLogger(__name__)
+
+    def _run_revision(self, temp_dir, label, file_name, code, names, benchmark_code):
+        """Benchmark one revision; returns {"benchmarks": {name: measurements}}, or {"error": message} if the run failed."""
+        revision_dir = os.path.join(temp_dir, label)
+        os.makedirs(revision_dir)
+        target = os.path.abspath(os.path.join(revision_dir, file_name))
+        with open(target, "w", encoding="utf-8") as f:
+            f.write(code)
+        if benchmark_code:
+            target = os.path.abspath(os.path.join(revision_dir, f"{benchmark_module}.py"))
+            with open(target, "w", encoding="utf-8") as f:
+                f.write(benchmark_code)
+        output_path = os.path.abspath(os.path.join(revision_dir, "benchmarks.json"))
+        run = self.sandbox.run_code(benchmark_harness, [target, ",".join(names), str(self.repeats), output_path],
+                                    cwd=revision_dir)
+        if not os.path.exists(output_path):
+            if run["timed_out"] or run["cpu_limit_exceeded"]:
+                return {"error": "Benchmarks exceeded the sandbox time limit."}
+            return {"error": run["stderr"].strip() or f"Benchmark run exited with code {run['returncode']}"}
+        with open(output_path, "r", encoding="utf-8") as f:
+            return {"benchmarks": json.load(f)}
+
+    def _compare(self, old, new):
+        if "error" in new:
+            return {"verdict": "error", "error_message": new["error"]}
+        current = dict(summarize_times(new["times"]), peak_kb=new["peak_kb"], number=new["number"])
+        if old is None or "error" in old:
+            return {"verdict": "new", "current": current}
+        baseline = dict(summarize_times(old["times"]), peak_kb=old["peak_kb"], number=old["number"])
+        ratio = current["median"] / baseline["median"] if baseline["median"] else 1.0
+        memory_delta = current["peak_kb"] - baseline["peak_kb"]
+        slower = ratio > 1 + self.time_threshold and current["q1"] > baseline["q3"]
+        faster = ratio < 1 - self.time_threshold and current["q3"] < baseline["q1"]
+        heavier = memory_delta > max(self.min_memory_delta_kb, baseline["peak_kb"] * self.memory_threshold)
+        verdict = "regressed" if slower or heavier else "improved" if faster else "unchanged"
+        return {
+            "verdict": verdict,
+            "time_ratio": round(ratio, 3),
+            "memory_delta_kb": round(memory_delta, 1),
+            "slower": slower,
+            "heavier": heavier,
+            "baseline": baseline,
+            "current": current
+        }
+
+    def check(self, file_name, new_code, old_code=None, benchmark_code=None):
+        """
+        Benchmark a new revision against the previous one and record the result.
+
+        Args:
+            file_name (str): The file the code lives in; names the module and the history.
+            new_code (str): The new revision.
+            old_code (str): The previous revision, if any.
+            benchmark_code (str): Optional module with bench_* functions that imports the code by module name.
+                By default the bench_* functions defined in the code itself are used.
+
+        Returns:
+            dict: A dictionary containing the status and per-benchmark comparisons.
+                - status (str): "passed", "regressed", "rejected" (regressed with reject_regressions set),
+                  "skipped" (no benchmarks) or "error".
+                - benchmarks (dict): Maps each benchmark to its verdict ("regressed", "improved", "unchanged",
+                  "new" or "error") with median, IQR and peak memory of both revisions.
+                - summary (str): A short text summary for prompts.
+        """
+        file_name = os.path.basename(file_name)
+        names = discover_benchmarks(benchmark_code or new_code)
+        if not names:
+            return {"status": "skipped", "benchmarks": {}, "summary": "No bench_* functions to run."}
+        try:
+            with tempfile.TemporaryDirectory(dir=self.workspace_folder) as temp_dir:
+                new_run = self._run_revision(temp_dir, "new", file_name, new_code, names, benchmark_code)
+                old_run = self._run_revision(temp_dir, "old", file_name, old_code, names, benchmark_code) if old_code else {}
+        except Exception as e:
+            self.logger.exception(f"Error running benchmarks for '{file_name}': {str(e)}")
+            return {"status": "error", "benchmarks": {}, "summary": f"Benchmarks could not be run: {e}", "error_message": str(e)}
+        if "error" in new_run:
+            self.logger.error(f"Benchmarks for '{file_name}' failed: {new_run['error']}")
+            return {"status": "error", "benchmarks": {}, "summary": f"Benchmarks failed: {new_run['error']}",
+                    "error_message": new_run["error"]}
+
+        old_benchmarks = old_run.get("benchmarks", {})
+        comparisons = {
+            name: self._compare(old_benchmarks.get(name), result)
+            for name, result in new_run["benchmarks"].items()
+        }
+        regressed = [name for name, comparison in comparisons.items() if comparison["verdict"] == "regressed"]
+        status = ("rejected" if self.reject_regressions else "regressed") if regressed else "passed"
+        result = {"status": status, "benchmarks": comparisons}
+        result["summary"] = self.format_result(result)
+        self.record(file_name, new_code, result)
+        self.logger.info(f"Performance gate for '{file_name}': {status} ({len(comparisons)} benchmarks)")
+        return result
+
+    @staticmethod
+    def format_result(result):
+        lines = [f"Performance gate: {result['status']}"]
+        for name, comparison in result["benchmarks"].items():
+            if comparison["verdict"] == "error":
+                lines.append(f"- {name}: error: {comparison['error_message']}")
+                continue
+            current = comparison["current"]
+            line = (f"- {name}: {comparison['verdict']}, median {format_seconds(current['median'])} "
+                    f"(IQR {format_seconds(current['iqr'])}), peak {current['peak_kb']:.0f} KiB")
+            if "baseline" in comparison:
+                baseline = comparison["baseline"]
+                line += (f"; previously {format_seconds(baseline['median'])} (IQR {format_seconds(baseline['iqr'])}), "
+                         f"peak {baseline['peak_kb']:.0f} KiB; x{comparison['time_ratio']} time")
+            lines.append(line)
+        return "\n".join(lines)
+
+    def _history_path(self, file_name):
+        return os.path.join(self.history_dir, f"{os.path.basename(file_name)}.json")
+
+    def history(self, file_name):
+        try:
+            with open(self._history_path(file_name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return []
+
+    def record(self, file_name, code, result):
+        entries = self.history(file_name)
+        entries.append({
+            "timestamp": time.time(),
+            "code_hash": hashlib.sha256(code.encode("utf-8")).hexdigest()[:16],
+            "status": result["status"],
+            "benchmarks": {
+                name: {key: comparison["current"][key] for key in ("median", "iqr", "peak_kb")}
+                for name, comparison in result["benchmarks"].items() if "current" in comparison
+            }
+        })
+        entries = entries[-self.max_history:]
+        os.makedirs(self.history_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.history_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+        os.replace(temp_path, self._history_path(file_name))
+
+    def trend(self, file_name, last=5):
+        """Text summary of each benchmark's median and peak memory over the last few accepted revisions."""
+        entries = [entry for entry in self.history(file_name) if entry["status"] != "rejected"][-last:]
+        series = {}
+        for entry in entries:
+            for name, measurement in entry["benchmarks"].items():
+                series.setdefault(name, []).append(measurement)
+        if not series:
+            return ""
+        lines = [f"Benchmark trend for {os.path.basename(file_name)} (oldest to newest, last {len(entries)} revisions):"]
+        for name, measurements in series.items():
+            medians = " -> ".join(format_seconds(measurement["median"]) for measurement in measurements)
+            peaks = " -> ".join(f"{measurement['peak_kb']:.0f}" for measurement in measurements)
+            lines.append(f"- {name}: median {medians}; peak KiB {peaks}")
+        return "\n".join(lines)
@@ -0,0 +1,36 @@
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+
+
+class RelevanceScorer:
+    """
+    Batch query/document similarity scoring.
+
+    All documents for a query are vectorised together and scored with a single
+    sparse matrix product against the query row. Nothing mutable is shared
+    between calls: the TF-IDF mode fits a fresh vectorizer per batch, and the
+    streaming mode uses a stateless HashingVectorizer with a fixed feature
+    space, so one scorer can be used from any number of threads.
+
+    TF-IDF scores depend on the other documents in the batch. Use the
+    streaming mode whenever scores from different batches are compared.
+    """
+
+    def __init__(self, streaming=False, n_features=2 ** 18):
+        self.streaming = streaming
+        self.hashing_vectorizer = HashingVectorizer(n_features=n_features, alternate_sign=False, norm="l2", stop_words="english") if streaming else None
+
+    def score(self, query, texts):
+        """Return an array with the cosine similarity between query and each text."""
+        if not texts:
+            return np.zeros(0)
+        if self.streaming:
+            matrix = self.hashing_vectorizer.transform([query] + list(texts))
+        else:
+            try:
+                matrix = TfidfVectorizer().fit_transform([query] + list(texts))
+            except ValueError:
+                # Empty vocabulary, e.g. every document is stop words or punctuation
+                return np.zeros(len(texts))
+        # Rows are L2-normalised, so the dot product is the cosine similarity
+        return np.asarray((matrix[1:] @ matrix[0].T).todense()).ravel()
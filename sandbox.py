@@ -0,0 +1,235 @@
+import logging
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; runs there get timeouts but no rlimits
+    resource = None
+
+
+def apply_resource_limits(cpu_time=None, memory_mb=None, max_file_mb=None):
+    """Set rlimits on the current process. Meant to run in a freshly started or forked child."""
+    if resource is None:
+        return
+    if cpu_time:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_time, cpu_time + 1))
+    if memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    if max_file_mb:
+        limit = max_file_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_FSIZE, (limit, limit))
+
+
+reader_grace_period = 1.0  # Seconds to wait for output after the child exits; a leftover grandchild may hold the pipe open
+
+# Runs in the child before the command: sets the rlimits, then execs the command in place. Used instead of a
+# preexec_fn, which is not safe to run in a forked child of a threaded parent.
+limits_wrapper = """
+import os, resource, sys
+cpu_time, memory_mb, max_file_mb = (int(value) for value in sys.argv[1:4])
+if cpu_time:
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_time, cpu_time + 1))
+if memory_mb:
+    resource.setrlimit(resource.RLIMIT_AS, (memory_mb * 1024 * 1024,) * 2)
+if max_file_mb:
+    resource.setrlimit(resource.RLIMIT_FSIZE, (max_file_mb * 1024 * 1024,) * 2)
+os.execvp(sys.argv[4], sys.argv[4:])
+"""
+
+
+def _drain(pipe, limit, sink):
+    """
+    Read a pipe to EOF into sink, a [bytearray, total] pair, keeping at most limit bytes
+    so a chatty child cannot exhaust memory. sink is updated as chunks arrive, so the
+    output read so far is available even if the reader is abandoned.
+    """
+    kept = sink[0]
+    for chunk in iter(lambda: pipe.read1(65536), b""):
+        sink[1] += len(chunk)
+        if len(kept) < limit:
+            kept.extend(chunk[:limit - len(kept)])
+    pipe.close()
+
+
+def bounded_text(data, total, limit):
+    text = data.decode("utf-8", errors="replace")
+    if total > limit:
+        text += f"\n... [truncated {total - limit} bytes]"
+    return text
+
+
+def parse_junit_xml(path):
+    """
+    Parse a pytest junitxml report.
+
+    Returns:
+        list: One dict per test with name, classname, outcome ("passed", "failed", "error" or "skipped"),
+            duration in seconds and, for non-passing tests, the failure message.
+    """
+    tests = []
+    try:
+        root = ET.parse(path).getroot()
+    except (ET.ParseError, FileNotFoundError):
+        return tests
+    for case in root.iter("testcase"):
+        outcome, message = "passed", None
+        for tag in ("failure", "error", "skipped"):
+            element = case.find(tag)
+            if element is not None:
+                outcome = "failed" if tag == "failure" else tag
+                message = element.get("message") or (element.text or "").strip()[:2000]
+                break
+        tests.append({
+            "name": case.get("name"),
+            "classname": case.get("classname"),
+            "outcome": outcome,
+            "duration": float(case.get("time") or 0.0),
+            "message": message
+        })
+    return tests
+
+
+class Sandbox:
+    """
+    Runs untrusted code in separate worker processes.
+
+    Every run gets a wall-clock timeout, CPU-time, address-space and file-size
+    rlimits on POSIX, and stdout/stderr capped at max_output_bytes each. The
+    child leads its own process group, which is killed once the child exits
+    or times out, so background processes it started do not outlive the run.
+    Up to max_workers runs execute in parallel.
+    """
+
+    def __init__(self, max_workers=None, timeout=30, cpu_time=30, memory_mb=1024, max_file_mb=64, max_output_bytes=64 * 1024):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.cpu_time = cpu_time
+        self.memory_mb = memory_mb
+        self.max_file_mb = max_file_mb
+        self.max_output_bytes = max_output_bytes
+        self.logger = logging.getLogger(__name__)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def _limited(self, argv):
+        """argv wrapped so the rlimits are applied in the child before the command starts."""
+        if resource is None:
+            return list(argv)
+        limits = [str(limit or 0) for limit in (self.cpu_time, self.memory_mb, self.max_file_mb)]
+        return [sys.executable, "-c", limits_wrapper, *limits, *argv]
+
+    def run(self, argv, cwd=None, timeout=None, env=None, stdin=None, rlimits=True):
+        """
+        Run argv in a sandboxed child process.
+
+        Args:
+            argv (list): Command and arguments.
+            cwd (str): Working directory for the child.
+            timeout (float): Wall-clock limit in seconds; defaults to the sandbox timeout.
+            env (dict): Extra environment variables.
+            stdin (str): Text fed to the child's standard input.
+            rlimits (bool): Apply the CPU, memory and file-size rlimits; without them only the timeout holds.
+
+        Returns:
+            dict: returncode, stdout, stderr, duration (seconds), timed_out, and cpu_limit_exceeded.
+        """
+        timeout = timeout or self.timeout
+        child_env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1", **(env or {}))
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            self._limited(argv) if rlimits else list(argv), cwd=cwd, env=child_env,
+            stdin=subprocess.PIPE if stdin is not None else subprocess.DEVNULL,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            start_new_session=os.name == "posix"
+        )
+        stdout, stderr = [bytearray(), 0], [bytearray(), 0]
+        readers = [
+            threading.Thread(target=_drain, args=(process.stdout, self.max_output_bytes, stdout), daemon=True),
+            threading.Thread(target=_drain, args=(process.stderr, self.max_output_bytes, stderr), daemon=True)
+        ]
+        for reader in readers:
+            reader.start()
+        if stdin is not None:
+            try:
+                process.stdin.write(stdin.encode("utf-8"))
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+        timed_out = False
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            self._kill(process)
+            process.wait()
+        # Whatever the child left running in its group goes too, so it cannot keep the pipes open
+        self._kill(process)
+        for reader in readers:
+            reader.join(timeout=reader_grace_period)
+        duration = time.perf_counter() - started
+
+        cpu_limit_exceeded = os.name == "posix" and process.returncode == -signal.SIGXCPU
+        if timed_out:
+            self.logger.warning(f"Sandboxed run timed out after {timeout}s: {argv}")
+        return {
+            "returncode": process.returncode,
+            "stdout": bounded_text(bytes(stdout[0]), stdout[1], self.max_output_bytes),
+            "stderr": bounded_text(bytes(stderr[0]), stderr[1], self.max_output_bytes),
+            "duration": duration,
+            "timed_out": timed_out,
+            "cpu_limit_exceeded": cpu_limit_exceeded
+        }
+
+    @staticmethod
+    def _kill(process):
+        try:
+            if os.name == "posix":
+                os.killpg(process.pid, signal.SIGKILL)  # Also takes down anything the code spawned
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass
+
+    def run_python(self, script_path, args=(), cwd=None, timeout=None, env=None):
+        return self.run([sys.executable, script_path, *args], cwd=cwd, timeout=timeout, env=env)
+
+    def run_module(self, module, args=(), cwd=None, timeout=None, env=None):
+        return self.run([sys.executable, "-m", module, *args], cwd=cwd, timeout=timeout, env=env)
+
+    def run_code(self, code, args=(), cwd=None, timeout=None, env=None):
+        """Run a Python source string as __main__."""
+        return self.run([sys.executable, "-c", code, *args], cwd=cwd, timeout=timeout, env=env)
+
+    def run_pytest(self, target, cwd=None, timeout=None, extra_args=()):
+        """
+        Run pytest on target in a sandboxed child and collect per-test results from its junitxml report.
+
+        Returns:
+            dict: The run() fields plus tests (see parse_junit_xml) and summary (counts per outcome).
+        """
+        with tempfile.TemporaryDirectory() as report_dir:
+            report_path = os.path.join(report_dir, "report.xml")
+            args = [target, "-q", "-p", "no:cacheprovider", f"--junitxml={report_path}", *extra_args]
+            result = self.run_module("pytest", args, cwd=cwd, timeout=timeout)
+            result["tests"] = parse_junit_xml(report_path)
+        summary = {"passed": 0, "failed": 0, "error": 0, "skipped": 0}
+        for test in result["tests"]:
+            summary[test["outcome"]] += 1
+        result["summary"] = summary
+        return result
+
+    def map(self, func, items):
+        """Apply one of the run methods to each item in parallel, preserving order."""
+        return list(self.executor.map(func, items))
+
+    def close(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,96 @@
+import itertools
+import re
+
+import networkx as nx
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from utils.tokens import estimate_tokens
+
+sentence_pattern = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\[])|\n+")
+
+
+def split_sentences(text, min_chars=30, max_chars=600):
+    sentences = []
+    for sentence in sentence_pattern.split(text):
+        sentence = " ".join(sentence.split())
+        if min_chars <= len(sentence) <= max_chars:
+            sentences.append(sentence)
+    return sentences
+
+
+class TextRankSummarizer:
+    """
+    Query-biased extractive summarizer.
+
+    Sentences from all sources are embedded with TF-IDF, connected in a graph
+    weighted by their pairwise cosine similarity (one sparse matrix product),
+    and ranked with PageRank personalised towards sentences similar to the
+    query. The best sentences are kept until the token budget is spent and
+    are emitted in source order with a reference to the page they came from.
+    """
+
+    def __init__(self, max_tokens=400, similarity_threshold=0.1, max_sentences=1500):
+        self.max_tokens = max_tokens
+        self.similarity_threshold = similarity_threshold
+        self.max_sentences = max_sentences
+
+    def rank(self, sentences, query):
+        """Return a TextRank score per sentence."""
+        if len(sentences) == 1:
+            return np.ones(1)
+        try:
+            matrix = TfidfVectorizer(stop_words="english").fit_transform(sentences + [query])
+        except ValueError:
+            return np.ones(len(sentences))
+        sentence_matrix, query_vector = matrix[:-1], matrix[-1]
+        similarity = (sentence_matrix @ sentence_matrix.T).toarray()
+        np.fill_diagonal(similarity, 0.0)
+        similarity[similarity < self.similarity_threshold] = 0.0
+
+        relevance = np.asarray((sentence_matrix @ query_vector.T).todense()).ravel()
+        personalization = relevance + 1e-3
+        personalization = dict(enumerate(personalization / personalization.sum()))
+        graph = nx.from_numpy_array(similarity)
+        try:
+            scores = nx.pagerank(graph, personalization=personalization, weight="weight")
+        except nx.PowerIterationFailedConvergence:
+            return relevance
+        return np.array([scores[i] for i in range(len(sentences))])
+
+    def summarize(self, sources, query, max_tokens=None):
+        """
+        Summarize a list of (url, text) pairs.
+
+        Returns:
+            str: Numbered key sentences with [n] source markers, followed by the numbered source list.
+        """
+        max_tokens = max_tokens or self.max_tokens
+        sentences, origins = [], []
+        candidates = ((sentence, source_index) for source_index, (_, text) in enumerate(sources)
+                      for sentence in split_sentences(text))
+        for sentence, source_index in itertools.islice(candidates, self.max_sentences):
+            sentences.append(sentence)
+            origins.append(source_index)
+        if not sentences:
+            return ""
+
+        scores = self.rank(sentences, query)
+        selected, used_tokens = [], 0
+        for i in np.argsort(-scores):
+            tokens = estimate_tokens(sentences[i])
+            if used_tokens + tokens > max_tokens:
+                continue
+            selected.append(i)
+            used_tokens += tokens
+
+        cited = {}
+        lines = []
+        for n, i in enumerate(sorted(selected), 1):
+            reference = cited.setdefault(origins[i], len(cited) + 1)
+            lines.append(f"{n}. {sentences[i]} [{reference}]")
+        lines.append("")
+        lines.append("Sources:")
+        for source_index, reference in cited.items():
+            lines.append(f"[{reference}] {sources[source_index][0]}")
+        return "\n".join(lines)
@@ -1,14 +1,153 @@
+import sqlite3
 import spacy
 from spacy.matcher import Matcher
 from spacy.tokens import Doc, Span
-from datetime import datetime, timedelta
+from datetime import datetime, date, timedelta
+from utils.sqlite import ThreadLocalConnection
+
+PRIORITY_ORDER = {"high": 3, "medium": 2, "low": 1}
+TASK_FIELDS = ("task", "status", "due_date", "priority", "category", "assignee")
+TASK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    due_date TEXT,
+    priority TEXT,
+    priority_rank INTEGER NOT NULL DEFAULT 0,
+    category TEXT,
+    assignee TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
+CREATE INDEX IF NOT EXISTS idx_tasks_assignee ON tasks(assignee);
+CREATE INDEX IF NOT EXISTS idx_tasks_category ON tasks(category);
+CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks(priority_rank DESC, id);
+CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON tasks(due_date, status);
+"""
+
+
+class SQLiteTaskStore:
+    """
+    Persistent task storage backed by SQLite in WAL mode.
+
+    Each thread gets its own connection, so several agent threads (or worker
+    processes pointing at the same file) can read while one of them writes.
+    Task ids handed out by TaskManager are positions in insertion order, which
+    this store maps onto row ids.
+    """
+
+    def __init__(self, db_path, timeout=30.0):
+        self.db_path = db_path
+        self.timeout = timeout
+        self._db = ThreadLocalConnection(db_path, schema=TASK_SCHEMA, timeout=timeout, row_factory=sqlite3.Row,
+                                         pragmas=("synchronous=NORMAL", f"busy_timeout={int(timeout * 1000)}"))
+        self._db.connection()
+
+    @staticmethod
+    def _to_row(task):
+        due_date = task.get("due_date")
+        priority = task.get("priority")
+        return (
+            task.get("task"),
+            task.get("status", "pending"),
+            due_date.isoformat() if isinstance(due_date, date) else due_date,
+            priority,
+            PRIORITY_ORDER.get(priority or "low", 0),
+            task.get("category"),
+            task.get("assignee"),
+        )
+
+    @staticmethod
+    def _to_task(row):
+        task = {}
+        for field in TASK_FIELDS:
+            value = row[field]
+            if value is None:
+                continue
+            if field == "due_date":
+                value = date.fromisoformat(value)
+            task[field] = value
+        return task
+
+    def add_tasks(self, tasks):
+        conn = self._db.connection()
+        with conn:
+            conn.executemany(
+                "INSERT INTO tasks (task, status, due_date, priority, priority_rank, category, assignee) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [self._to_row(task) for task in tasks]
+            )
+
+    def query(self, where="", params=(), order_by="id"):
+        sql = f"SELECT * FROM tasks {'WHERE ' + where if where else ''} ORDER BY {order_by}"
+        return [self._to_task(row) for row in self._db.connection().execute(sql, params)]
+
+    def load_tasks(self):
+        return self.query()
+
+    def filter_tasks(self, **kwargs):
+        clauses, params = [], []
+        for key, value in kwargs.items():
+            if key not in TASK_FIELDS:
+                return []
+            if value is None:
+                clauses.append(f"{key} IS NULL")
+            else:
+                clauses.append(f"{key} = ?")
+                params.append(value.isoformat() if isinstance(value, date) else value)
+        return self.query(" AND ".join(clauses), params)
+
+    def count_by_status(self):
+        rows = self._db.connection().execute("SELECT status, COUNT(*) AS n FROM tasks GROUP BY status")
+        return {row["status"]: row["n"] for row in rows}
+
+    def _row_id(self, task_id):
+        row = self._db.connection().execute(
+            "SELECT id FROM tasks ORDER BY id LIMIT 1 OFFSET ?", (task_id,)
+        ).fetchone()
+        return row["id"] if row else None
+
+    def update_status(self, task_id, status):
+        conn = self._db.connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row_id = self._row_id(task_id)
+            if row_id is None:
+                return None
+            conn.execute("UPDATE tasks SET status = ? WHERE id = ?", (status, row_id))
+            return self._to_task(conn.execute("SELECT * FROM tasks WHERE id = ?", (row_id,)).fetchone())
+
+    def delete(self, task_id):
+        conn = self._db.connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row_id = self._row_id(task_id)
+            if row_id is None:
+                return None
+            task = self._to_task(conn.execute("SELECT * FROM tasks WHERE id = ?", (row_id,)).fetchone())
+            conn.execute("DELETE FROM tasks WHERE id = ?", (row_id,))
+            return task
+
+    def delete_completed(self):
+        conn = self._db.connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            completed = self.query("status = ?", ("completed",))
+            conn.execute("DELETE FROM tasks WHERE status = ?", ("completed",))
+        return completed
+
+    def close(self):
+        self._db.close()
+
 
 class TaskManager:
-    def __init__(self):
+    def __init__(self, db_path=None):
         self.nlp = spacy.load("en_core_web_sm")
         self.matcher = Matcher(self.nlp.vocab)
         self.add_patterns()
-        self.tasks = []
+        # With a db_path, tasks survive restarts and self.tasks is a snapshot of the store.
+        self.store = SQLiteTaskStore(db_path) if db_path else None
+        self.tasks = self.store.load_tasks() if self.store else []
 
     def add_patterns(self):
         task_pattern = [{"POS": "VERB"}, {"POS": "NOUN"}]
@@ -27,6 +166,7 @@ class TaskManager:
         doc = self.nlp(text)
         matches = self.matcher(doc)
         current_task = {}
+        new_tasks = []
 
         for match_id, start, end in matches:
             label = self.nlp.vocab.strings[match_id]
@@ -34,7 +174,7 @@ class TaskManager:
 
             if label == "TASK":
                 if current_task:
-                    self.tasks.append(current_task)
+                    new_tasks.append(current_task)
                 current_task = {"task": span.text, "status": "pending"}
             elif label == "DUE_DATE":
                 due_date = doc[end-1].text
@@ -50,9 +190,18 @@ class TaskManager:
                 current_task["assignee"] = assignee
 
         if current_task:
-            self.tasks.append(current_task)
+            new_tasks.append(current_task)
 
-        return self.tasks
+        if self.store:
+            # One transaction per call instead of one commit per task.
+            if new_tasks:
+                self.store.add_tasks(new_tasks)
+            self.tasks = self.store.load_tasks()
+        else:
+            self.tasks.extend(new_tasks)
+
+        # Only this call's tasks: earlier ones (possibly completed, possibly from a previous run) stay in self.tasks
+        return new_tasks
 
     def parse_date(self, date_string):
         today = datetime.now().date()
@@ -74,29 +223,45 @@ class TaskManager:
                 return None
 
     def update_task_status(self, task_id, status):
+        if self.store:
+            task = self.store.update_status(task_id, status) if task_id >= 0 else None
+            self.tasks = self.store.load_tasks()
+            return task
         if 0 <= task_id < len(self.tasks):
             self.tasks[task_id]["status"] = status
             return self.tasks[task_id]
         return None
 
     def filter_tasks(self, **kwargs):
+        if self.store:
+            return self.store.filter_tasks(**kwargs)
         filtered_tasks = self.tasks
         for key, value in kwargs.items():
             filtered_tasks = [task for task in filtered_tasks if task.get(key) == value]
         return filtered_tasks
 
     def sort_tasks_by_priority(self):
-        priority_order = {"high": 3, "medium": 2, "low": 1}
-        return sorted(self.tasks, key=lambda x: priority_order.get(x.get("priority", "low"), 0), reverse=True)
+        if self.store:
+            return self.store.query(order_by="priority_rank DESC, id")
+        return sorted(self.tasks, key=lambda x: PRIORITY_ORDER.get(x.get("priority", "low"), 0), reverse=True)
 
     def sort_tasks_by_due_date(self):
+        if self.store:
+            return self.store.query(order_by="due_date IS NULL, due_date, id")
         return sorted(self.tasks, key=lambda x: x.get("due_date") or datetime.max.date())
 
     def generate_task_summary(self):
-        total_tasks = len(self.tasks)
-        pending_tasks = len(self.filter_tasks(status="pending"))
-        in_progress_tasks = len(self.filter_tasks(status="in progress"))
-        completed_tasks = len(self.filter_tasks(status="completed"))
+        if self.store:
+            counts = self.store.count_by_status()
+            total_tasks = sum(counts.values())
+            pending_tasks = counts.get("pending", 0)
+            in_progress_tasks = counts.get("in progress", 0)
+            completed_tasks = counts.get("completed", 0)
+        else:
+            total_tasks = len(self.tasks)
+            pending_tasks = len(self.filter_tasks(status="pending"))
+            in_progress_tasks = len(self.filter_tasks(status="in progress"))
+            completed_tasks = len(self.filter_tasks(status="completed"))
 
         summary = f"Task Summary:\n"
         summary += f"Total Tasks: {total_tasks}\n"
@@ -109,11 +274,23 @@ class TaskManager:
     def get_upcoming_tasks(self, days=7):
         today = datetime.now().date()
         upcoming_date = today + timedelta(days=days)
+        if self.store:
+            return self.store.query(
+                "due_date IS NOT NULL AND due_date BETWEEN ? AND ?",
+                (today.isoformat(), upcoming_date.isoformat()),
+                order_by="due_date, id"
+            )
         upcoming_tasks = [task for task in self.tasks if task.get("due_date") and today <= task["due_date"] <= upcoming_date]
         return sorted(upcoming_tasks, key=lambda x: x["due_date"])
 
     def get_overdue_tasks(self):
         today = datetime.now().date()
+        if self.store:
+            return self.store.query(
+                "due_date IS NOT NULL AND due_date < ? AND status != ?",
+                (today.isoformat(), "completed"),
+                order_by="due_date, id"
+            )
         overdue_tasks = [task for task in self.tasks if task.get("due_date") and task["due_date"] < today and task["status"] != "completed"]
         return sorted(overdue_tasks, key=lambda x: x["due_date"])
 
@@ -122,11 +299,19 @@ class TaskManager:
         return new_tasks[-1] if new_tasks else None
 
     def delete_task(self, task_id):
+        if self.store:
+            task = self.store.delete(task_id) if task_id >= 0 else None
+            self.tasks = self.store.load_tasks()
+            return task
         if 0 <= task_id < len(self.tasks):
             return self.tasks.pop(task_id)
         return None
 
     def clear_completed_tasks(self):
+        if self.store:
+            completed_tasks = self.store.delete_completed()
+            self.tasks = self.store.load_tasks()
+            return completed_tasks
         completed_tasks = self.filter_tasks(status="completed")
         self.tasks = [task for task in self.tasks if task["status"] != "completed"]
         return completed_tasks
\ No newline at end of file
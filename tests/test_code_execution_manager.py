@@ -0,0 +1,34 @@
+import pytest
+
+pytest.importorskip("pylint")
+pytest.importorskip("black")
+
+from code_execution_manager import CodeExecutionManager
+
+SCRIPT = '''
+def work():
+    import fractions
+    return sum(i * i for i in range(20000))
+
+
+if __name__ == "__main__":
+    work()
+'''
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return CodeExecutionManager()
+
+
+def test_profile_leaves_out_import_machinery(manager):
+    report = manager.profile_code(code=SCRIPT, baseline_code=SCRIPT.replace("20000", "10000"))
+
+    assert report["status"] == "success"
+    reported = ([hotspot["function"] for hotspot in report["hotspots"]]
+                + [allocation["location"] for allocation in report["allocations"]]
+                + [change["function"] for change in report["comparison"]["changed_functions"]])
+    assert any("work" in function for function in reported)
+    assert not [function for function in reported if "importlib" in function or "zipimport" in function
+                or "builtins.exec" in function]
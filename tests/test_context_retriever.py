@@ -0,0 +1,36 @@
+import pytest
+
+pytest.importorskip("ollama")
+
+from context_retriever import ContextRetriever
+from embeddings import HashingEmbeddingProvider
+from memory_ollama import MemoryManager
+
+
+@pytest.fixture
+def retriever(tmp_path):
+    manager = MemoryManager(backend="numpy", index_directory=str(tmp_path / "index"),
+                            embedding_provider=HashingEmbeddingProvider(dimension=128))
+    return ContextRetriever(manager, chunk_lines=4, overlap_lines=0, top_k=4)
+
+
+def test_rewritten_file_serves_only_its_latest_chunks(retriever):
+    retriever.index_files({"trader.py": "def fetch_prices():\n    return old_exchange_api()\n"}, iteration=1)
+    retriever.index_files({"trader.py": "def fetch_prices():\n    return new_exchange_api()\n"}, iteration=2)
+
+    context = retriever.build_context("fetch_prices exchange api")
+
+    assert "new_exchange_api" in context
+    assert "old_exchange_api" not in context
+
+
+def test_unchanged_chunks_of_a_rewritten_file_are_kept(retriever):
+    first = "def fetch_prices():\n    return api()\n\n\ndef place_order():\n    return 1\n"
+    retriever.index_files({"trader.py": first}, iteration=1)
+    retriever.index_files({"trader.py": first.replace("return 1", "return 2")}, iteration=2)
+
+    context = retriever.build_context("fetch_prices api place_order")
+
+    assert "return api()" in context
+    assert "return 2" in context
+    assert "return 1" not in context
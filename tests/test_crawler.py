@@ -0,0 +1,52 @@
+import pytest
+
+pytest.importorskip("bs4")
+pytest.importorskip("networkx")
+
+from crawler import ByteBudget, Crawler, HostLimiter
+
+
+class FakeResponse:
+    headers = {"Content-Type": "text/html"}
+    encoding = "utf-8"
+
+    def __init__(self, body):
+        self.body = body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        yield self.body
+
+
+class FakeSession:
+    def __init__(self):
+        self.requested = []
+
+    def get(self, url, timeout=None, stream=False):
+        self.requested.append(url)
+        links = "".join(f'<a href="{url.rstrip("/")}/{i}">page</a>' for i in range(5))
+        return FakeResponse(f"<html><body>{links}</body></html>".encode())
+
+
+def test_byte_budget_is_shared_across_crawlers():
+    session = FakeSession()
+    first_page = len(session.get("https://a.example/").body)
+    session.requested.clear()
+    budget = ByteBudget(first_page)
+    limiter = HostLimiter(concurrency=2, delay=0)
+
+    for site in ("https://a.example/", "https://b.example/"):
+        crawler = Crawler(session, lambda html, url: html, max_pages=10, max_workers=1,
+                          host_limiter=limiter, byte_budget=budget)
+        crawler.crawl(site)
+
+    assert session.requested == ["https://a.example/"]
+    assert budget.exhausted()
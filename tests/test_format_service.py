@@ -0,0 +1,41 @@
+import pytest
+
+black = pytest.importorskip("black")
+
+import format_service
+from format_service import FormatService, find_mode
+
+UNFORMATTED = "x = [1,2,3]\n"
+FORMATTED = "x = [1, 2, 3]\n"
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = FormatService(mode=black.Mode(), max_workers=1, cache_path=str(tmp_path / "format.sqlite"))
+    yield service
+    service.close()
+
+
+def test_mode_comes_from_pyproject(tmp_path):
+    (tmp_path / "pyproject.toml").write_text("[tool.black]\nline-length = 120\nskip-string-normalization = true\n")
+
+    mode = find_mode(str(tmp_path))
+
+    assert mode.line_length == 120
+    assert not mode.string_normalization
+
+
+def test_cached_files_are_not_sent_to_workers(tmp_path, service, monkeypatch):
+    path = tmp_path / "module.py"
+    path.write_text(UNFORMATTED)
+    assert service.format_files([str(path)], write=False) == {str(path): "reformatted"}
+
+    def no_workers(*args, **kwargs):
+        raise AssertionError("cached file sent to a worker")
+
+    monkeypatch.setattr(format_service, "ProcessPoolExecutor", no_workers)
+    service.close()
+
+    assert service.format_files([str(path)]) == {str(path): "reformatted"}
+    assert path.read_text() == FORMATTED
+    assert service.format_files([str(path)]) == {str(path): "unchanged"}
@@ -0,0 +1,111 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from http_cache import CachingSession
+
+PAGES = {
+    "/small": (b"x" * 500, {"Cache-Control": "max-age=60"}),
+    "/large": (b"x" * 5000, {"Cache-Control": "max-age=60"}),
+    "/plain": (b"x" * 500, {}),
+    "/validated": (b"x" * 500, {"ETag": '"v1"'}),
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    # HTTP/1.0 without Content-Length: the body is delimited by closing the connection
+    protocol_version = "HTTP/1.0"
+
+    def do_GET(self):
+        body, headers = PAGES[self.path.split("?")[0]]
+        if headers.get("ETag") and self.headers.get("If-None-Match") == headers["ETag"]:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def session(tmp_path):
+    session = CachingSession(directory=str(tmp_path / "http"), max_entry_bytes=1000)
+    yield session
+    session.close()
+
+
+def cached_keys(session):
+    return [row[0] for row in session._db.connection().execute("SELECT key FROM responses")]
+
+
+def test_fresh_response_is_served_from_disk(server, session):
+    assert session.get(f"{server}/small").content == PAGES["/small"][0]
+    assert session.get(f"{server}/small").content == PAGES["/small"][0]
+
+    assert session.reset_stats()["hits"] == 1
+
+
+def test_body_over_entry_limit_without_content_length_is_not_stored(server, session):
+    response = session.get(f"{server}/large")
+
+    assert len(response.content) == 5000
+    assert cached_keys(session) == []
+    assert session.stats["bytes_downloaded"] == 5000
+
+
+def test_total_size_is_capped_by_evicting_least_recently_used(server, tmp_path):
+    session = CachingSession(directory=str(tmp_path / "http"), max_bytes=1200)
+    for page in range(3):
+        session.get(f"{server}/small?page={page}")
+
+    assert sorted(cached_keys(session)) == [f"{server}/small?page=1", f"{server}/small?page=2"]
+    session.close()
+
+
+def test_streamed_body_is_capped_and_not_stored_when_read_partially(server, session):
+    with session.get(f"{server}/small", stream=True) as response:
+        first = next(response.iter_content(100))
+
+    assert len(first) == 100
+    assert session.stats["bytes_downloaded"] == 100
+    assert cached_keys(session) == []
+
+
+def test_response_without_caching_headers_is_not_reused(server, session):
+    session.get(f"{server}/plain")
+    session.get(f"{server}/plain")
+
+    stats = session.reset_stats()
+    assert stats["misses"] == 2
+    assert stats["bytes_downloaded"] == 1000
+    assert cached_keys(session) == []
+
+
+def test_response_with_only_a_validator_is_revalidated(server, session):
+    session.get(f"{server}/validated")
+    response = session.get(f"{server}/validated")
+
+    assert response.content == PAGES["/validated"][0]
+    assert session.reset_stats()["revalidated"] == 1
+
+
+def test_cache_is_created_on_first_use(tmp_path):
+    CachingSession(directory=str(tmp_path / "http"))
+
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+pytest.importorskip("ollama")
+
+from embeddings import HashingEmbeddingProvider
+from memory_ollama import MemoryManager
+
+
+def make_manager(tmp_path, backend="numpy"):
+    return MemoryManager(backend=backend, persist_directory=str(tmp_path / "memory"),
+                         embedding_provider=HashingEmbeddingProvider(dimension=64))
+
+
+def test_same_content_under_another_id_is_indexed(tmp_path):
+    manager = make_manager(tmp_path)
+    written = manager.save_memories([
+        ("Mike-1", "Run the tests before merging.", {"agent": "Mike"}),
+        ("Alex-1", "Run the tests before merging.", {"agent": "Alex"}),
+    ])
+
+    assert written == 2
+    assert manager.search_memories("Run the tests", k=5, where={"agent": "Alex"})
+
+
+def test_resaving_skips_indexed_memories(tmp_path):
+    memories = [("Mike-1", "Run the tests before merging."), ("Mike-2", "Profile the hot loop.")]
+    assert make_manager(tmp_path).save_memories(memories) == 2
+
+    assert make_manager(tmp_path).save_memories(memories) == 0
+
+
+def test_manifest_is_specific_to_the_backend(tmp_path, monkeypatch):
+    def chroma_unavailable(self):
+        raise ImportError("chromadb is not installed")
+
+    memories = [("Mike-1", "Run the tests before merging.")]
+    monkeypatch.setattr(MemoryManager, "_open_chroma_collection", chroma_unavailable)
+    fallback = make_manager(tmp_path, backend="chroma")
+
+    assert fallback.backend == "numpy"
+    assert fallback.save_memories(memories) == 1
+    assert os.path.exists(tmp_path / "memory" / "numpy_manifest.sqlite")
+    assert not os.path.exists(tmp_path / "memory" / "chroma_manifest.sqlite")
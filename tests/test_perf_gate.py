@@ -0,0 +1,41 @@
+import pytest
+
+from perf_gate import PerfGate, discover_benchmarks
+
+CODE = '''
+def build(n):
+    return [i * i for i in range(n)]
+
+
+def bench_build():
+    build(2000)
+'''
+
+
+@pytest.fixture
+def gate(tmp_path):
+    from sandbox import Sandbox
+
+    sandbox = Sandbox(max_workers=1, timeout=60)
+    workspace = tmp_path / "workspace"
+    workspace.mkdir()
+    yield PerfGate(sandbox, workspace_folder=str(workspace), history_dir=str(tmp_path / "history"), repeats=3)
+    sandbox.close()
+
+
+def test_discover_benchmarks_needs_zero_argument_functions():
+    code = "def bench_a():\n    pass\n\ndef bench_b(n):\n    pass\n\ndef bench_c(n=1):\n    pass\n\ndef helper():\n    pass\n"
+
+    assert discover_benchmarks(code) == ["bench_a", "bench_c"]
+
+
+def test_history_directory_is_created_on_first_record(gate, tmp_path):
+    assert not (tmp_path / "history").exists()
+
+    result = gate.check("generated_code.py", CODE)
+    gate.check("generated_code.py", CODE, old_code=CODE)
+
+    assert result["status"] == "passed"
+    assert result["benchmarks"]["bench_build"]["verdict"] == "new"
+    assert len(gate.history("generated_code.py")) == 2
+    assert "bench_build" in gate.trend("generated_code.py")
@@ -0,0 +1,22 @@
+import pytest
+
+pytest.importorskip("sklearn")
+
+from relevance import RelevanceScorer
+
+
+def test_streaming_scores_do_not_depend_on_the_batch():
+    scorer = RelevanceScorer(streaming=True)
+    page = "To create a website with Python you can use Flask or Django."
+    others = ["The history of the Roman empire is a long one.", "Python web frameworks render templates."]
+
+    alone = scorer.score("create a website with python", [page])[0]
+    batched = scorer.score("create a website with python", [page] + others)[0]
+
+    assert alone == pytest.approx(batched)
+
+
+def test_streaming_ignores_stop_words():
+    scorer = RelevanceScorer(streaming=True)
+
+    assert scorer.score("how to create a website", ["It is the story of the city and its people."])[0] == 0
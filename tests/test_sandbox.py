@@ -0,0 +1,83 @@
+import os
+import time
+import sys
+
+import pytest
+
+from sandbox import Sandbox
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="process groups and rlimits are POSIX-only")
+
+
+@pytest.fixture
+def sandbox():
+    sandbox = Sandbox(max_workers=1, timeout=3, cpu_time=5, memory_mb=512)
+    yield sandbox
+    sandbox.close()
+
+
+def test_background_grandchild_does_not_hold_up_the_run(sandbox):
+    result = sandbox.run_code("import subprocess; subprocess.Popen(['sleep', '20']); print('started')")
+
+    assert result["returncode"] == 0
+    assert result["stdout"].strip() == "started"
+    assert not result["timed_out"]
+    assert result["duration"] < 3
+
+
+def test_timeout_kills_the_process_group(sandbox):
+    result = sandbox.run_code("import subprocess; subprocess.Popen(['sleep', '20']).wait()", timeout=1)
+
+    assert result["timed_out"]
+    assert result["duration"] < 3
+
+
+def test_escaped_grandchild_only_costs_the_grace_period(sandbox):
+    code = "import subprocess; subprocess.Popen(['sleep', '20'], start_new_session=True); print('started')"
+    result = sandbox.run_code(code)
+
+    assert result["stdout"].strip() == "started"
+    assert result["duration"] < 3
+
+
+def test_resource_limits_apply_to_the_command(sandbox):
+    result = sandbox.run_code("import resource; print(resource.getrlimit(resource.RLIMIT_AS)[0] // 1024 // 1024)")
+
+    assert result["stdout"].strip() == "512"
+
+
+def test_rlimits_can_be_skipped_for_commands(sandbox):
+    import resource
+
+    code = "import resource; print(resource.getrlimit(resource.RLIMIT_AS)[0])"
+    result = sandbox.run([sys.executable, "-c", code], rlimits=False)
+
+    assert result["stdout"].strip() == str(resource.getrlimit(resource.RLIMIT_AS)[0])
+
+
+def test_output_is_capped():
+    sandbox = Sandbox(max_workers=1, max_output_bytes=100)
+    result = sandbox.run([sys.executable, "-c", "print('x' * 1000)"])
+    sandbox.close()
+
+    assert result["stdout"].startswith("x" * 100)
+    assert "[truncated 901 bytes]" in result["stdout"]
+
+
+def test_warm_sandbox_kills_background_grandchildren(tmp_path):
+    from fork_server import WarmSandbox
+
+    pid_file = tmp_path / "pid"
+    sandbox = WarmSandbox(max_workers=1, timeout=3, preload=())
+    try:
+        code = f"import subprocess; open({str(pid_file)!r}, 'w').write(str(subprocess.Popen(['sleep', '20']).pid))"
+        result = sandbox.run_code(code)
+    finally:
+        sandbox.close()
+
+    assert result["returncode"] == 0
+    pid = int(pid_file.read_text())
+    with pytest.raises(ProcessLookupError):
+        for _ in range(50):
+            os.kill(pid, 0)
+            time.sleep(0.05)
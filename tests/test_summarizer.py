@@ -0,0 +1,29 @@
+import pytest
+
+pytest.importorskip("sklearn")
+
+from summarizer import TextRankSummarizer
+
+
+def page(topic, count):
+    return " ".join(f"Sentence number {i} explains how {topic} affects trading profits." for i in range(count))
+
+
+def test_max_sentences_caps_all_sources():
+    summarizer = TextRankSummarizer(max_tokens=10000, max_sentences=5)
+    sources = [("https://a.example", page("latency", 4)), ("https://b.example", page("fees", 4)),
+               ("https://c.example", page("slippage", 4))]
+
+    summary = summarizer.summarize(sources, "trading profits")
+
+    numbered = [line for line in summary.splitlines() if line[:1].isdigit()]
+    assert len(numbered) == 5
+    assert "https://c.example" not in summary
+
+
+def test_summary_respects_token_budget():
+    summarizer = TextRankSummarizer(max_tokens=40)
+    summary = summarizer.summarize([("https://a.example", page("latency", 20))], "latency")
+
+    sentences = [line for line in summary.splitlines() if line[:1].isdigit()]
+    assert 0 < len(sentences) <= 3
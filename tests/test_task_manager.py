@@ -0,0 +1,64 @@
+import pytest
+
+spacy = pytest.importorskip("spacy")
+
+import task_manager
+from task_manager import TaskManager
+
+FIRST_PLAN = "Write tests. Priority is high. Assignee is Mike."
+SECOND_PLAN = "Deploy service. Assignee is Alex. Review code. Assignee is Annie."
+TAGS = {
+    "VERB": ["write", "deploy", "review"],
+    "NOUN": ["tests", "service", "code"],
+    "PROPN": ["Mike", "Alex", "Annie"],
+}
+
+
+@pytest.fixture(autouse=True)
+def nlp(monkeypatch):
+    """en_core_web_sm when it is installed, otherwise a blank pipeline that tags the words these plans use."""
+    try:
+        model = spacy.load("en_core_web_sm")
+    except OSError:
+        model = spacy.blank("en")
+        ruler = model.add_pipe("attribute_ruler")
+        for pos, words in TAGS.items():
+            ruler.add([[{"LOWER": word.lower()}] for word in words], {"POS": pos})
+    monkeypatch.setattr(task_manager.spacy, "load", lambda name: model)
+    return model
+
+
+def test_extract_tasks_returns_only_new_tasks():
+    manager = TaskManager()
+    first = manager.extract_tasks(FIRST_PLAN)
+    second = manager.extract_tasks(SECOND_PLAN)
+
+    assert [task["task"] for task in second] == ["Deploy service", "Review code"]
+    assert manager.tasks == first + second
+
+
+def test_persisted_tasks_are_not_handed_out_again_after_restart(tmp_path):
+    db_path = str(tmp_path / "tasks.db")
+    manager = TaskManager(db_path=db_path)
+    first = manager.extract_tasks(FIRST_PLAN)
+    assert [task["task"] for task in first] == ["Write tests"]
+    manager.update_task_status(0, "completed")
+
+    restarted = TaskManager(db_path=db_path)
+    second = restarted.extract_tasks(SECOND_PLAN)
+
+    assert [(task["task"], task["assignee"], task["status"]) for task in second] == [
+        ("Deploy service", "Alex", "pending"),
+        ("Review code", "Annie", "pending"),
+    ]
+    assert len(restarted.tasks) == 3
+    assert restarted.tasks[0]["status"] == "completed"
+
+
+def test_persistence_is_opt_in(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manager = TaskManager()
+    manager.extract_tasks(FIRST_PLAN)
+
+    assert manager.store is None
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,71 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("selenium")
+
+from browser_tools import WebDriverPool
+
+
+class FakeDriver:
+    def __init__(self):
+        self.delay = 0.0
+        self.healthy = True
+        self.quit_called = False
+
+    @property
+    def current_url(self):
+        time.sleep(self.delay)
+        if not self.healthy:
+            raise ConnectionError("browser is gone")
+        return "about:blank"
+
+    def delete_all_cookies(self):
+        time.sleep(self.delay)
+
+    def get(self, url):
+        pass
+
+    def quit(self):
+        time.sleep(self.delay)
+        self.quit_called = True
+
+
+def test_slow_health_check_does_not_block_other_threads():
+    pool = WebDriverPool(FakeDriver, size=2)
+    first, second = pool.checkout(), pool.checkout()
+    pool.checkin(first)
+    first.delay = 1.0
+    checkout = threading.Thread(target=pool.checkout)
+    checkout.start()
+    time.sleep(0.1)  # The thread is now health-checking the slow driver
+
+    started = time.monotonic()
+    pool.checkin(second)
+
+    assert time.monotonic() - started < 0.5
+    checkout.join()
+
+
+def test_unhealthy_driver_is_replaced_and_quit():
+    pool = WebDriverPool(FakeDriver, size=1)
+    driver = pool.checkout()
+    pool.checkin(driver)
+    driver.healthy = False
+
+    replacement = pool.checkout(timeout=1)
+
+    assert replacement is not driver
+    assert driver.quit_called
+
+
+def test_close_quits_idle_drivers():
+    pool = WebDriverPool(FakeDriver, size=2)
+    drivers = [pool.checkout(), pool.checkout()]
+    for driver in drivers:
+        pool.checkin(driver)
+
+    pool.close()
+
+    assert all(driver.quit_called for driver in drivers)
@@ -0,0 +1,10 @@
+import os
+
+
+
+# Caches and learned state live here rather than in whatever directory the agent is started from
+data_directory = os.environ.get("AGENT_DATA_DIR") or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def data_path(*parts):
+    return os.path.join(data_directory, *parts)
@@ -0,0 +1,56 @@
+import os
+import sqlite3
+import threading
+
+
+
+class ThreadLocalConnection:
+    """
+    One SQLite connection per thread to a single database file, in WAL mode.
+
+    Nothing is created on disk until a connection is first asked for: the
+    first connection in each thread creates the parent directory, then runs
+    the schema script (which should use IF NOT EXISTS). Extra pragmas are
+    applied to every connection.
+    """
+
+    def __init__(self, path, schema=None, timeout=30, row_factory=None, pragmas=()):
+        self.path = path
+        self.schema = schema
+        self.timeout = timeout
+        self.row_factory = row_factory
+        self.pragmas = pragmas
+        self._local = threading.local()
+
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            if self.row_factory is not None:
+                conn.row_factory = self.row_factory
+            conn.execute("PRAGMA journal_mode=WAL")
+            for pragma in self.pragmas:
+                conn.execute(f"PRAGMA {pragma}")
+            if self.schema:
+                conn.executescript(self.schema)
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Close the calling thread's connection, if it has one."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def trim_lru(conn, table, key_column, max_entries):
+    """Delete all but the max_entries most recently used rows of table, ordered by its last_access column."""
+    conn.execute(
+        f"DELETE FROM {table} WHERE {key_column} IN "
+        f"(SELECT {key_column} FROM {table} ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+        (max_entries,)
+    )
@@ -0,0 +1,7 @@
+import math
+
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English text and code)."""
+    return math.ceil(len(text) / 4)
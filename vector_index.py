@@ -0,0 +1,305 @@
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+from utils.sqlite import ThreadLocalConnection
+
+# Metadata keys stored in their own indexed columns; anything else is matched through json_extract.
+INDEXED_METADATA = ("agent", "kind", "iteration")
+WHERE_OPERATORS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+index_schema = """
+CREATE TABLE IF NOT EXISTS entries (
+    row INTEGER PRIMARY KEY,
+    id TEXT UNIQUE NOT NULL,
+    document TEXT,
+    metadata TEXT,
+    agent TEXT,
+    kind TEXT,
+    iteration INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_entries_agent ON entries(agent, iteration);
+CREATE INDEX IF NOT EXISTS idx_entries_kind ON entries(kind, iteration);
+CREATE INDEX IF NOT EXISTS idx_entries_iteration ON entries(iteration);
+CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def where_to_sql(where):
+    """Translate a Chroma-style where filter into a SQL clause over the entries table."""
+    if not where:
+        return "", []
+    clauses, params = [], []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            parts = [where_to_sql(sub) for sub in condition]
+            joiner = " AND " if key == "$and" else " OR "
+            clauses.append("(" + joiner.join(part for part, _ in parts) + ")")
+            for _, sub_params in parts:
+                params.extend(sub_params)
+            continue
+        column = key if key in INDEXED_METADATA else f"json_extract(metadata, '$.{key}')"
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, value in condition.items():
+            if operator in ("$in", "$nin"):
+                placeholders = ",".join("?" * len(value))
+                clauses.append(f"{column} {'IN' if operator == '$in' else 'NOT IN'} ({placeholders})")
+                params.extend(value)
+            elif operator in WHERE_OPERATORS:
+                clauses.append(f"{column} {WHERE_OPERATORS[operator]} ?")
+                params.append(value)
+            else:
+                raise ValueError(f"Unsupported where operator: {operator}")
+    return " AND ".join(clauses), params
+
+
+class VectorIndex:
+    """
+    Built-in vector store used when Chroma is unavailable.
+
+    Embeddings are kept L2-normalised as float32 rows in a memory-mapped file,
+    with ids, documents and metadata in a SQLite side table. Nothing is read
+    until the first add or query, so constructing an index is effectively free. The
+    add/query methods mirror the subset of the Chroma collection API that
+    MemoryManager uses, so the two backends are interchangeable. Metadata
+    filters are evaluated in SQL first, so only matching rows are scored.
+
+    An optional IVF layer (build_ivf) clusters the vectors with k-means and
+    restricts each query to the nprobe closest clusters.
+    """
+
+    initial_capacity = 1024
+
+    def __init__(self, directory="memory_index", nprobe=8, ivf_min_vectors=50000):
+        self.directory = directory
+        self.nprobe = nprobe
+        self.ivf_min_vectors = ivf_min_vectors
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.db_path = os.path.join(directory, "index.sqlite")
+        self.centroids_path = os.path.join(directory, "centroids.npy")
+        self.assignments_path = os.path.join(directory, "assignments.i32")
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.RLock()
+        self._db = ThreadLocalConnection(self.db_path, schema=index_schema)
+        self._opened = False
+        self.dimension = None
+        self.count = 0
+        self.capacity = 0
+        self._vectors = None
+        self._centroids = None
+        self._assignments = None
+        self._lists = None
+
+    # Storage
+
+    def _open(self):
+        if self._opened:
+            return
+        with self._lock:
+            if self._opened:
+                return
+            conn = self._db.connection()
+            settings = dict(conn.execute("SELECT key, value FROM settings"))
+            if "dimension" in settings:
+                self.dimension = int(settings["dimension"])
+                self.count = conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM entries").fetchone()[0]
+                self._map_vectors(max(self.count, self.initial_capacity))
+            if os.path.exists(self.centroids_path):
+                self._centroids = np.load(self.centroids_path)
+                self._assignments = np.memmap(self.assignments_path, dtype=np.int32, mode="r+")
+            self._opened = True
+
+    def _map_vectors(self, capacity):
+        row_bytes = self.dimension * 4
+        size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        if size < capacity * row_bytes:
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+        else:
+            capacity = size // row_bytes
+        if self._vectors is not None:
+            self._vectors.flush()
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dimension))
+        self.capacity = capacity
+
+    def _ensure_capacity(self, needed):
+        if needed > self.capacity:
+            capacity = max(self.capacity, self.initial_capacity)
+            while capacity < needed:
+                capacity *= 2
+            self._map_vectors(capacity)
+
+    @staticmethod
+    def _normalize(matrix):
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix[None, :]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    # Chroma-compatible API
+
+    def add(self, ids, embeddings, documents=None, metadatas=None):
+        self._open()
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [None] * len(ids)
+        vectors = self._normalize(embeddings)
+        with self._lock:
+            conn = self._db.connection()
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+                with conn:
+                    conn.execute("INSERT OR REPLACE INTO settings VALUES ('dimension', ?)", (str(self.dimension),))
+            if vectors.shape[1] != self.dimension:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {self.dimension}")
+
+            placeholders = ",".join("?" * len(ids))
+            existing = {row[0] for row in conn.execute(f"SELECT id FROM entries WHERE id IN ({placeholders})", list(ids))}
+            keep = [i for i, memory_id in enumerate(ids) if memory_id not in existing]
+            if not keep:
+                return
+            start = self.count
+            rows = range(start, start + len(keep))
+            self._ensure_capacity(start + len(keep))
+            self._vectors[start:start + len(keep)] = vectors[keep]
+            self._vectors.flush()
+            if self._centroids is not None:
+                self._assign_rows(start, vectors[keep])
+            with conn:
+                conn.executemany(
+                    "INSERT INTO entries (row, id, document, metadata, agent, kind, iteration) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (row, ids[i], documents[i], json.dumps(metadatas[i]) if metadatas[i] else None,
+                         *((metadatas[i] or {}).get(key) for key in INDEXED_METADATA))
+                        for row, i in zip(rows, keep)
+                    ]
+                )
+            self.count = start + len(keep)
+
+    def query(self, query_embeddings, n_results=10, where=None, include=None):
+        self._open()
+        include = include or ["documents", "metadatas", "distances"]
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": [], "embeddings": []}
+        allowed = self._filter_rows(where) if where and self.count else None
+        for query in self._normalize(query_embeddings):
+            rows, scores = self._search(query, n_results, allowed) if self.count else ([], [])
+            entries = self._fetch_entries(rows)
+            result["ids"].append([entries[row][0] for row in rows])
+            result["documents"].append([entries[row][1] for row in rows])
+            result["metadatas"].append([entries[row][2] for row in rows])
+            result["distances"].append([float(1.0 - score) for score in scores])
+            result["embeddings"].append(np.asarray(self._vectors[rows]) if rows else np.empty((0, self.dimension or 0)))
+        return {key: value for key, value in result.items() if key == "ids" or key in include}
+
+    def _filter_rows(self, where):
+        clause, params = where_to_sql(where)
+        rows = self._db.connection().execute(f"SELECT row FROM entries WHERE {clause} ORDER BY row", params)
+        return np.fromiter((row[0] for row in rows), dtype=np.int64)
+
+    def _search(self, query, n_results, allowed=None):
+        candidates = self._ivf_candidates(query) if allowed is None or len(allowed) >= self.ivf_min_vectors else None
+        if allowed is not None:
+            candidates = allowed if candidates is None else np.intersect1d(candidates, allowed, assume_unique=True)
+        if candidates is None:
+            scores = self._vectors[:self.count] @ query
+        else:
+            scores = self._vectors[candidates] @ query
+        k = min(n_results, len(scores))
+        if k == 0:
+            return [], []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        rows = top if candidates is None else candidates[top]
+        return [int(row) for row in rows], scores[top]
+
+    def _fetch_entries(self, rows):
+        if not rows:
+            return {}
+        placeholders = ",".join("?" * len(rows))
+        entries = {}
+        for row, memory_id, document, metadata in self._db.connection().execute(
+            f"SELECT row, id, document, metadata FROM entries WHERE row IN ({placeholders})", rows
+        ):
+            entries[row] = (memory_id, document, json.loads(metadata) if metadata else None)
+        return entries
+
+    def get(self, ids=None):
+        self._open()
+        conn = self._db.connection()
+        if ids is None:
+            rows = conn.execute("SELECT id, document, metadata FROM entries ORDER BY row").fetchall()
+        else:
+            placeholders = ",".join("?" * len(ids))
+            rows = conn.execute(f"SELECT id, document, metadata FROM entries WHERE id IN ({placeholders})", list(ids)).fetchall()
+        return {
+            "ids": [row[0] for row in rows],
+            "documents": [row[1] for row in rows],
+            "metadatas": [json.loads(row[2]) if row[2] else None for row in rows],
+        }
+
+    def count_entries(self):
+        self._open()
+        return self.count
+
+    # IVF layer
+
+    def build_ivf(self, n_clusters=None, sample_size=100000, iterations=10, seed=0):
+        """Cluster the stored vectors with spherical k-means and persist the assignments."""
+        self._open()
+        with self._lock:
+            if not self.count:
+                return
+            n_clusters = n_clusters or max(1, int(np.sqrt(self.count)))
+            rng = np.random.default_rng(seed)
+            sample_rows = np.sort(rng.choice(self.count, size=min(sample_size, self.count), replace=False))
+            sample = np.asarray(self._vectors[sample_rows])
+            centroids = sample[rng.choice(len(sample), size=min(n_clusters, len(sample)), replace=False)]
+            for _ in range(iterations):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                for c in range(len(centroids)):
+                    members = sample[labels == c]
+                    if len(members):
+                        centroids[c] = members.mean(axis=0)
+                centroids = self._normalize(centroids)
+
+            self._centroids = centroids
+            np.save(self.centroids_path, centroids)
+            self._assignments = None
+            if os.path.exists(self.assignments_path):
+                os.remove(self.assignments_path)
+            for start in range(0, self.count, 65536):
+                end = min(start + 65536, self.count)
+                self._assign_rows(start, np.asarray(self._vectors[start:end]))
+            self._lists = None
+            self.logger.info(f"Built IVF index with {len(centroids)} clusters over {self.count} vectors")
+
+    def _assign_rows(self, start, vectors):
+        labels = np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+        needed = start + len(labels)
+        if self._assignments is None or len(self._assignments) < needed:
+            capacity = max(needed, self.capacity)
+            with open(self.assignments_path, "ab") as f:
+                f.truncate(capacity * 4)
+            self._assignments = np.memmap(self.assignments_path, dtype=np.int32, mode="r+")
+        self._assignments[start:needed] = labels
+        self._assignments.flush()
+        if self._lists is not None:
+            for offset, label in enumerate(labels):
+                self._lists[label].append(start + offset)
+
+    def _ivf_candidates(self, query):
+        if self._centroids is None or self.count < self.ivf_min_vectors:
+            return None
+        if self._lists is None:
+            assignments = np.asarray(self._assignments[:self.count])
+            order = np.argsort(assignments, kind="stable")
+            bounds = np.searchsorted(assignments[order], np.arange(len(self._centroids) + 1))
+            self._lists = [list(order[bounds[c]:bounds[c + 1]]) for c in range(len(self._centroids))]
+        nprobe = min(self.nprobe, len(self._centroids))
+        probes = np.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]
+        candidates = np.concatenate([np.asarray(self._lists[c], dtype=np.int64) for c in probes])
+        return np.sort(candidates)